@@ -0,0 +1,103 @@
+-- Aisles as data instead of LIKE filters: every shelf carries its aisle_name,
+-- derived from shelf-prefix rules (longest matching prefix wins), and pallets
+-- are looked up by aisle through idx_shelf_aisle and idx_pallet_shelf.
+create table if not exists aisle (
+    aisle_name VARCHAR(50) PRIMARY KEY,
+    sort_order INT NOT NULL DEFAULT 0
+);
+
+create table if not exists aisle_rule (
+    shelf_prefix VARCHAR(5) PRIMARY KEY,
+    aisle_name VARCHAR(50) NOT NULL REFERENCES aisle(aisle_name) ON UPDATE CASCADE
+);
+
+alter table shelf add column if not exists aisle_name VARCHAR(50) REFERENCES aisle(aisle_name);
+create index if not exists idx_shelf_aisle on shelf (aisle_name);
+create index if not exists idx_pallet_shelf on pallet (shelf_id);
+
+-- Default layout (the rules the app used to hard-code)
+insert into aisle (aisle_name, sort_order) values
+    ('Narrow Aisle', 1), ('Wide Aisle', 2), ('Cable Aisle', 3), ('Aisle 4', 4), ('Loading bay', 5)
+on conflict do nothing;
+
+insert into aisle_rule (shelf_prefix, aisle_name) values
+    ('1', 'Narrow Aisle'), ('2', 'Narrow Aisle'),
+    ('298', 'Wide Aisle'), ('299', 'Wide Aisle'), ('3', 'Wide Aisle'), ('4', 'Wide Aisle'),
+    ('5', 'Cable Aisle'), ('6', 'Cable Aisle'),
+    ('7', 'Aisle 4'),
+    ('Lb', 'Loading bay')
+on conflict do nothing;
+
+create or replace function aisle_for_shelf(p_shelf_id text)
+returns varchar
+language sql
+stable
+as $$
+    select aisle_name from aisle_rule
+    where starts_with(p_shelf_id, shelf_prefix)
+    order by length(shelf_prefix) desc
+    limit 1;
+$$;
+
+-- New / renamed shelves get their aisle on write
+create or replace function shelf_set_aisle()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.aisle_name := aisle_for_shelf(new.shelf_id);
+    return new;
+end;
+$$;
+
+drop trigger if exists shelf_set_aisle on shelf;
+create trigger shelf_set_aisle
+before insert or update of shelf_id on shelf
+for each row execute function shelf_set_aisle();
+
+-- Re-derive every shelf's aisle after the rules change; returns shelves changed
+create or replace function reassign_shelf_aisles()
+returns int
+language plpgsql
+as $$
+declare
+    n int;
+begin
+    update shelf set aisle_name = aisle_for_shelf(shelf_id)
+    where aisle_name is distinct from aisle_for_shelf(shelf_id);
+    get diagnostics n = row_count;
+    return n;
+end;
+$$;
+
+-- Replace the whole rule set in one transaction,
+-- e.g. select set_aisle_rules('[{"shelf_prefix": "8", "aisle_name": "Aisle 5"}]')
+create or replace function set_aisle_rules(p_rules jsonb)
+returns int
+language plpgsql
+as $$
+begin
+    insert into aisle (aisle_name, sort_order)
+    select distinct r->>'aisle_name', (select coalesce(max(sort_order), 0) + 1 from aisle)
+    from jsonb_array_elements(p_rules) r
+    on conflict do nothing;
+
+    delete from aisle_rule;
+    insert into aisle_rule (shelf_prefix, aisle_name)
+    select r->>'shelf_prefix', r->>'aisle_name' from jsonb_array_elements(p_rules) r;
+
+    return reassign_shelf_aisles();
+end;
+$$;
+
+select reassign_shelf_aisles();
+
+create or replace view pallet_aisle_view as
+select
+    p.pallet_id,
+    p.shelf_id,
+    pr.model_number,
+    s.aisle_name
+from pallet p
+join shelf s on s.shelf_id = p.shelf_id
+join product pr on pr.product_id = p.product_id;
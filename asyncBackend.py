@@ -0,0 +1,181 @@
+import asyncio
+import threading
+from backend import engine, query_cache, inventory_index, _ensure_response_ok, _item_query, _index_filter, ITEM_PAGE_SIZE
+from queryCache import CachedEngine
+from metrics import metrics, MeteredEngine
+
+# ---------------- Async backend ----------------
+# Async versions of the backend's read functions so independent queries are
+# in flight together instead of one after another. They share the backend's
+# query cache and inventory index, and run on one long-lived event loop so the
+# async engine's pooled keep-alive connections are reused between calls.
+async_engine = CachedEngine(MeteredEngine(engine.async_engine(), metrics, prefix="async_engine"), query_cache)
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def _get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-backend", daemon=True).start()
+        return _loop
+
+def run(coro, timeout=None):
+    """Run a coroutine on the backend loop and wait for its result (call from any non-loop thread)."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result(timeout)
+
+def close():
+    """Close the pooled connections."""
+    if _loop is not None:
+        run(async_engine.aclose())
+
+# Dropdowns
+@metrics.timed
+async def fetch_model_numbers():
+    """Fetch all model numbers (cached)."""
+    try:
+        resp = await async_engine.list_model_numbers()
+        if not _ensure_response_ok(resp, "fetch model numbers"):
+            return []
+        return tuple(r["model_number"] for r in (resp.data or []) if r.get("model_number"))
+    except Exception as e:
+        print(f"Failed to fetch model numbers: {e}")
+        return []
+
+@metrics.timed
+async def fetch_pallet_ids():
+    """Fetch all pallet IDs (cached)."""
+    try:
+        resp = await async_engine.list_pallet_ids()
+        if not _ensure_response_ok(resp, "fetch pallet ids"):
+            return []
+        return tuple(r["pallet_id"] for r in (resp.data or []) if r.get("pallet_id"))
+    except Exception as e:
+        print(f"Failed to fetch pallet ids: {e}")
+        return []
+
+@metrics.timed
+async def fetch_aisle_names():
+    """Fetch all aisle names in display order (cached)."""
+    try:
+        resp = await async_engine.list_aisles()
+        if not _ensure_response_ok(resp, "fetch aisles"):
+            return []
+        return tuple(r["aisle_name"] for r in (resp.data or []))
+    except Exception as e:
+        print(f"Failed to fetch aisles: {e}")
+        return []
+
+# Analytics
+@metrics.timed
+async def countItemsByModel():
+    """Get item count by model number from the trigger-maintained counts."""
+    try:
+        resp = await async_engine.select_stock_counts()
+        return resp.data or []
+    except Exception as e:
+        print(f"Error fetching stock counts: {e}")
+        return []
+
+@metrics.timed
+async def countPalletsByModel():
+    """Get pallet count by model number from the trigger-maintained counts."""
+    try:
+        resp = await async_engine.select_pallet_counts()
+        return resp.data or []
+    except Exception as e:
+        print(f"Error fetching pallet counts: {e}")
+        return []
+
+@metrics.timed
+async def getPalletInfo():
+    """Get pallet info (ID, shelf, model number) from the view."""
+    rows = inventory_index.pallet_info()
+    if rows is not None:
+        return rows
+    try:
+        resp = await async_engine.select_pallet_info()
+        return resp.data or []
+    except Exception as e:
+        print(f"Error fetching pallet info: {e}")
+        return []
+
+@metrics.timed
+async def viewPalletByAisle(aisle):
+    """Get pallet info (ID, shelf, model) filtered by aisle location."""
+    if not aisle:
+        return []
+    try:
+        resp = await async_engine.select_pallets_by_aisle(aisle)
+        if not _ensure_response_ok(resp, f"view pallets by aisle {aisle}"):
+            return []
+        return resp.data or []
+    except Exception as e:
+        print(f'Error fetching pallets from that aisle: {e}')
+        return []
+
+# Item pages
+@metrics.timed
+async def selectItemsPage(column, value, after_id=None, before_id=None, limit=ITEM_PAGE_SIZE):
+    """Async version of backend.selectItemsPage."""
+    query = _item_query(column, value)
+    rows = inventory_index.items_page(*_index_filter(query), after_id, before_id, limit)
+    if rows is not None:
+        return rows
+    try:
+        resp = await async_engine.select_projection(**query.after(after_id).before(before_id).limit(limit).spec())
+        if not _ensure_response_ok(resp, "select items page"):
+            return []
+        return resp.data or []
+    except Exception as e:
+        print(f'Unable to find items: {e}')
+        return []
+
+@metrics.timed
+async def countItems(column, value):
+    """Async version of backend.countItems."""
+    query = _item_query(column, value)
+    count = inventory_index.count_items(*_index_filter(query))
+    if count is not None:
+        return count
+    try:
+        resp = await async_engine.count_projection(**query.count_spec())
+        if not _ensure_response_ok(resp, "count items"):
+            return None
+        return resp.count
+    except Exception as e:
+        print(f'Unable to count items: {e}')
+        return None
+
+@metrics.timed
+async def selectItemsWithCount(column, value, limit=ITEM_PAGE_SIZE):
+    """First page of items and the total count, fetched together."""
+    return await asyncio.gather(selectItemsPage(column, value, limit=limit), countItems(column, value))
+
+# Pipelined loads
+@metrics.timed
+async def fetch_dropdowns():
+    """Model numbers, pallet IDs and aisle names, fetched together."""
+    return await asyncio.gather(fetch_model_numbers(), fetch_pallet_ids(), fetch_aisle_names())
+
+@metrics.timed
+async def load_overview():
+    """
+    Everything the app shows on start-up, in one round trip of latency:
+    dropdowns, stock counts, pallet counts and pallet info.
+    Results also land in the query cache, so opening those tabs is a cache hit.
+    """
+    model_numbers, pallet_ids, aisle_names, stock_counts, pallet_counts, pallet_info = await asyncio.gather(
+        fetch_model_numbers(), fetch_pallet_ids(), fetch_aisle_names(),
+        countItemsByModel(), countPalletsByModel(), getPalletInfo()
+    )
+    return {
+        "model_numbers": model_numbers,
+        "pallet_ids": pallet_ids,
+        "aisle_names": aisle_names,
+        "stock_counts": stock_counts,
+        "pallet_counts": pallet_counts,
+        "pallet_info": pallet_info,
+    }
@@ -1,23 +1,212 @@
 import os
 import csv
-from supabase import create_client, Client
-from functools import lru_cache
+import time
+from datetime import datetime, timedelta, timezone
+from storageEngine import create_engine, engine_source, LazyEngine
+from queryCache import QueryCache, CachedEngine
+from batchWriter import BatchWriter
+from idAllocator import IdAllocator
+from inventoryIndex import InventoryIndex
+from serialSet import SerialSet
+from searchIndex import SearchIndex
+from changeFeed import ChangeFeed
+from metrics import metrics, MeteredEngine, METRICS_FILE
+from queryBuilder import Select
+import snapshotExport
+import startupSnapshot
+from writeJournal import WriteJournal, JournalSync
 
-# ---------------- Supabase client ----------------
-SUPABASE_URL = os.getenv("SUPABASE_URL", "YOUR_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY", "YOUR_KEY")
+# ---------------- Storage engine ----------------
+# Supabase by default; set INVENTORY_ENGINE=sqlite for a local replica.
+# Reads go through a TTL cache that writes invalidate by table (see queryCache.py).
+# Engine calls that miss the cache, and the backend functions below, are timed (see metrics.py).
+if METRICS_FILE:
+    metrics.log_to_file(METRICS_FILE)
+query_cache = QueryCache(maxsize=int(os.getenv("INVENTORY_CACHE_SIZE", "256")), on_lookup=metrics.cache_lookup)
+# The engine (and its client) is created on first use, not at import
+engine = CachedEngine(MeteredEngine(LazyEngine(create_engine), metrics), query_cache)
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+def _offline_error(e):
+    """True when an error means the database couldn't be reached, not that the write is bad."""
+    if isinstance(e, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        return isinstance(e, engine.offline_errors)
+    except Exception:
+        return True   # The engine itself couldn't be built
+
+# Chunked, concurrent writer for bulk item inserts/deletes
+writer = BatchWriter(engine, is_offline=_offline_error)
+
+# Server-reserved id blocks (see idAllocation.sql)
+item_ids = IdAllocator(engine, "item_id_seq", block_size=100)
+product_ids = IdAllocator(engine, "product_id_seq", block_size=1)
+
+# Optional client-side index (INVENTORY_INDEX=1); reads fall back to the database on a miss
+INDEX_ENABLED = os.getenv("INVENTORY_INDEX", "0") == "1"
+inventory_index = InventoryIndex(enabled=INDEX_ENABLED)
+
+@metrics.timed
+def load_inventory_index():
+    """Load the client-side inventory index from the database."""
+    try:
+        inventory_index.load(engine)
+        return True
+    except Exception as e:
+        print(f"Could not load inventory index: {e}")
+        return False
+
+# Every serial in the item table as compact hashes (INVENTORY_SERIAL_SET=0 to turn off), so
+# bulk add, CSV import and scan mode find duplicates before sending anything
+SERIAL_SET_ENABLED = os.getenv("INVENTORY_SERIAL_SET", "1") == "1"
+serial_set = SerialSet(enabled=SERIAL_SET_ENABLED)
+
+def load_serial_set():
+    """Load the local serial set from the database."""
+    if not serial_set.enabled:
+        return False
+    try:
+        serial_set.load(engine)
+        return True
+    except Exception as e:
+        print(f"Could not load serial set: {e}")
+        return False
+
+# Trigram index of serials, model numbers and product names/descriptions for the
+# global search (INVENTORY_SEARCH_INDEX=0 to turn off); see searchIndex.py
+SEARCH_INDEX_ENABLED = os.getenv("INVENTORY_SEARCH_INDEX", "1") == "1"
+search_index = SearchIndex(enabled=SEARCH_INDEX_ENABLED)
+
+def load_search_index():
+    """Load the local search index from the database."""
+    if not search_index.enabled:
+        return False
+    try:
+        search_index.load(engine)
+        return True
+    except Exception as e:
+        print(f"Could not load search index: {e}")
+        return False
+
+@metrics.timed
+def load_item_caches():
+    """
+    Load the serial set and the search index, whichever are enabled. With
+    both on, the serials are collected from the search index's scan of the
+    item table instead of reading the table a second time.
+    """
+    if not search_index.enabled:
+        return load_serial_set()
+    if not serial_set.enabled:
+        return load_search_index()
+    serials = []
+    try:
+        search_index.load(engine, on_item=lambda r: serials.append(r["serial_number"]))
+        serial_set.load_serials(serials)
+        return True
+    except Exception as e:
+        print(f"Could not load the serial set and search index: {e}")
+        return False
+
+# Start-up snapshot (see startupSnapshot.py): the data the last launch fetched,
+# shown at the next one while the fresh copy is fetched. INVENTORY_SNAPSHOT=0 turns it off.
+SNAPSHOT_ENABLED = os.getenv("INVENTORY_SNAPSHOT", "1") == "1"
+SNAPSHOT_FILE = os.getenv("INVENTORY_SNAPSHOT_PATH", "inventory-snapshot.bin")
+# Snapshots older than this are shown as stale
+SNAPSHOT_MAX_AGE_HOURS = float(os.getenv("INVENTORY_SNAPSHOT_MAX_AGE_HOURS", "12"))
+
+@metrics.timed
+def loadStartupSnapshot(path=SNAPSHOT_FILE):
+    """
+    The saved start-up data as {"data", "saved_at", "version", "stale"}, or
+    None when there is no usable snapshot for this database.
+    """
+    if not SNAPSHOT_ENABLED:
+        return None
+    try:
+        snapshot = startupSnapshot.load(path, engine_source())
+    except Exception as e:
+        print(f"Could not read start-up snapshot: {e}")
+        return None
+    if snapshot is not None:
+        snapshot["stale"] = time.time() - snapshot["saved_at"] > SNAPSHOT_MAX_AGE_HOURS * 3600
+    return snapshot
+
+@metrics.timed
+def saveStartupSnapshot(overview, path=SNAPSHOT_FILE):
+    """Save start-up data (asyncBackend.load_overview) for the next launch; returns its data version, or None."""
+    if not SNAPSHOT_ENABLED:
+        return None
+    if not any(overview.get(name) for name, _ in startupSnapshot.SECTIONS):
+        return None # Nothing fetched; keep the last good snapshot
+    try:
+        return startupSnapshot.save(path, overview, engine_source())
+    except Exception as e:
+        print(f"Could not save start-up snapshot: {e}")
+        return None
+
+# Row changes from every workstation (Supabase Realtime, or the local engine's own writes)
+change_feed = ChangeFeed()
+
+def _apply_change(event):
+    """Keep the query cache and inventory index in step with a change event."""
+    table, kind = event["table"], event["type"]
+    record, old = event["record"], event["old_record"]
+    query_cache.invalidate(table)
+
+    if table == "item":
+        if kind in ("UPDATE", "DELETE"):
+            serial = old.get("serial_number") or record.get("serial_number")
+            if serial:
+                inventory_index.remove_serials([serial])
+                serial_set.remove([serial])
+                if serial != record.get("serial_number"):
+                    search_index.remove_serial(serial)
+        if kind in ("INSERT", "UPDATE"):
+            inventory_index.add_items([record])
+            serial_set.add([record.get("serial_number")])
+            search_index.add_item(record)
+    elif table == "pallet":
+        if kind == "DELETE":
+            inventory_index.remove_pallet(old.get("pallet_id"))
+        else:
+            inventory_index.add_pallet(record)
+    elif table == "product" and kind != "DELETE":
+        inventory_index.add_product(record)
+        search_index.add_product(record)
+
+change_feed.subscribe(_apply_change)
+
+def start_change_feed():
+    """Start streaming changes from the engine; False if it has no change source."""
+    try:
+        return engine.start_change_feed(change_feed)
+    except Exception as e:
+        print(f"Could not start change feed: {e}")
+        return False
 
 # Helpers
-def _to_item_tuple(row):
-    """Convert dict from Supabase into tuple format."""
-    return (
-        row.get("item_id"),
-        row.get("serial_number"),
-        row.get("pallet_id"),
-        row.get("product_id"),
-    )
+# Item rows are fetched as tuples of these columns (no select("*"), no dicts)
+ITEM_COLUMNS = ("item_id", "serial_number", "pallet_id", "product_id")
+# Filters the item listings accept; a model filter joins product in the same request
+ITEM_FILTERS = ("pallet_id", "product_id", "product.model_number")
+
+def _item_query(column, value):
+    """Projection of ITEM_COLUMNS where `column` equals `value`, ordered by item_id."""
+    if column not in ITEM_FILTERS:
+        raise ValueError(f"Unknown item filter column: {column}")
+    if column == "product_id":
+        value = int(value)
+    elif column == "pallet_id":
+        value = str(value).strip()
+    return Select("item", *ITEM_COLUMNS).where(column, value).order_by("item_id")
+
+def _index_filter(query):
+    """The (column, value) the inventory index answers for a query; a model goes through its product_id."""
+    column, value = query.filters[0]
+    if column == "product.model_number":
+        return "product_id", inventory_index.product_for_model(value)
+    return column, value
 
 def _ensure_response_ok(resp, action_desc="operation"):
     """Check if Supabase response is valid."""
@@ -26,16 +215,38 @@ def _ensure_response_ok(resp, action_desc="operation"):
         return False
     return True
 
+@metrics.timed
+def _split_serials(serials):
+    """
+    Split serials into (new, present, repeated) with the local serial set,
+    or None when it isn't loaded. Without a live change feed the set may be
+    behind other workstations, so "present" serials are confirmed with one
+    query (there are usually none).
+    """
+    split = serial_set.split(serials)
+    if split is None or not split[1] or change_feed.live:
+        return split
+    new, present, repeated = split
+    try:
+        existing = set()
+        for chunk in _chunked(present, 200):
+            existing.update(r["serial_number"] for r in (engine.select_existing_serials(chunk).data or []))
+    except Exception as e:
+        print(f"Could not confirm duplicate serials: {e}")
+        return split
+    stale = [s for s in present if s not in existing]
+    serial_set.remove(stale)
+    return new + stale, [s for s in present if s in existing], repeated
+
 def get_model_for_pallet(pallet_id):
     """Fetch the model number for a given pallet ID using the view."""
     if not pallet_id:
         return None
+    model_number = inventory_index.model_for_pallet(str(pallet_id).strip())
+    if model_number is not None:
+        return model_number
     try:
-        resp = supabase.table("pallet_info_view") \
-            .select("model_number") \
-            .eq("pallet_id", pallet_id) \
-            .limit(1) \
-            .execute()
+        resp = engine.select_model_for_pallet(pallet_id)
         if resp.data:
             return resp.data[0]["model_number"]
         return None
@@ -43,54 +254,456 @@ def get_model_for_pallet(pallet_id):
         print(f"Error fetching model for pallet {pallet_id}: {e}")
         return None
 
+@metrics.timed
+def get_product_id_for_pallet(pallet_id):
+    """Fetch the product_id stored on a pallet."""
+    if not pallet_id:
+        return None
+    product_id = inventory_index.product_for_pallet(str(pallet_id).strip())
+    if product_id is not None:
+        return product_id
+    try:
+        resp = engine.select_pallet_products([str(pallet_id).strip()])
+        if resp.data:
+            return resp.data[0]["product_id"]
+        return None
+    except Exception as e:
+        print(f"Error fetching product for pallet {pallet_id}: {e}")
+        return None
+
+@metrics.timed
+def get_product_id_for_model(model_number):
+    """Fetch the product_id for a given model number."""
+    if not model_number:
+        return None
+    product_id = inventory_index.product_for_model(model_number)
+    if product_id is not None:
+        return product_id
+    try:
+        resp = engine.select_products_by_model(model_number)
+        if resp.data:
+            return resp.data[0]["product_id"]
+        return None
+    except Exception as e:
+        print(f"Error fetching product for model {model_number}: {e}")
+        return None
+
+@metrics.timed
+def get_model_for_product(product_id):
+    """Fetch the model number for a product_id."""
+    if product_id is None:
+        return None
+    model_number = inventory_index.model_for_product(product_id)
+    if model_number is not None:
+        return model_number
+    try:
+        resp = engine.select_product(int(product_id))
+        if resp.data:
+            return resp.data[0]["model_number"]
+        return None
+    except Exception as e:
+        print(f"Error fetching model for product {product_id}: {e}")
+        return None
+
+@metrics.timed
+def allocate_item_ids(count):
+    """Reserve `count` item_ids (no pre-read, safe across workstations)."""
+    try:
+        return item_ids.take(count)
+    except Exception as e:
+        print(f"Could not allocate item ids: {e}")
+        return []
+
+@metrics.timed
+def allocate_product_id():
+    """Reserve a single product_id."""
+    try:
+        return product_ids.take(1)[0]
+    except Exception as e:
+        print(f"Could not allocate a product id: {e}")
+        return None
+
+def _chunked(iterable, size):
+    """Yield lists of at most `size` elements from any iterable."""
+    batch = []
+    for x in iterable:
+        batch.append(x)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _iter_csv_items(csv_path, stats=None):
+    """
+    Lazily read an item CSV and yield (line_num, serial, pallet_id).
+    Invalid rows are reported and skipped; pass a stats dict to count them.
+    An item_id column is ignored: ids are reserved when the rows are inserted.
+    """
+    with open(csv_path, newline='', encoding='utf-8') as csvfile:
+        reader = csv.DictReader(csvfile)
+        for line_num, row in enumerate(reader, start=2):
+            if stats is not None:
+                stats["rows_read"] = stats.get("rows_read", 0) + 1
+            try:
+                serial = str(row['serial_number']).strip()
+                pallet_id = str(row['pallet_id']).strip()
+
+                if not serial or not pallet_id:
+                    print(f'Line {line_num}: Missing serial_number or pallet_id - skipped')
+                else:
+                    yield line_num, serial, pallet_id
+                    continue
+            except KeyError as e:
+                print(f'Line {line_num} is missing column {e}. Skipped')
+            if stats is not None:
+                stats["skipped"] = stats.get("skipped", 0) + 1
+
 # Core Backend Functions
+@metrics.timed
+def bulkScanItemsReport(items, ignore_conflicts=False):
+    """
+    Bulk insert items in concurrent batches.
+    items: list of dicts with keys: serial_number, pallet_id, product_id.
+    item_ids are always reserved from item_id_seq (any given item_id is
+    replaced), so they can't land in a block another workstation reserved.
+    Returns {"inserted": [...], "duplicates": [...], "failed": [(serial, reason)],
+    "unreachable": [serials among failed that failed because the database couldn't be reached]}.
+    """
+    # Filter only dict items
+    payload = [x for x in (items or []) if isinstance(x, dict)]
+
+    if not payload:
+        return {"inserted": [], "duplicates": [], "failed": [], "unreachable": []}
+
+    # Known serials are reported as duplicates without a round trip
+    result = {"inserted": [], "duplicates": [], "failed": [], "unreachable": []}
+    split = _split_serials([x.get("serial_number") for x in payload])
+    if split is not None:
+        new, present, repeated = split
+        result["duplicates"] = present + repeated
+        new = set(new)
+        payload, kept = [], payload
+        for x in kept:
+            if x.get("serial_number") in new:
+                payload.append(x)
+                new.discard(x.get("serial_number"))
+        if not payload:
+            return result
+
+    try:
+        payload = [{**x, "item_id": item_id} for x, item_id in zip(payload, item_ids.take(len(payload)))]
+        written = writer.insert_items(payload, ignore_conflicts=ignore_conflicts)
+    except Exception as e:
+        print(f"Bulk insert failed: {e}")
+        result["failed"] = [(x.get("serial_number"), str(e)) for x in payload]
+        if _offline_error(e):
+            result["unreachable"] = [x.get("serial_number") for x in payload]
+        return result
+    for key in result:
+        result[key].extend(written[key])
+
+    print(f"Inserted {len(result['inserted'])} of {len(payload)} items "
+          f"({len(result['duplicates'])} duplicates, {len(result['failed'])} failed)")
+
+    by_serial = {}
+    for x in payload:
+        by_serial.setdefault(x["serial_number"], x)
+    inventory_index.add_items(by_serial[sn] for sn in result["inserted"])
+    serial_set.add(result["inserted"])
+    return result
+
+@metrics.timed
 def bulkScanItems(items, ignore_conflicts=False):
     """
     Bulk insert items into database.
-    items: list of dicts with keys: item_id, serial_number, pallet_id, product_id
+    items: list of dicts with keys: serial_number, pallet_id, product_id
     """
     if not items:
         return 0
+    return len(bulkScanItemsReport(items, ignore_conflicts)["inserted"])
 
-    # Filter only dict items
-    payload = [x for x in items if isinstance(x, dict)]
-    
-    if not payload:
-        return 0
+@metrics.timed
+def scanItemsReport(scans):
+    """
+    Insert scanned serials onto their pallets, taking each pallet's product.
+    scans: (serial_number, pallet_id) pairs.
+    Returns the bulkScanItemsReport dict; scans for unknown pallets are failed.
+    While journal sync runs, the scans are journaled instead and listed under
+    "queued"; they are written (and any conflicts reported) by the sync worker.
+    """
+    if journal_sync.running:
+        scans = [(str(serial).strip(), str(pallet_id).strip()) for serial, pallet_id in scans]
+        duplicates = []
+        split = _split_serials([serial for serial, _ in scans])
+        if split is not None:
+            duplicates = split[1]
+            present = set(duplicates)
+            scans = [(serial, pallet_id) for serial, pallet_id in scans if serial not in present]
+        queued = _journal_write("scan_items", [[serial, pallet_id] for serial, pallet_id in scans])
+        if queued is not None:
+            return {"inserted": [], "duplicates": duplicates + queued["duplicates"], "failed": [],
+                    "unreachable": [], "queued": queued["queued"]}
+    return _write_scans(scans)
 
-    try:
-        if ignore_conflicts:
-            resp = supabase.table("item") \
-                .upsert(payload, on_conflict="item_id,serial_number", ignore_duplicates=True) \
-                .execute()
+def _products_for_pallets(pallet_ids):
+    """{pallet_id: product_id} for the pallets that exist (index first, then one batched lookup)."""
+    found, missing = {}, []
+    for pallet_id in set(pallet_ids):
+        product_id = inventory_index.product_for_pallet(pallet_id)
+        if product_id is not None:
+            found[pallet_id] = product_id
         else:
-            resp = supabase.table("item").insert(payload).execute()
+            missing.append(pallet_id)
+    for chunk in _chunked(sorted(missing), 200):
+        resp = engine.select_pallet_products(chunk)
+        if not _ensure_response_ok(resp, "lookup pallet->product_id"):
+            raise RuntimeError("pallet lookup failed")
+        found.update((str(r["pallet_id"]).strip(), r["product_id"]) for r in (resp.data or []))
+    return found
 
-        if not _ensure_response_ok(resp, "bulk insert"):
-            return 0
+def _write_scans(scans):
+    result = {"inserted": [], "duplicates": [], "failed": [], "unreachable": []}
+    scans = [(serial, str(pallet_id).strip()) for serial, pallet_id in scans]
+    try:
+        products = _products_for_pallets(pallet_id for _, pallet_id in scans)
+    except Exception as e:
+        print(f"Error fetching products for pallets: {e}")
+        result["failed"] = [(serial, str(e)) for serial, _ in scans]
+        if _offline_error(e):
+            result["unreachable"] = [serial for serial, _ in scans]
+        return result
+    items = []
+    for serial, pallet_id in scans:
+        if pallet_id not in products:
+            result["failed"].append((serial, f"Pallet {pallet_id} not found"))
+            continue
+        items.append({"serial_number": serial, "pallet_id": pallet_id, "product_id": products[pallet_id]})
+
+    if items:
+        report = bulkScanItemsReport(items, ignore_conflicts=False)
+        for key in result:
+            result[key].extend(report[key])
+    return result
+
+def serial_known(serial):
+    """True if the local serial set (or the inventory index) already holds this serial."""
+    known = serial_set.contains(serial)
+    if known is not None:
+        return known
+    return inventory_index.item_for_serial(serial) is not None
+
+@metrics.timed
+def bulkRemoveItemsReport(sns):
+    """
+    Delete items by serial numbers in concurrent batches.
+    Returns {"deleted": [...], "not_found": [...], "failed": [(serial, reason)],
+    "unreachable": [serials among failed that failed because the database couldn't be reached]}.
+    While journal sync runs, the removals are journaled and listed under "queued"
+    (a serial whose removal is already waiting in the journal is listed under "duplicates").
+    """
+    sns = [str(s).strip() for s in (sns or []) if str(s).strip()]
+    if not sns:
+        return {"deleted": [], "not_found": [], "failed": [], "unreachable": []}
+    if journal_sync.running:
+        queued = _journal_write("remove_items", sns)
+        if queued is not None:
+            return {"deleted": [], "not_found": [], "failed": [], "unreachable": [],
+                    "queued": queued["queued"], "duplicates": queued["duplicates"]}
+    return _delete_serials(sns)
 
-        inserted = len(resp.data or [])
-        print(f"Inserted {inserted} of {len(payload)} items")
-        return inserted
+def _delete_serials(sns):
+    try:
+        result = writer.delete_serials(sns)
     except Exception as e:
-        print(f"Bulk insert failed: {e}")
-        return 0
+        print(f"Bulk delete failed: {e}")
+        return {"deleted": [], "not_found": [], "failed": [(s, str(e)) for s in sns],
+                "unreachable": list(sns) if _offline_error(e) else []}
+
+    print(f"Deleted {len(result['deleted'])} of {len(sns)} requested items")
+    inventory_index.remove_serials(result["deleted"])
+    serial_set.remove(result["deleted"])
+    return result
 
+@metrics.timed
 def bulkRemoveItems(sns):
     """Delete items by serial numbers."""
     if not sns:
         return 0
+    return len(bulkRemoveItemsReport(sns)["deleted"])
+
+# ---------------- Write journal ----------------
+# With journal sync running (the GUI starts it unless INVENTORY_JOURNAL=0),
+# scans and item removals are committed to a local journal and acknowledged
+# at once, then replayed to the database in order by a background worker.
+# They keep working during an outage and catch up when it ends (see writeJournal.py).
+JOURNAL_ENABLED = os.getenv("INVENTORY_JOURNAL", "1") == "1"
+journal = WriteJournal(os.getenv("INVENTORY_JOURNAL_PATH", "inventory-journal.db"))
+
+_UNDO_OP = {"scan_items": "remove_items", "remove_items": "scan_items"}
+
+def _journal_write(op, payload):
+    """
+    Journal a write of serials (or [serial, pallet] pairs); None if the journal
+    can't be written. Serials repeated in `payload`, or with a write of the same
+    op still waiting in the journal, are returned as duplicates.
+    """
+    serials = [row[0] if isinstance(row, list) else row for row in payload]
+    with journal_sync.lock:
+        # A serial scanned and then removed (or the reverse) while queued can be written again
+        waiting = journal_sync.queued(op, serials) - journal_sync.queued(_UNDO_OP[op], serials)
+        queued, duplicates, seen = [], [], set(waiting)
+        unique = []
+        for row in payload:
+            serial = row[0] if isinstance(row, list) else row
+            if not serial:
+                continue
+            if serial in seen:
+                duplicates.append(serial)
+                continue
+            seen.add(serial)
+            queued.append(serial)
+            unique.append(row)
+        if not unique:
+            return {"queued": [], "duplicates": duplicates}
+        try:
+            journal_sync.append(op, unique)
+        except Exception as e:
+            print(f"Could not journal {op}, writing directly: {e}")
+            return None
+    return {"queued": queued, "duplicates": duplicates}
+
+def _database_reachable():
+    """Cheap uncached round trip to tell an outage from rejected rows."""
+    try:
+        engine.select_page("shelf", "shelf_id", "shelf_id", limit=1)
+        return True
+    except Exception:
+        return False
+
+def _raise_if_offline(report, total):
+    """
+    Raise ConnectionError when any row failed because the database couldn't be
+    reached, so the whole run stays pending and is retried (rows that did go
+    in are recognised by the retry), or when every row failed during an outage.
+    """
+    if report["unreachable"]:
+        raise ConnectionError(f'{len(report["unreachable"])} of {total} writes could not reach the database')
+    failed = report["failed"]
+    if failed and len(failed) == total and not _database_reachable():
+        raise ConnectionError(failed[0][1])
+
+def _replay_owners(entries, row_serial):
+    """
+    serial -> [(entry, row)] in journal order for a run of entries, and the
+    rows to write (each serial once, from its first entry).
+    """
+    owners, rows = {}, []
+    for entry in entries:
+        for row in entry["payload"]:
+            serial = row_serial(row)
+            if serial not in owners:
+                owners[serial] = []
+                rows.append(row)
+            owners[serial].append((entry, row))
+    return owners, rows
+
+def _repeated(results, owners, reason):
+    """Report every later write of a serial in the run as a conflict against its own entry."""
+    for serial, writes in owners.items():
+        for entry, _ in writes[1:]:
+            results[entry["key"]]["conflicts"].append((serial, reason))
+
+def _existing_pallets(serials):
+    """serial -> pallet_id for the serials that are in the database."""
+    existing = {}
+    for chunk in _chunked(serials, 200):
+        resp = engine.select_items_by_serials(chunk)
+        existing.update((r["serial_number"], r["pallet_id"]) for r in (resp.data or []))
+    return existing
+
+def _replay_scans(entries):
+    """
+    Write journaled scans. A serial already on its scanned pallet after an
+    earlier attempt of the same entry is taken as applied; any other
+    duplicate, and every rejected scan, is a conflict. A serial scanned in
+    several entries of the run is written for the first and a conflict for the rest.
+    """
+    results = {e["key"]: {"synced": [], "conflicts": []} for e in entries}
+    owners, rows = _replay_owners(entries, lambda row: row[0])
+    scans = [(serial, pallet_id) for serial, pallet_id in rows]
+
+    report = _write_scans(scans)
+    _raise_if_offline(report, len(scans))
+    existing = _existing_pallets(report["duplicates"]) if report["duplicates"] else {}
+
+    for serial in report["inserted"]:
+        results[owners[serial][0][0]["key"]]["synced"].append(serial)
+    for serial in report["duplicates"]:
+        entry, (_, pallet_id) = owners[serial][0]
+        if entry["attempts"] and existing.get(serial) == pallet_id:
+            results[entry["key"]]["synced"].append(serial)
+        elif serial in existing:
+            results[entry["key"]]["conflicts"].append((serial, f"Already in stock on pallet {existing[serial]}"))
+        else:
+            results[entry["key"]]["conflicts"].append((serial, "Duplicate serial"))
+    for serial, reason in report["failed"]:
+        results[owners[serial][0][0]["key"]]["conflicts"].append((serial, reason))
+    _repeated(results, owners, "Duplicate serial (scanned again before it was synced)")
+    return results
+
+def _replay_removals(entries):
+    """
+    Delete journaled serials; a serial already gone after an earlier attempt
+    counts as removed. A serial removed in several entries of the run is
+    deleted for the first and a conflict for the rest.
+    """
+    results = {e["key"]: {"synced": [], "conflicts": []} for e in entries}
+    owners, serials = _replay_owners(entries, lambda row: row)
+
+    report = _delete_serials(serials)
+    _raise_if_offline(report, len(serials))
+
+    for serial in report["deleted"]:
+        results[owners[serial][0][0]["key"]]["synced"].append(serial)
+    for serial in report["not_found"]:
+        entry = owners[serial][0][0]
+        if entry["attempts"]:
+            results[entry["key"]]["synced"].append(serial)
+        else:
+            results[entry["key"]]["conflicts"].append((serial, "Not in stock"))
+    for serial, reason in report["failed"]:
+        results[owners[serial][0][0]["key"]]["conflicts"].append((serial, reason))
+    _repeated(results, owners, "Not in stock (removed again before it was synced)")
+    return results
+
+journal_sync = JournalSync(journal, {"scan_items": _replay_scans, "remove_items": _replay_removals},
+                           is_offline=_offline_error)
+
+def start_journal_sync():
+    """Start journaling item writes and syncing them in the background; False if disabled."""
+    if not JOURNAL_ENABLED:
+        return False
+    journal_sync.start()
+    return True
+
+def journal_status():
+    """{"online", "last_error", "pending", "pending_rows", "conflicts"} for the write journal."""
     try:
-        resp = supabase.table("item").delete().in_("serial_number", sns).execute()
-        if not _ensure_response_ok(resp, "bulk delete"):
-            return 0
-        deleted = len(resp.data or [])
-        print(f"Deleted {deleted} of {len(sns)} requested items")
-        return deleted
+        return journal_sync.status()
     except Exception as e:
-        print(f"Bulk delete failed: {e}")
-        return 0
+        print(f"Could not read journal status: {e}")
+        return None
+
+def journal_conflicts():
+    """Writes the sync worker could not apply, oldest first."""
+    try:
+        return journal.conflicts()
+    except Exception as e:
+        print(f"Could not read journal conflicts: {e}")
+        return []
 
+@metrics.timed
 def addPallet(pallet_id, shelf_id, product_id, notes='N/A'):
     """Add a new pallet to database."""
     try:
@@ -100,19 +713,22 @@ def addPallet(pallet_id, shelf_id, product_id, notes='N/A'):
             "product_id": int(product_id),
             "notes": notes or "N/A",
         }
-        resp = supabase.table("pallet").insert(data).execute()
+        resp = engine.insert_pallet(data)
         if not _ensure_response_ok(resp, "add pallet"):
             return False
+        inventory_index.add_pallet(data)
         print(f'Pallet {pallet_id} added')
         return True
     except Exception as e:
         print(f'Could not add pallet. Error: {e}')
         return False
     
+@metrics.timed
 def removePallet(pallet_id):
     """
-    Removes all items associated with the given pallet_id,
-    and then removes the pallet itself.
+    Removes the given pallet and all items on it in one transaction
+    (remove_pallet_with_items in palletProcedures.sql), so a failure
+    never leaves the items deleted and the pallet behind.
     """
     if not pallet_id:
         print("No pallet_id provided")
@@ -121,30 +737,19 @@ def removePallet(pallet_id):
     pid = str(pallet_id).strip()
 
     try:
-        # Step 1: Delete all items on the pallet
-        print(f"Attempting to delete items from pallet {pid}...")
-        resp_items = supabase.table("item").delete().eq("pallet_id", pid).execute()
-        
-        if not _ensure_response_ok(resp_items, f"delete items for pallet {pid}"):
-            print(f"Failed to delete items for pallet {pid}. Aborting pallet deletion.")
-            return False
-        
-        deleted_items_count = len(resp_items.data or [])
-        print(f"Deleted {deleted_items_count} items from pallet {pid}.")
-
-        # Step 2: Delete the pallet itself
-        print(f"Attempting to delete pallet {pid}...")
-        resp_pallet = supabase.table("pallet").delete().eq("pallet_id", pid).execute()
+        print(f"Attempting to delete pallet {pid} and its items...")
+        resp = engine.remove_pallet_with_items(pid)
         
-        if not _ensure_response_ok(resp_pallet, f"delete pallet {pid}"):
-            print(f"Failed to delete pallet {pid}. Note: {deleted_items_count} items were already deleted.")
+        if not _ensure_response_ok(resp, f"remove pallet {pid}"):
             return False
         
         # Check if the pallet was actually found and deleted
-        if not resp_pallet.data:
+        if not resp.data:
             print(f"Pallet {pid} not found. Could not delete.")
             return False
 
+        deleted_items_count = resp.data[0]["items_deleted"]
+        inventory_index.remove_pallet(pid)
         print(f"Successfully deleted pallet {pid} and its {deleted_items_count} items.")
         return True
         
@@ -152,6 +757,7 @@ def removePallet(pallet_id):
         print(f'Error during pallet removal ({pid}): {e}')
         return False
 
+@metrics.timed
 def updatePalletShelf(pallet_id, new_shelf_id):
     """Updates the shelf_id for a given pallet_id."""
     if not pallet_id or not new_shelf_id:
@@ -162,10 +768,7 @@ def updatePalletShelf(pallet_id, new_shelf_id):
     sid = str(new_shelf_id).strip()
 
     try:
-        resp = supabase.table("pallet") \
-            .update({"shelf_id": sid}) \
-            .eq("pallet_id", pid) \
-            .execute()
+        resp = engine.update_pallet_shelf(pid, sid)
         
         if not _ensure_response_ok(resp, f"update shelf for pallet {pid}"):
             return False
@@ -174,13 +777,89 @@ def updatePalletShelf(pallet_id, new_shelf_id):
             print(f"Pallet {pid} not found. Could not update shelf.")
             return False
             
+        inventory_index.move_pallet(pid, sid)
         print(f"Successfully updated pallet {pid} to new shelf {sid}.")
         return True
     except Exception as e:
         print(f'Error updating pallet shelf: {e}')
         return False
 
+@metrics.timed
+def movePalletsToShelf(pallet_ids, new_shelf_id):
+    """
+    Move many pallets to one shelf in a single atomic call.
+    Returns {"moved": [...], "not_found": [...]}, plus "error" if the move failed
+    (in which case nothing was moved).
+    """
+    pids = list(dict.fromkeys(str(p).strip() for p in pallet_ids if str(p).strip()))
+    sid = str(new_shelf_id or "").strip()
+    report = {"moved": [], "not_found": []}
+    if not pids or not sid:
+        print("Missing pallet_ids or new_shelf_id")
+        report["not_found"] = pids
+        return report
+
+    try:
+        resp = engine.move_pallets_to_shelf(pids, sid)
+        if not _ensure_response_ok(resp, f"move pallets to shelf {sid}"):
+            report["error"] = f"Could not move pallets to shelf {sid}"
+            return report
+
+        moved = {r["pallet_id"] for r in (resp.data or [])}
+        for pid in moved:
+            inventory_index.move_pallet(pid, sid)
+        report["moved"] = [p for p in pids if p in moved]
+        report["not_found"] = [p for p in pids if p not in moved]
+        print(f"Moved {len(report['moved'])} pallets to shelf {sid}.")
+    except Exception as e:
+        print(f'Error moving pallets to shelf {sid}: {e}')
+        report["error"] = str(e)
+    return report
+
+
+@metrics.timed
+def moveItemsToPallet(target_pallet_id, serials=None, source_pallet_id=None):
+    """
+    Move the listed serials, or every item on source_pallet_id, to the target
+    pallet in one set-based update. Only items of the target pallet's product
+    are moved. Returns {"moved", "incompatible", "already_there", "not_found"}
+    serial lists, plus "error" if the move failed (in which case nothing moved).
+    """
+    tid = str(target_pallet_id or "").strip()
+    source = str(source_pallet_id or "").strip() or None
+    sns = list(dict.fromkeys(str(s).strip() for s in (serials or []) if str(s).strip()))
+    report = {"moved": [], "incompatible": [], "already_there": [], "not_found": []}
+    if not tid or bool(sns) == bool(source):
+        print("Give a target pallet and either serials or a source pallet")
+        report["error"] = "Give a target pallet and either serial numbers or a source pallet"
+        return report
+    if source == tid:
+        report["error"] = f"Items are already on pallet {tid}"
+        return report
+
+    try:
+        resp = engine.move_items_to_pallet(None if source else sns, source, tid)
+        if not _ensure_response_ok(resp, f"move items to pallet {tid}"):
+            report["error"] = f"Could not move items to pallet {tid}"
+            return report
+        rows = resp.data or []
+        if not rows and (sns or get_product_id_for_pallet(tid) is None):
+            report["error"] = f"Pallet {tid} not found"
+            return report
+
+        statuses = {"moved": "moved", "incompatible": "incompatible",
+                    "same_pallet": "already_there", "not_found": "not_found"}
+        for r in rows:
+            report[statuses[r["status"]]].append(r["serial_number"])
+        inventory_index.move_items([r["item_id"] for r in rows if r["status"] == "moved"], tid)
+        print(f"Moved {len(report['moved'])} items to pallet {tid}.")
+    except Exception as e:
+        print(f'Error moving items to pallet {tid}: {e}')
+        report["error"] = str(e)
+    return report
+
 
+@metrics.timed
 def addProduct(product_id, product_name, product_description, model_number):
     """Add a new product to database."""
     try:
@@ -190,165 +869,540 @@ def addProduct(product_id, product_name, product_description, model_number):
             "product_description": product_description,
             "model_number": model_number,
         }
-        resp = supabase.table("product").insert(data).execute()
+        resp = engine.insert_product(data)
         if not _ensure_response_ok(resp, "add product"):
             return False
+        inventory_index.add_product(data)
         print('Product added')
         return True
     except Exception as e:
         print(f'Could not add product. Error: {e}')
         return False
 
+@metrics.timed
 def selectItemsByPallet(pallet_id):
     """Get all items on a specific pallet."""
+    query = _item_query("pallet_id", pallet_id)
+    rows = inventory_index.items_on_pallet(query.filters[0][1])
+    if rows is not None:
+        return rows
     try:
-        resp = supabase.table("item").select("*").eq("pallet_id", str(pallet_id).strip()).execute()
+        resp = engine.select_projection(**query.spec())
         if not _ensure_response_ok(resp, "select items by pallet"):
             return []
-        return [_to_item_tuple(r) for r in (resp.data or [])]
+        return resp.data or []
     except Exception as e:
         print(f'Unable to find items for pallet {pallet_id}: {e}')
         return []
 
+@metrics.timed
 def selectItemsByProduct(product_id):
     """Get all items for a specific product."""
+    query = _item_query("product_id", product_id)
+    rows = inventory_index.items_for_product(query.filters[0][1])
+    if rows is not None:
+        return rows
     try:
-        resp = supabase.table("item").select("*").eq("product_id", int(product_id)).execute()
+        resp = engine.select_projection(**query.spec())
         if not _ensure_response_ok(resp, "select items by product"):
             return []
-        return [_to_item_tuple(r) for r in (resp.data or [])]
+        return resp.data or []
     except Exception as e:
         print(f'Unable to find items: {e}')
         return []
 
+# Rows per page for the virtualized item listings
+ITEM_PAGE_SIZE = 200
+
+@metrics.timed
+def selectItemsPage(column, value, after_id=None, before_id=None, limit=ITEM_PAGE_SIZE):
+    """
+    One keyset page of items filtered by "pallet_id", "product_id" or
+    "product.model_number", ordered by item_id. Pass the last item_id shown
+    as `after_id` for the next page or the first one as `before_id` for the
+    previous page.
+    """
+    query = _item_query(column, value)
+    rows = inventory_index.items_page(*_index_filter(query), after_id, before_id, limit)
+    if rows is not None:
+        return rows
+    try:
+        resp = engine.select_projection(**query.after(after_id).before(before_id).limit(limit).spec())
+        if not _ensure_response_ok(resp, "select items page"):
+            return []
+        return resp.data or []
+    except Exception as e:
+        print(f'Unable to find items: {e}')
+        return []
+
+@metrics.timed
+def countItems(column, value):
+    """Number of items on a pallet / for a product or model, or None if it can't be counted."""
+    query = _item_query(column, value)
+    count = inventory_index.count_items(*_index_filter(query))
+    if count is not None:
+        return count
+    try:
+        resp = engine.count_projection(**query.count_spec())
+        if not _ensure_response_ok(resp, "count items"):
+            return None
+        return resp.count
+    except Exception as e:
+        print(f'Unable to count items: {e}')
+        return None
+
+@metrics.timed
 def importFromCsv(csv_path):
     """
     Import items from CSV file.
-    CSV requires headers: item_id, serial_number, pallet_id
+    CSV requires headers: serial_number, pallet_id (an item_id column is
+    ignored; ids are reserved from item_id_seq)
     product_id is auto-looked-up from pallet table.
+    Runs the batched streamImportFromCsv; returns the number of rows inserted.
+    """
+    return streamImportFromCsv(csv_path)["inserted"]
+
+# Rows per insert request when streaming a CSV import
+CSV_IMPORT_BATCH_SIZE = 500
+
+@metrics.timed
+def streamImportFromCsv(csv_path, batch_size=CSV_IMPORT_BATCH_SIZE, on_progress=None):
+    """
+    Import a large item CSV in fixed-size batches without loading it into memory.
+    Same CSV format as importFromCsv. Pallet->product lookups are done per batch
+    for pallets not seen yet, and a failed batch is reported without stopping
+    the rest of the import.
+    on_progress(report) is called after every batch.
+    Returns a report dict: rows_read, skipped, inserted, batches, failed_batches.
     """
+    report = {
+        "rows_read": 0,
+        "skipped": 0,
+        "duplicates": 0,
+        "inserted": 0,
+        "batches": 0,
+        "failed_batches": [],
+    }
+    # pallet_id -> product_id (None when the pallet doesn't exist); bounded by pallet count
+    pallet_map = {}
+
     try:
-        rows_to_import = []
-        pallet_ids_needed = set()
-
-        # Read CSV file
-        with open(csv_path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for line_num, row in enumerate(reader, start=2):
-                try:
-                    item_id = int(row["item_id"])
-                    serial = str(row['serial_number']).strip()
-                    pallet_id = str(row['pallet_id']).strip()
-                    
-                    if not serial or not pallet_id:
-                        print(f'Line {line_num}: Missing serial_number or pallet_id - skipped')
+        rows = _iter_csv_items(csv_path, stats=report)
+        for batch_num, batch in enumerate(_chunked(rows, batch_size), start=1):
+            report["batches"] = batch_num
+            first_line, last_line = batch[0][0], batch[-1][0]
+
+            try:
+                # Resolve only the pallets this batch introduces
+                unknown = {pallet_id for _, _, pallet_id in batch if pallet_id not in pallet_map}
+                if unknown:
+                    resp = engine.select_pallet_products(unknown)
+                    if not _ensure_response_ok(resp, "lookup pallet->product_id"):
+                        raise RuntimeError("pallet lookup failed")
+                    for pallet_id in unknown:
+                        pallet_map[pallet_id] = None
+                    for r in (resp.data or []):
+                        pallet_map[str(r['pallet_id']).strip()] = r['product_id']
+
+                # Serials already in stock are skipped up front, so one duplicate can't sink the batch
+                split = _split_serials([serial for _, serial, _ in batch])
+                if split is not None:
+                    new = set(split[0])
+                    kept = []
+                    for row in batch:
+                        if row[1] in new:
+                            kept.append(row)
+                            new.discard(row[1])
+                        else:
+                            print(f'Line {row[0]}: Serial "{row[1]}" is a duplicate - row skipped')
+                            report["duplicates"] += 1
+                    batch = kept
+
+                payload = []
+                for line_num, serial, pallet_id in batch:
+                    product_id = pallet_map.get(pallet_id)
+                    if product_id is None:
+                        print(f'Line {line_num}: Pallet "{pallet_id}" not found - row skipped')
+                        report["skipped"] += 1
                         continue
-                    
-                    rows_to_import.append((item_id, serial, pallet_id))
-                    pallet_ids_needed.add(pallet_id)
-                except KeyError as e:
-                    print(f'Line {line_num} is missing column {e}. Skipped')
-                except ValueError as e:
-                    print(f'Line {line_num}: Invalid data type {e}. Skipped')
-
-        if not rows_to_import:
-            print('No valid rows to insert')
-            return 0
-
-        # Batch lookup: get product_id for each pallet_id
-        pallet_map = {}
-        resp = supabase.table("pallet").select("pallet_id,product_id").in_("pallet_id", list(pallet_ids_needed)).execute()
-        
-        if not _ensure_response_ok(resp, "lookup pallet->product_id"):
-            return 0
-            
+                    payload.append({
+                        "serial_number": serial,
+                        "pallet_id": pallet_id,
+                        "product_id": product_id,
+                    })
+
+                if payload:
+                    for item, item_id in zip(payload, item_ids.take(len(payload))):
+                        item["item_id"] = item_id
+                    resp_insert = engine.insert_items(payload)
+                    if not _ensure_response_ok(resp_insert, f"CSV batch {batch_num}"):
+                        raise RuntimeError("insert rejected")
+                    report["inserted"] += len(resp_insert.data or [])
+                    inventory_index.add_items(resp_insert.data or [])
+                    serial_set.add(r.get("serial_number") for r in (resp_insert.data or []))
+            except Exception as e:
+                print(f'Batch {batch_num} (lines {first_line}-{last_line}) failed: {e}')
+                report["failed_batches"].append({
+                    "batch": batch_num,
+                    "first_line": first_line,
+                    "last_line": last_line,
+                    "rows": len(batch),
+                    "error": str(e),
+                })
+
+            if on_progress:
+                on_progress(report)
+
+        print(f'Inserted {report["inserted"]} of {report["rows_read"]} rows from {csv_path} '
+              f'({len(report["failed_batches"])} failed batches)')
+    except Exception as e:
+        print(f'Import failed: {e}')
+        report["error"] = str(e)
+
+    return report
+
+# Product and pallet CSV imports. The file is read whole (catalog files are
+# small), model numbers and existing keys are looked up in one batch, and
+# rows are inserted batch_size at a time. report["rows"] has a result for
+# every line: {"line", "key", "status", "message"}, where status is
+# "inserted", "invalid", "duplicate" (already in the database, or earlier in
+# the file), "not_found" (unknown model number) or "failed" (its batch was rejected).
+PRODUCT_CSV_COLUMNS = ("product_name", "model_number")      # product_description optional
+PALLET_CSV_COLUMNS = ("pallet_id", "shelf_id", "model_number")  # notes optional
+# Column widths from databaseSchema.sql
+CATALOG_MAX_LENGTHS = {"product_name": 100, "model_number": 100, "pallet_id": 4, "shelf_id": 5}
+# Keys per IN (...) lookup (keeps request URLs short)
+CATALOG_LOOKUP_SIZE = 200
+CATALOG_STATUSES = ("inserted", "invalid", "duplicate", "not_found", "failed")
+
+def _catalog_report():
+    report = {"rows_read": 0, "rows": []}
+    report.update((status, 0) for status in CATALOG_STATUSES)
+    return report
+
+def _row_result(report, line_num, key, status, message=""):
+    report[status] += 1
+    report["rows"].append({"line": line_num, "key": key, "status": status, "message": message})
+    if status != "inserted":
+        print(f'Line {line_num}: {key or "(blank)"} {message} - skipped' if status != "failed"
+              else f'Line {line_num}: {key} {message}')
+
+def _read_catalog_csv(csv_path, columns, optional, report, key):
+    """
+    (line_num, row) for each valid line of a product/pallet CSV, values stripped.
+    Lines with a blank required value or a value too long for its column are
+    reported as invalid; a repeated `key` as a duplicate.
+    """
+    rows, seen = [], set()
+    with open(csv_path, newline='', encoding='utf-8') as csvfile:
+        reader = csv.DictReader(csvfile)
+        missing = [c for c in columns if c not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV is missing column(s): {', '.join(missing)}")
+        for line_num, raw in enumerate(reader, start=2):
+            report["rows_read"] += 1
+            row = {c: str(raw.get(c) or "").strip() for c in (*columns, *optional)}
+            blank = [c for c in columns if not row[c]]
+            too_long = [c for c in row if len(row[c]) > CATALOG_MAX_LENGTHS.get(c, len(row[c]))]
+            if blank:
+                _row_result(report, line_num, row[key], "invalid", f"is missing {', '.join(blank)}")
+            elif too_long:
+                _row_result(report, line_num, row[key], "invalid",
+                            ", ".join(f"{c} is longer than {CATALOG_MAX_LENGTHS[c]} characters" for c in too_long))
+            elif row[key] in seen:
+                _row_result(report, line_num, row[key], "duplicate", "appears earlier in the file")
+            else:
+                seen.add(row[key])
+                rows.append((line_num, row))
+    return rows
+
+def _products_for_models(model_numbers):
+    """{model_number: product_id} for the model numbers that exist, in one batched lookup."""
+    found = {}
+    for chunk in _chunked(sorted(set(model_numbers)), CATALOG_LOOKUP_SIZE):
+        resp = engine.select_products_by_models(chunk)
+        if not _ensure_response_ok(resp, "lookup model->product_id"):
+            raise RuntimeError("model number lookup failed")
         for r in (resp.data or []):
-            pallet_map[str(r['pallet_id']).strip()] = r['product_id']
+            found.setdefault(r["model_number"], r["product_id"])
+    return found
 
-        # Build payload with resolved resolved_product_id
-        payload = []
-        for item_id, serial, pallet_id in rows_to_import:
-            product_id = pallet_map.get(pallet_id)
-            if product_id is None:
-                print(f'Pallet "{pallet_id}" not found - row skipped')
-                continue
-            
-            payload.append({
-                "item_id": item_id,
-                "serial_number": serial,
-                "pallet_id": pallet_id,
-                "product_id": product_id,
-            })
+def _existing_pallet_ids(pallet_ids):
+    """The pallet_ids that already exist, in one batched lookup."""
+    found = set()
+    for chunk in _chunked(sorted(set(pallet_ids)), CATALOG_LOOKUP_SIZE):
+        resp = engine.select_pallet_products(chunk)
+        if not _ensure_response_ok(resp, "lookup existing pallets"):
+            raise RuntimeError("pallet lookup failed")
+        found.update(str(r["pallet_id"]).strip() for r in (resp.data or []))
+    return found
 
-        if not payload:
-            print('No valid rows to insert after validation')
-            return 0
+def _insert_catalog_batches(report, rows, key, insert, on_inserted, batch_size, on_progress):
+    """Insert (line_num, payload) rows batch_size at a time, recording each row's result."""
+    for batch_num, batch in enumerate(_chunked(rows, batch_size), start=1):
+        try:
+            resp = insert([payload for _, payload in batch])
+            if not _ensure_response_ok(resp, f"CSV batch {batch_num}"):
+                raise RuntimeError("insert rejected")
+            for r in (resp.data or []):
+                on_inserted(r)
+            for line_num, payload in batch:
+                _row_result(report, line_num, payload[key], "inserted")
+        except Exception as e:
+            print(f'Batch {batch_num} (lines {batch[0][0]}-{batch[-1][0]}) failed: {e}')
+            for line_num, payload in batch:
+                _row_result(report, line_num, payload[key], "failed", f"not inserted: {e}")
+        if on_progress:
+            on_progress(report)
+
+@metrics.timed
+def importProductsFromCsv(csv_path, batch_size=CSV_IMPORT_BATCH_SIZE, on_progress=None):
+    """
+    Import products from a CSV with headers product_name, model_number and
+    (optionally) product_description. Model numbers already in the database
+    are skipped; product_ids are reserved for the whole file in one call.
+    on_progress(report) is called after every batch.
+    Returns a report dict: rows_read, the count of each status, and rows (see above).
+    """
+    report = _catalog_report()
+    try:
+        rows = _read_catalog_csv(csv_path, PRODUCT_CSV_COLUMNS, ("product_description",), report, "model_number")
+        existing = _products_for_models(row["model_number"] for _, row in rows)
+        new = []
+        for line_num, row in rows:
+            if row["model_number"] in existing:
+                _row_result(report, line_num, row["model_number"], "duplicate", "already exists")
+            else:
+                new.append((line_num, row))
 
-        # Bulk insert
-        resp_insert = supabase.table("item").insert(payload).execute()
-        if not _ensure_response_ok(resp_insert, "bulk insert from CSV"):
-            return 0
+        ids = product_ids.take(len(new)) if new else []
+        payload = [(line_num, {
+            "product_id": product_id,
+            "product_name": row["product_name"],
+            "product_description": row["product_description"],
+            "model_number": row["model_number"],
+        }) for product_id, (line_num, row) in zip(ids, new)]
+        _insert_catalog_batches(report, payload, "model_number", engine.insert_products,
+                                inventory_index.add_product, batch_size, on_progress)
+        print(f'Inserted {report["inserted"]} of {report["rows_read"]} products from {csv_path}')
+    except Exception as e:
+        print(f'Import failed: {e}')
+        report["error"] = str(e)
+    report["rows"].sort(key=lambda r: r["line"])
+    return report
+
+@metrics.timed
+def importPalletsFromCsv(csv_path, batch_size=CSV_IMPORT_BATCH_SIZE, on_progress=None):
+    """
+    Import pallets from a CSV with headers pallet_id, shelf_id, model_number
+    and (optionally) notes. Model numbers are resolved to product_ids in one
+    batched lookup; pallets that already exist are skipped, and shelves
+    that don't exist yet are added with their batch.
+    on_progress(report) is called after every batch.
+    Returns a report dict: rows_read, the count of each status, shelves_added and rows (see above).
+    """
+    report = _catalog_report()
+    report["shelves_added"] = 0
+    try:
+        rows = _read_catalog_csv(csv_path, PALLET_CSV_COLUMNS, ("notes",), report, "pallet_id")
+        products = _products_for_models(row["model_number"] for _, row in rows)
+        existing = _existing_pallet_ids(row["pallet_id"] for _, row in rows)
+        payload = []
+        for line_num, row in rows:
+            if row["pallet_id"] in existing:
+                _row_result(report, line_num, row["pallet_id"], "duplicate", "already exists")
+            elif row["model_number"] not in products:
+                _row_result(report, line_num, row["pallet_id"], "not_found", f'has unknown model "{row["model_number"]}"')
+            else:
+                payload.append((line_num, {
+                    "pallet_id": row["pallet_id"],
+                    "shelf_id": row["shelf_id"],
+                    "product_id": products[row["model_number"]],
+                    "notes": row["notes"] or "N/A",
+                }))
 
-        inserted = len(resp_insert.data or [])
-        print(f'Inserted {inserted} items from {csv_path}')
-        return inserted
+        def insert_pallets(batch):
+            # Pallets reference their shelf; existing shelves are skipped
+            shelves = sorted({p["shelf_id"] for p in batch})
+            resp = engine.insert_shelves([{"shelf_id": shelf_id} for shelf_id in shelves])
+            if not _ensure_response_ok(resp, "add shelves"):
+                raise RuntimeError("could not add shelves")
+            report["shelves_added"] += len(resp.data or [])
+            return engine.insert_pallets(batch)
 
+        _insert_catalog_batches(report, payload, "pallet_id", insert_pallets,
+                                inventory_index.add_pallet, batch_size, on_progress)
+        print(f'Inserted {report["inserted"]} of {report["rows_read"]} pallets from {csv_path}')
     except Exception as e:
         print(f'Import failed: {e}')
-        return 0
+        report["error"] = str(e)
+    report["rows"].sort(key=lambda r: r["line"])
+    return report
+
+# Exports (see snapshotExport.py): "item", "pallet", "product" or "pallet_info"
+# to .csv.gz, .csv, .parquet or .arrow. The last export of each dataset is
+# recorded in the state file, so an incremental export continues from it.
+EXPORT_STATE_FILE = os.getenv("INVENTORY_EXPORT_STATE", "inventory-export-state.json")
+EXPORT_DATASETS = tuple(snapshotExport.DATASETS)
+
+def _record_export(state_path, dataset, path, position):
+    state = snapshotExport.load_state(state_path)
+    state[dataset] = {"position": position, "path": path, "at": datetime.now().isoformat(timespec="seconds")}
+    snapshotExport.save_state(state_path, state)
+
+@metrics.timed
+def exportSnapshot(dataset, path, on_progress=None, state_path=EXPORT_STATE_FILE):
+    """
+    Export every row of a dataset in pages (bounded memory).
+    on_progress(rows) is called after every page.
+    Returns a report dict: dataset, path, rows, position, seconds.
+    """
+    report = {"dataset": dataset, "path": path, "rows": 0, "position": None}
+    try:
+        # Export pages are read once, so they bypass the query cache
+        report.update(snapshotExport.export_snapshot(engine.engine, dataset, path, on_progress=on_progress))
+        if report["position"] is not None:
+            _record_export(state_path, dataset, path, report["position"])
+        print(f'Exported {report["rows"]} {dataset} rows to {path} in {report["seconds"]:.1f}s')
+    except Exception as e:
+        print(f'Export failed: {e}')
+        report["error"] = str(e)
+    return report
+
+@metrics.timed
+def exportChanges(dataset, path, on_progress=None, state_path=EXPORT_STATE_FILE):
+    """
+    Export only the rows of a dataset changed since its last export, each
+    marked "upsert" or "delete" in an _op column.
+    Returns a report dict: dataset, path, since, rows, deleted, position, seconds.
+    """
+    report = {"dataset": dataset, "path": path, "since": None, "rows": 0, "deleted": 0, "position": None}
+    try:
+        # State saved before positions carried a txid has no "position": it needs a full export again
+        since = snapshotExport.load_state(state_path).get(dataset, {}).get("position")
+        if since is None:
+            raise RuntimeError(f"no earlier export of {dataset} to continue from - run a full export first")
+        report["since"] = since
+        report.update(snapshotExport.export_changes(engine.engine, dataset, path, since, on_progress=on_progress))
+        _record_export(state_path, dataset, path, report["position"])
+        print(f'Exported {report["rows"]} changed and {report["deleted"]} deleted {dataset} rows to {path}')
+    except Exception as e:
+        print(f'Export failed: {e}')
+        report["error"] = str(e)
+    return report
+
+@metrics.timed
+def pruneChangeLog(days):
+    """Delete change-log entries older than `days`; returns how many, or None on error."""
+    try:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        resp = engine.prune_changes(cutoff.strftime("%Y-%m-%d %H:%M:%S"))
+        print(f"Pruned {resp.count} change-log entries older than {days} days")
+        return resp.count
+    except Exception as e:
+        print(f"Error pruning change log: {e}")
+        return None
+
+# Global search (searchIndex.py / searchIndex.sql)
+# Results per search, and the shortest query searched
+SEARCH_LIMIT = 20
+SEARCH_MIN_LENGTH = 2
+
+@metrics.timed
+def searchInventory(query, limit=SEARCH_LIMIT):
+    """
+    Ranked matches for part of a serial, model number, product name or
+    description, best first (dicts with kind, key, field, text, score,
+    item_id, pallet_id and model_number). The local search index answers while the
+    change feed keeps it current; otherwise the database searches (pg_trgm).
+    """
+    query = str(query or "").strip()
+    if len(query) < SEARCH_MIN_LENGTH:
+        return []
+    if change_feed.live:
+        rows = search_index.search(query, limit)
+        if rows is not None:
+            return rows
+    try:
+        resp = engine.search_inventory(query, limit)
+        if not _ensure_response_ok(resp, "search inventory"):
+            return []
+        return resp.data or []
+    except Exception as e:
+        print(f"Error searching for '{query}': {e}")
+        return []
 
 # Analytics Functions
+@metrics.timed
 def countItemsByModel():
-    """Get item count by model number from view."""
+    """Get item count by model number from the trigger-maintained counts."""
     try:
-        resp = supabase.table("stock_counts").select("*").execute()
+        resp = engine.select_stock_counts()
         return resp.data or []
     except Exception as e:
         print(f"Error fetching stock counts: {e}")
         return []
 
+@metrics.timed
 def countPalletsByModel():
-    """Get pallet count by model number from view."""
+    """Get pallet count by model number from the trigger-maintained counts."""
     try:
-        resp = supabase.table("pallet_counts_by_model").select("*").execute()
+        resp = engine.select_pallet_counts()
         return resp.data or []
     except Exception as e:
         print(f"Error fetching pallet counts: {e}")
         return []
 
+@metrics.timed
+def checkModelCounts():
+    """
+    Compare the maintained product counts with a full recount.
+    Returns the mismatched rows (empty when consistent), or None on error.
+    """
+    try:
+        resp = engine.check_counts()
+        if not _ensure_response_ok(resp, "check model counts"):
+            return None
+        return resp.data or []
+    except Exception as e:
+        print(f"Error checking model counts: {e}")
+        return None
+
+@metrics.timed
+def rebuildModelCounts():
+    """Recompute the maintained product counts from the item and pallet tables."""
+    try:
+        resp = engine.rebuild_counts()
+        if not _ensure_response_ok(resp, "rebuild model counts"):
+            return False
+        print(f"Rebuilt counts for {resp.data[0]['rebuilt']} products")
+        return True
+    except Exception as e:
+        print(f"Error rebuilding model counts: {e}")
+        return False
+
+@metrics.timed
 def getPalletInfo():
     """Get pallet info (ID, shelf, model number) from the view."""
+    rows = inventory_index.pallet_info()
+    if rows is not None:
+        return rows
     try:
-        resp = supabase.table("pallet_info_view").select("*").execute()
+        resp = engine.select_pallet_info()
         return resp.data or []
     except Exception as e:
         print(f"Error fetching pallet info: {e}")
         return []
     
+@metrics.timed
 def viewPalletByAisle(aisle):
     """Get pallet info (ID, shelf, model) filtered by aisle location."""
     try:
-        # Start query on the pallet_info_view
-        query = supabase.table("pallet_info_view").select("pallet_id, shelf_id, model_number")
-        
-        if aisle == 'Narrow Aisle': # Shelf ids starting with 1, or starting with 2 but NOT 298 or 299
-            query = query.or_("shelf_id.like.1*,and(shelf_id.like.2*,shelf_id.not.in.(298-1,298-2,298-3,298-4,299-1,299-2,299-3,299-4))")
-
-        elif aisle == 'Wide Aisle': # Shelf ids starting with 3 or 4, PLUS shelves 298 and 299
-            query = query.or_("shelf_id.like.3%,shelf_id.like.4%,shelf_id.eq.298-1,shelf_id.eq.298-2,shelf_id.eq.298-3,shelf_id.eq.298-4,shelf_id.eq.299-1,shelf_id.eq.299-2,shelf_id.eq.299-3,shelf_id.eq.299-4")
-
-        elif aisle == 'Cable Aisle': # Shelf ids beginning with a 5 and 6
-            query = query.or_("shelf_id.like.5%,shelf_id.like.6%")
-
-        elif aisle == 'Aisle 4': #Shelf ids beginning with a 7
-            query = query.like("shelf_id", "7%")
-
-        elif aisle == 'Loading bay': #Sheld ids that are exactly 'Lb'
-            query = query.eq("shelf_id", "Lb")
-        else:
-            return [] # Return empty list if aisle is not recognized
+        if not aisle:
+            return []
 
-        resp = query.execute()
+        # Shelves carry their aisle (aisleModel.sql), so this is an indexed lookup
+        resp = engine.select_pallets_by_aisle(aisle)
 
         if not _ensure_response_ok(resp, f"view pallets by aisle {aisle}"):
             return []
@@ -359,12 +1413,12 @@ def viewPalletByAisle(aisle):
         print(f'Error fetching pallets from that aisle: {e}')
         return []
 
-# Cached Fetch Helpers (with TTL-like behavior via manual cache clearing)
-@lru_cache(maxsize=1)
+# Dropdown Fetch Helpers (cached by the engine's query cache)
+@metrics.timed
 def fetch_model_numbers():
     """Fetch all model numbers (cached)."""
     try:
-        resp = supabase.table("product").select("model_number").order("model_number", desc=False).execute()
+        resp = engine.list_model_numbers()
         if not _ensure_response_ok(resp, "fetch model numbers"):
             return []
         return tuple(r["model_number"] for r in (resp.data or []) if r.get("model_number"))
@@ -372,11 +1426,11 @@ def fetch_model_numbers():
         print(f"Failed to fetch model numbers: {e}")
         return []
 
-@lru_cache(maxsize=1)
+@metrics.timed
 def fetch_pallet_ids():
     """Fetch all pallet IDs (cached)."""
     try:
-        resp = supabase.table("pallet").select("pallet_id").order("pallet_id", desc=False).execute()
+        resp = engine.list_pallet_ids()
         if not _ensure_response_ok(resp, "fetch pallet ids"):
             return []
         return tuple(r["pallet_id"] for r in (resp.data or []) if r.get("pallet_id"))
@@ -384,7 +1438,54 @@ def fetch_pallet_ids():
         print(f"Failed to fetch pallet ids: {e}")
         return []
 
+@metrics.timed
+def fetch_aisle_names():
+    """Fetch all aisle names in display order (cached)."""
+    try:
+        resp = engine.list_aisles()
+        if not _ensure_response_ok(resp, "fetch aisles"):
+            return []
+        return tuple(r["aisle_name"] for r in (resp.data or []))
+    except Exception as e:
+        print(f"Failed to fetch aisles: {e}")
+        return []
+
+@metrics.timed
+def getAisleRules():
+    """Shelf-prefix -> aisle rules as a list of dicts, or None on error."""
+    try:
+        resp = engine.list_aisle_rules()
+        if not _ensure_response_ok(resp, "fetch aisle rules"):
+            return None
+        return resp.data or []
+    except Exception as e:
+        print(f"Failed to fetch aisle rules: {e}")
+        return None
+
+@metrics.timed
+def setAisleRules(rules):
+    """
+    Replace the shelf-prefix rules with `rules` ((shelf_prefix, aisle_name) pairs)
+    and re-derive every shelf's aisle. Returns the number of shelves reassigned, or None on error.
+    """
+    payload = [{"shelf_prefix": str(p).strip(), "aisle_name": str(a).strip()} for p, a in rules]
+    try:
+        resp = engine.set_aisle_rules(payload)
+        if not _ensure_response_ok(resp, "set aisle rules"):
+            return None
+        return resp.data[0]["reassigned"]
+    except Exception as e:
+        print(f"Failed to set aisle rules: {e}")
+        return None
+
 def clear_dropdown_cache():
     """Clear cached dropdown data when new products/pallets are added."""
-    fetch_model_numbers.cache_clear()
-    fetch_pallet_ids.cache_clear()
+    query_cache.invalidate("product", "pallet")
+
+def invalidate_cache(*tables):
+    """Drop cached reads of the given tables (everything when none given)."""
+    query_cache.invalidate(*tables)
+
+def cache_stats():
+    """Hit/miss counters of the backend query cache."""
+    return query_cache.stats()
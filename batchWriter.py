@@ -0,0 +1,154 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from metrics import metrics
+
+# Rows per insert request, serials per delete request (deletes go in the URL)
+INSERT_BATCH_SIZE = 500
+DELETE_BATCH_SIZE = 200
+MAX_WORKERS = 4
+
+def _unreachable(e):
+    """Default: errors that mean the database couldn't be reached."""
+    return isinstance(e, (ConnectionError, TimeoutError))
+
+def _chunks(seq, size):
+    return [seq[i:i + size] for i in range(0, len(seq), size)]
+
+class BatchWriter:
+    """
+    Splits large item inserts/deletes into sized chunks and sends them
+    concurrently over a bounded thread pool.
+    Results are combined into one report dict per call. Failed rows whose
+    error is_offline(e) accepts are also listed under "unreachable", so a
+    caller can retry them later instead of treating them as rejected.
+    """
+    def __init__(self, engine, insert_batch_size=INSERT_BATCH_SIZE,
+                 delete_batch_size=DELETE_BATCH_SIZE, max_workers=MAX_WORKERS, is_offline=_unreachable):
+        self.engine = engine
+        self.is_offline = is_offline
+        self.insert_batch_size = insert_batch_size
+        self.delete_batch_size = delete_batch_size
+        self.max_workers = max_workers
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="batch-writer")
+        return self._pool
+
+    def _run(self, fn, chunks):
+        """Run fn over every chunk; single chunks skip the pool entirely."""
+        if len(chunks) == 1:
+            return [fn(chunks[0])]
+        # Each chunk runs in a copy of the caller's context, so its calls count towards the caller's metrics
+        contexts = [contextvars.copy_context() for _ in chunks]
+        return list(self._executor().map(lambda ctx, chunk: ctx.run(fn, chunk), contexts, chunks))
+
+    # Inserts
+    def insert_items(self, items, ignore_conflicts=False):
+        """
+        Insert item dicts in concurrent chunks.
+        Returns {"inserted": [serials], "duplicates": [serials], "failed": [(serial, reason)],
+        "unreachable": [serials]}. Serials repeated within `items` are reported as duplicates.
+        """
+        result = {"inserted": [], "duplicates": [], "failed": [], "unreachable": []}
+        payload = []
+        seen = set()
+        for item in items:
+            serial = item.get("serial_number")
+            if serial in seen:
+                result["duplicates"].append(serial)
+                continue
+            seen.add(serial)
+            payload.append(item)
+
+        if not payload:
+            return result
+
+        chunk_results = self._run(
+            lambda chunk: self._insert_chunk(chunk, ignore_conflicts),
+            _chunks(payload, self.insert_batch_size),
+        )
+        for chunk_result in chunk_results:
+            for key in result:
+                result[key].extend(chunk_result[key])
+        return result
+
+    def _fail(self, result, serials, e):
+        serials = list(serials)
+        result["failed"].extend((serial, str(e)) for serial in serials)
+        if self.is_offline(e):
+            result["unreachable"].extend(serials)
+
+    def _insert_chunk(self, chunk, ignore_conflicts):
+        result = {"inserted": [], "duplicates": [], "failed": [], "unreachable": []}
+        try:
+            resp = self.engine.insert_items(chunk, ignore_conflicts=ignore_conflicts)
+            inserted = {r.get("serial_number") for r in (resp.data or [])}
+            for item in chunk:
+                serial = item["serial_number"]
+                # Upserts that ignore conflicts silently drop existing serials
+                (result["inserted"] if serial in inserted else result["duplicates"]).append(serial)
+            return result
+        except Exception as e:
+            first_error = e
+
+        # The chunk was rejected as a whole: split out serials already in the
+        # database and retry the rest once.
+        try:
+            resp = self.engine.select_existing_serials([item["serial_number"] for item in chunk])
+            existing = {r["serial_number"] for r in (resp.data or [])}
+        except Exception as e:
+            self._fail(result, (item["serial_number"] for item in chunk), e)
+            return result
+
+        remaining = [item for item in chunk if item["serial_number"] not in existing]
+        result["duplicates"].extend(item["serial_number"] for item in chunk if item["serial_number"] in existing)
+        if not remaining:
+            return result
+        if len(remaining) == len(chunk):
+            self._fail(result, (item["serial_number"] for item in chunk), first_error)
+            return result
+
+        metrics.retry()
+        try:
+            resp = self.engine.insert_items(remaining)
+            result["inserted"].extend(r.get("serial_number") for r in (resp.data or []))
+        except Exception as e:
+            self._fail(result, (item["serial_number"] for item in remaining), e)
+        return result
+
+    # Deletes
+    def delete_serials(self, serials):
+        """
+        Delete items by serial number in concurrent chunks.
+        Returns {"deleted": [serials], "not_found": [serials], "failed": [(serial, reason)],
+        "unreachable": [serials]}.
+        """
+        result = {"deleted": [], "not_found": [], "failed": [], "unreachable": []}
+        unique = list(dict.fromkeys(s for s in serials if s))
+        if not unique:
+            return result
+
+        for chunk_result in self._run(self._delete_chunk, _chunks(unique, self.delete_batch_size)):
+            for key in result:
+                result[key].extend(chunk_result[key])
+        return result
+
+    def _delete_chunk(self, chunk):
+        result = {"deleted": [], "not_found": [], "failed": [], "unreachable": []}
+        try:
+            resp = self.engine.delete_items_by_serials(chunk)
+        except Exception as e:
+            self._fail(result, chunk, e)
+            return result
+
+        deleted = {r.get("serial_number") for r in (resp.data or [])}
+        for serial in chunk:
+            (result["deleted"] if serial in deleted else result["not_found"]).append(serial)
+        return result
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
@@ -0,0 +1,226 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from syntheticData import WarehouseGenerator
+
+# ---------------- Benchmarks ----------------
+# python benchmark.py                              SQLite stand-in, 100k items
+# python benchmark.py --items 2000000              the same with 2M items
+# python benchmark.py --engine supabase --load     load and measure a local Supabase/Postgres stack
+# python benchmark.py --compare benchmarks/old.json
+#                                                  exit 1 if p50/p99 regressed against a saved run
+
+DEFAULT_SAMPLES = 30
+SCAN_BATCH_SIZE = 50
+CSV_IMPORT_ROWS = 20000
+CSV_IMPORT_RUNS = 3
+# A result regresses when its p50 or p99 grows by more than this factor
+REGRESSION_THRESHOLD = 1.25
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def summarize(latencies, units=0):
+    """Latency stats in milliseconds plus operations (and rows/items) per second."""
+    total = sum(latencies)
+    result = {
+        "samples": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(total / len(latencies) * 1000, 3),
+        "min_ms": round(min(latencies) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+        "ops_per_s": round(len(latencies) / total, 2) if total else None,
+    }
+    if units:
+        result["units"] = units
+        result["units_per_s"] = round(units / total, 1) if total else None
+    return result
+
+def measure(calls, before=None):
+    """
+    Time each zero-argument call in `calls`. `before` runs untimed ahead of
+    each call (used to drop the query cache so every sample hits the database).
+    """
+    latencies = []
+    for call in calls:
+        if before:
+            before()
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def configure_engine(args):
+    """Point the backend at the engine to measure; must run before backend is imported."""
+    os.environ["INVENTORY_ENGINE"] = args.engine
+    os.environ["INVENTORY_INDEX"] = "1" if args.index else "0"
+    # No per-call metrics log unless asked for; it would be part of every measured call
+    os.environ.setdefault("INVENTORY_METRICS_FILE", "")
+    if args.engine != "sqlite":
+        return
+    path = args.sqlite_path or os.path.join(tempfile.gettempdir(), f"inventory-bench-{args.seed}.db")
+    if not args.reuse:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    os.environ["INVENTORY_SQLITE_PATH"] = path
+
+def run_benchmarks(backend, generator, args):
+    import asyncBackend
+
+    rng = random.Random(args.seed)
+    pallets = [p["pallet_id"] for p in generator.pallets()]
+    products = [p["product_id"] for p in generator.products()]
+    aisles = list(backend.fetch_aisle_names()) or [None]
+    cold = backend.invalidate_cache if not args.warm else None
+    samples = args.samples
+    results = {}
+
+    def record(name, latencies, units=0):
+        results[name] = summarize(latencies, units)
+        r = results[name]
+        rate = f"  {r['units_per_s']:>10} rows/s" if units else ""
+        print(f"  {name:<18} p50 {r['p50_ms']:>9.2f} ms   p99 {r['p99_ms']:>9.2f} ms   {r['ops_per_s']:>8} ops/s{rate}")
+
+    # Writes: scan-in batches, then remove the same serials
+    batches = []
+    for n in range(samples):
+        items = list(generator.iter_items(args.scan_batch, start_id=n * args.scan_batch, tag="B"))
+        for item in items:
+            del item["item_id"] # reserved by the backend, as in the GUI
+        batches.append(items)
+    record("scan_in", measure([lambda b=b: backend.bulkScanItems(b) for b in batches]),
+           units=args.scan_batch * samples)
+    record("bulk_remove", measure([lambda b=b: backend.bulkRemoveItems([i["serial_number"] for i in b])
+                                   for b in batches]), units=args.scan_batch * samples)
+
+    # CSV import of fresh files
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for run in range(args.csv_runs):
+            item_ids = backend.allocate_item_ids(args.csv_rows)
+            paths.append(generator.write_csv(os.path.join(tmp, f"import-{run}.csv"), item_ids, tag=f"C{run}-"))
+        record("csv_import", measure([lambda p=p: backend.streamImportFromCsv(p) for p in paths]),
+               units=args.csv_rows * args.csv_runs)
+
+    # Listings
+    sample_pallets = [rng.choice(pallets) for _ in range(samples)]
+    sample_products = [rng.choice(products) for _ in range(samples)]
+    record("list_by_pallet", measure([lambda p=p: backend.selectItemsByPallet(p) for p in sample_pallets], cold))
+    record("page_by_pallet", measure([lambda p=p: backend.selectItemsPage("pallet_id", p) for p in sample_pallets], cold))
+    record("list_by_model", measure([lambda p=p: backend.selectItemsByProduct(p) for p in sample_products], cold))
+    record("page_by_model", measure([lambda p=p: backend.selectItemsPage("product_id", p) for p in sample_products], cold))
+
+    # Count views and tab loaders
+    record("stock_counts", measure([backend.countItemsByModel] * samples, cold))
+    record("pallet_counts", measure([backend.countPalletsByModel] * samples, cold))
+    record("pallet_info", measure([backend.getPalletInfo] * samples, cold))
+    record("view_by_aisle", measure([lambda a=rng.choice(aisles): backend.viewPalletByAisle(a)
+                                     for _ in range(samples)], cold))
+    record("startup_overview", measure([lambda: asyncBackend.run(asyncBackend.load_overview())] * samples, cold))
+
+    # Global search for the end of a serial: the engine's search, then the local index
+    serials = [row[1] for p in sample_pallets for row in backend.selectItemsPage("pallet_id", p, limit=1)]
+    queries = [s[-6:] for s in serials] or ["000"]
+    record("search_db", measure([lambda q=q: backend.searchInventory(q) for q in queries], cold))
+    if backend.load_search_index():
+        record("search_local", measure([lambda q=q: backend.search_index.search(q) for q in queries]))
+    return results
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """Names of results whose p50 or p99 grew by more than `threshold` over the baseline."""
+    regressions = []
+    for name, new in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            continue
+        for stat in ("p50_ms", "p99_ms"):
+            if old[stat] and new[stat] > old[stat] * threshold:
+                print(f"  REGRESSION {name} {stat}: {old[stat]:.2f} ms -> {new[stat]:.2f} ms")
+                regressions.append(name)
+                break
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inventory backend benchmarks")
+    parser.add_argument("--engine", default="sqlite", choices=("sqlite", "supabase"))
+    parser.add_argument("--sqlite-path", help="SQLite file (default: a file in the temp directory)")
+    parser.add_argument("--reuse", action="store_true", help="Keep an existing SQLite file and its data")
+    parser.add_argument("--load", action="store_true", help="Load synthetic data into a non-SQLite engine first")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--shelves", type=int, default=500)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--pallets", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES)
+    parser.add_argument("--scan-batch", type=int, default=SCAN_BATCH_SIZE)
+    parser.add_argument("--csv-rows", type=int, default=CSV_IMPORT_ROWS)
+    parser.add_argument("--csv-runs", type=int, default=CSV_IMPORT_RUNS)
+    parser.add_argument("--index", action="store_true", help="Measure with the in-memory inventory index loaded")
+    parser.add_argument("--warm", action="store_true", help="Keep the query cache between read samples")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/<engine>-<time>.json)")
+    parser.add_argument("--compare", help="Earlier result JSON to check for regressions")
+    args = parser.parse_args(argv)
+
+    configure_engine(args)
+    backend = importlib.import_module("backend")
+    generator = WarehouseGenerator(args.seed, args.shelves, args.products, args.pallets, args.items)
+
+    has_data = bool(backend.fetch_pallet_ids())
+    if (args.engine == "sqlite" and not has_data) or args.load:
+        print(f"Loading synthetic warehouse {generator.sizes()}...")
+        start = time.perf_counter()
+        loaded = generator.load(backend.engine, on_progress=lambda n: print(f"  {n} items loaded", end="\r"))
+        print(f"Loaded {loaded} items in {time.perf_counter() - start:.1f}s")
+        backend.invalidate_cache()
+    if args.index:
+        backend.load_inventory_index()
+
+    print(f"Running benchmarks against {args.engine}...")
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "engine": args.engine,
+            "data": generator.sizes(),
+            "samples": args.samples,
+            "scan_batch": args.scan_batch,
+            "csv_rows": args.csv_rows,
+            "index": args.index,
+            "warm_cache": args.warm,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": run_benchmarks(backend, generator, args),
+    }
+
+    output = args.output or os.path.join("benchmarks", f"{args.engine}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("data") != report["meta"]["data"]:
+            print("Warning: baseline was measured on a different data set")
+        regressions = compare(baseline, report)
+        print(f"{len(regressions)} regressions against {args.compare}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+
+# Tables whose changes are streamed to subscribers
+FEED_TABLES = ("item", "pallet", "product")
+
+class ChangeFeed:
+    """
+    Fan-out of row change events to subscribers.
+    An event is a dict: {"table", "type" (INSERT/UPDATE/DELETE), "record", "old_record"}.
+    Callbacks run on the thread that published the event.
+    `live` is True only while every change to the database reaches the feed,
+    so local copies patched from it are complete; a source that sees only
+    some changes (e.g. one process's own writes) still publishes but leaves it False.
+    """
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self.live = False
+
+    def subscribe(self, callback):
+        """Register a callback; returns a function that unsubscribes it."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def publish(self, table, event_type, record=None, old_record=None):
+        event = {
+            "table": table,
+            "type": event_type,
+            "record": record or {},
+            "old_record": old_record or {},
+        }
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Change feed subscriber failed on {table} {event_type}: {e}")
+
+class SupabaseRealtimeSource:
+    """
+    Streams Postgres changes for FEED_TABLES from Supabase Realtime into a ChangeFeed.
+    Runs its own asyncio loop in a daemon thread. Requires the tables to be in
+    the supabase_realtime publication (see realtimeSetup.sql).
+    """
+    def __init__(self, url, key, feed):
+        self.url = url
+        self.key = key
+        self.feed = feed
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), daemon=True)
+            self._thread.start()
+
+    async def _run(self):
+        from supabase import acreate_client
+        try:
+            client = await acreate_client(self.url, self.key)
+            channel = client.channel("inventory-changes")
+            for table in FEED_TABLES:
+                channel.on_postgres_changes("*", schema="public", table=table, callback=self._on_change)
+            await channel.subscribe(self._on_status)
+            # Keep the loop (and socket) alive for the life of the app
+            await asyncio.Event().wait()
+        except Exception as e:
+            self.feed.live = False
+            print(f"Realtime change feed stopped: {e}")
+
+    def _on_status(self, status, error=None):
+        self.feed.live = str(status).endswith("SUBSCRIBED")
+        if error:
+            print(f"Realtime subscription error: {error}")
+
+    def _on_change(self, payload):
+        data = payload.get("data", {})
+        self.feed.publish(data.get("table"), data.get("type"), data.get("record"), data.get("old_record"))
@@ -0,0 +1,112 @@
+-- Row change log behind incremental exports (snapshotExport.py). Every insert,
+-- update and delete on shelf, product, pallet and item appends (table, key, op),
+-- so an export can fetch only the rows changed after the position its last
+-- export ended at. Prune old entries with `python maintenance.py prune-changes`.
+create table if not exists change_log (
+    change_id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    txid BIGINT NOT NULL DEFAULT pg_current_xact_id()::text::bigint,  -- writing transaction
+    table_name TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    op CHAR(1) NOT NULL,                -- I, U, D
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+-- Logs created before txid was added
+alter table change_log add column if not exists txid BIGINT NOT NULL DEFAULT pg_current_xact_id()::text::bigint;
+create index if not exists idx_change_log_position on change_log(table_name, txid, change_id);
+create index if not exists idx_change_log_changed_at on change_log(changed_at);
+drop index if exists idx_change_log_table;
+
+-- A change_id is taken when the row is written, not when its transaction
+-- commits, so ids become visible out of order: reading "change_id > last"
+-- would skip a change committed after a higher id was read. Exports instead
+-- read in (txid, change_id) order and only changes of transactions older than
+-- the snapshot's xmin, which have all finished; every change still to come
+-- then sorts after the position reached.
+create or replace function select_changes(p_tables text[], p_after_txid bigint, p_after_change_id bigint, p_limit int)
+returns table (txid bigint, change_id bigint, table_name text, row_key text, op char(1))
+language sql
+stable
+as $$
+    select c.txid, c.change_id, c.table_name, c.row_key, c.op
+    from change_log c
+    where c.table_name = any(p_tables)
+      and c.txid < pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+      and (c.txid, c.change_id) > (p_after_txid, p_after_change_id)
+    order by c.txid, c.change_id
+    limit p_limit;
+$$;
+
+-- Position a full export continues from: changes of every transaction still
+-- open (and any started later) sort after it.
+create or replace function change_log_position()
+returns table (txid bigint, change_id bigint)
+language sql
+stable
+as $$
+    select pg_snapshot_xmin(pg_current_snapshot())::text::bigint, 0::bigint;
+$$;
+
+-- Statement-level triggers: one insert per statement, not per row.
+-- TG_ARGV[0] is the table's key column.
+create or replace function change_log_rows()
+returns trigger
+language plpgsql
+as $$
+begin
+    if TG_OP in ('INSERT', 'UPDATE') then
+        insert into change_log (table_name, row_key, op)
+        select TG_TABLE_NAME, to_jsonb(n) ->> TG_ARGV[0], left(TG_OP, 1) from new_rows n;
+    end if;
+    if TG_OP = 'DELETE' then
+        insert into change_log (table_name, row_key, op)
+        select TG_TABLE_NAME, to_jsonb(o) ->> TG_ARGV[0], 'D' from old_rows o;
+    elsif TG_OP = 'UPDATE' then
+        -- A changed key removes the row under its old key
+        insert into change_log (table_name, row_key, op)
+        select TG_TABLE_NAME, k, 'D'
+        from (select to_jsonb(o) ->> TG_ARGV[0] as k from old_rows o
+              except select to_jsonb(n) ->> TG_ARGV[0] from new_rows n) gone;
+    end if;
+    return null;
+end;
+$$;
+
+create or replace trigger item_change_log_insert after insert on item
+    referencing new table as new_rows
+    for each statement execute function change_log_rows('item_id');
+create or replace trigger item_change_log_update after update on item
+    referencing old table as old_rows new table as new_rows
+    for each statement execute function change_log_rows('item_id');
+create or replace trigger item_change_log_delete after delete on item
+    referencing old table as old_rows
+    for each statement execute function change_log_rows('item_id');
+
+create or replace trigger pallet_change_log_insert after insert on pallet
+    referencing new table as new_rows
+    for each statement execute function change_log_rows('pallet_id');
+create or replace trigger pallet_change_log_update after update on pallet
+    referencing old table as old_rows new table as new_rows
+    for each statement execute function change_log_rows('pallet_id');
+create or replace trigger pallet_change_log_delete after delete on pallet
+    referencing old table as old_rows
+    for each statement execute function change_log_rows('pallet_id');
+
+create or replace trigger product_change_log_insert after insert on product
+    referencing new table as new_rows
+    for each statement execute function change_log_rows('product_id');
+create or replace trigger product_change_log_update after update on product
+    referencing old table as old_rows new table as new_rows
+    for each statement execute function change_log_rows('product_id');
+create or replace trigger product_change_log_delete after delete on product
+    referencing old table as old_rows
+    for each statement execute function change_log_rows('product_id');
+
+create or replace trigger shelf_change_log_insert after insert on shelf
+    referencing new table as new_rows
+    for each statement execute function change_log_rows('shelf_id');
+create or replace trigger shelf_change_log_update after update on shelf
+    referencing old table as old_rows new table as new_rows
+    for each statement execute function change_log_rows('shelf_id');
+create or replace trigger shelf_change_log_delete after delete on shelf
+    referencing old table as old_rows
+    for each statement execute function change_log_rows('shelf_id');
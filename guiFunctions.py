@@ -1,7 +1,61 @@
 import ttkbootstrap as ttk
+import ttkbootstrap.constants as const
 from tkinter import filedialog, messagebox, END
 from backend import *
+import asyncBackend
+import startupSnapshot
+from metrics import LATENCY_BUCKETS, METRICS_FILE, METRICS_PORT, METRICS_HOST
+from scanQueue import ScanQueue, SerialScanner
+from collections import deque
+from bisect import bisect_left
 import threading
+import time
+
+# Key currently shown in each item list (pallet_id / product_id), for live updates
+_shown = {}
+# Treeviews that hold a full load and can be kept current by the change feed
+_loaded_views = set()
+# Change events waiting to be applied on the Tk main thread
+_pending_changes = deque()
+_flush_scheduled = threading.Event()
+# Pending refresh of the Diagnostics tab
+_diagnostics_job = None
+DIAGNOSTICS_REFRESH_MS = 2000
+# Scan mode: the queue, an optional serial scanner, tallies and the log row of each queued serial
+_scan_session = {"queue": None, "scanner": None, "closing": False,
+                 "counts": {"queued": 0, "saved": 0, "duplicates": 0, "failed": 0}, "rows": {}}
+SCAN_LOG_ROWS = 200
+# Latest dropdown lists, and the combobox each list fills
+_dropdowns = {}
+# Latest counts and pallet info rows, saved with the dropdowns in the start-up snapshot
+_view_rows = {}
+# Start-up snapshot shown until the first fetch replaces it, and whether that fetch has landed
+_snapshot = {}
+_reconciled = threading.Event()
+SNAPSHOT_NOTICE_MS = 5000
+# Global search: the pending debounce job and the result row behind each list row
+_search = {"job": None, "results": {}}
+SEARCH_DELAY_MS = 150
+# Keys the search box handles itself (they don't change the text)
+SEARCH_NAV_KEYS = ("Return", "KP_Enter", "Escape", "Up", "Down", "Left", "Right", "Home", "End")
+SEARCH_FIELDS = {"serial_number": "Serial Number", "model_number": "Model Number",
+                 "product_name": "Product Name", "product_description": "Description"}
+DROPDOWN_COMBOS = {
+    "combo_model": "model_numbers",
+    "combo_pallet": "pallet_ids",
+    "combo_view_pallet": "pallet_ids",
+    "combo_view_model": "model_numbers",
+    "combo_product_model": "model_numbers",
+    "combo_remove_pallet": "pallet_ids",
+    "combo_modify_pallet_select": "pallet_ids",
+    "combo_view_aisle": "aisle_names",
+    "combo_move_source": "pallet_ids",
+    "combo_move_target": "pallet_ids",
+}
+
+def _show_error(error):
+    """Default on_error for background tasks (runs on main thread)."""
+    messagebox.showerror("Error", f"An unexpected error occurred: {error}")
 
 # --- Event Handlers ---
 def on_pallet_select(event, widgets):
@@ -23,20 +77,40 @@ def on_pallet_select(event, widgets):
         combo_model.config(state="readonly")
         return
 
+    def show_model(model_number):
+        if combo_pallet.get() != pallet_id:
+            return # Selection changed while the lookup was running
+        if model_number:
+            combo_model.set(model_number)
+            combo_model.config(state="disabled") # Lock the model number
+        else:
+            # If pallet not found, clear model and allow manual selection
+            combo_model.set('')
+            combo_model.config(state="readonly")
+            messagebox.showwarning("Not Found", f"No model number found for Pallet ID: {pallet_id}")
+
     # Fetch model number from backend
-    model_number = get_model_for_pallet(pallet_id)
-    
-    if model_number:
-        combo_model.set(model_number)
-        combo_model.config(state="disabled") # Lock the model number
-    else:
-        # If pallet not found, clear model and allow manual selection
-        combo_model.set('')
-        combo_model.config(state="readonly")
-        messagebox.showwarning("Not Found", f"No model number found for Pallet ID: {pallet_id}")
+    widgets['tasks'].submit("Manage Items", lambda: get_model_for_pallet(pallet_id), show_model,
+                            _show_error, request="pallet_model")
 
 # --- Core GUI Actions ---
 
+def _show_write_report(title, summary, sections, limit=15):
+    """Show a bulk write summary; lists the first few serials of each non-empty section."""
+    lines = [summary]
+    for label, values in sections:
+        if not values:
+            continue
+        lines.append(f"\n{label} ({len(values)}):")
+        lines.extend(str(v) for v in values[:limit])
+        if len(values) > limit:
+            lines.append(f"...and {len(values) - limit} more")
+
+    if any(values for _, values in sections):
+        messagebox.showwarning(title, "\n".join(lines))
+    else:
+        messagebox.showinfo("Success", summary)
+
 def gui_bulk_add_serials(widgets):
     """Add multiple items with serial numbers based on the selected pallet."""
     text_serials = widgets['text_serials']
@@ -49,88 +123,140 @@ def gui_bulk_add_serials(widgets):
         messagebox.showwarning("Missing Data", "Please provide Serial Numbers and select a Pallet ID.")
         return
 
-    # More efficient: Get product_id directly from pallet table
-    resp = supabase.table("pallet").select("product_id").eq("pallet_id", pallet_id).execute()
-    if not resp.data:
-        messagebox.showerror("Error", f"Could not find Pallet ID: {pallet_id} in the database.")
-        return
-    product_id = resp.data[0]["product_id"]
-
-    # Get next item_id
-    resp_max = supabase.table("item").select("item_id").order("item_id", desc=True).limit(1).execute()
-    next_id = (resp_max.data[0]["item_id"] + 1) if resp_max.data else 1
-
-    # Prepare items for insertion
-    items_to_insert = []
-    for serial in serials:
-        serial = serial.strip()
-        if serial:
-            items_to_insert.append({
-                "item_id": next_id,
-                "serial_number": serial,
-                "pallet_id": str(pallet_id).strip(),
-                "product_id": product_id,
-            })
-            next_id += 1
-
-    count = bulkScanItems(items_to_insert, ignore_conflicts=False)
-    messagebox.showinfo("Success", f"Inserted {count} items.")
-    
-    # Clear form
-    text_serials.delete("1.0", "end")
-    combo_pallet.set('')
-    # Trigger the event handler to reset the model combobox
-    on_pallet_select(None, widgets)
+    def add_items():
+        # Items take the pallet's product; item_ids are reserved by the backend.
+        # With journal sync on, they are saved locally first and written in the background.
+        scans = [(serial.strip(), pallet_id) for serial in serials if serial.strip()]
+        return scanItemsReport(scans)
+
+    def show_result(result):
+        summary = f"Inserted {len(result['inserted'])} items."
+        if result.get("queued"):
+            summary = f"Saved {len(result['queued'])} items; they are being written to the database in the background."
+        _show_write_report("Add Items", summary, [
+            ("Skipped (already exist)", result["duplicates"]),
+            ("Failed", [f"{sn}: {reason}" for sn, reason in result["failed"]]),
+        ])
+        
+        # Clear form
+        text_serials.delete("1.0", "end")
+        combo_pallet.set('')
+        # Trigger the event handler to reset the model combobox
+        on_pallet_select(None, widgets)
+
+    widgets['tasks'].submit("Manage Items", add_items, show_result, _show_error)
 
 # Thread-safe data fetching
-def fetch_data_for_dropdowns(app, widgets):
+def fetch_data_for_dropdowns(app, widgets, on_done=None):
     """
     Fetches model numbers and pallet IDs from backend in background thread.
-    Uses cached data when available for faster loading.
+    The counts and pallet info are fetched in the same round trip so their
+    tabs open from the cache. on_done() runs on the main thread once the
+    dropdowns are filled.
     """
     try:
-        model_numbers = fetch_model_numbers()
-        pallet_ids = fetch_pallet_ids()
+        overview = asyncBackend.run(asyncBackend.load_overview())
+        model_numbers, pallet_ids, aisle_names = overview["model_numbers"], overview["pallet_ids"], overview["aisle_names"]
         
+        # Saved for the next launch before anything is shown
+        version = saveStartupSnapshot(overview)
+
         # Schedule GUI update on main thread
-        app.after(0, lambda: update_dropdowns_in_gui(widgets, model_numbers, pallet_ids))
+        def fill_dropdowns():
+            update_dropdowns_in_gui(widgets, model_numbers, pallet_ids, aisle_names)
+            _reconcile_snapshot(widgets, overview, version)
+            if on_done is not None:
+                on_done()
+        app.after(0, fill_dropdowns)
+
+        # Build the client-side caches once, after the dropdowns are filled
+        if INDEX_ENABLED and not inventory_index.loaded:
+            load_inventory_index()
+        if (SERIAL_SET_ENABLED or SEARCH_INDEX_ENABLED) and not (serial_set.loaded or search_index.loaded):
+            load_item_caches()
     except Exception as e:
         print(f"Failed to fetch initial data: {e}")
+        if _snapshot:
+            app.after(0, lambda: _show_data_status(
+                widgets, f"Offline - showing data saved {_saved_when()} (may be out of date)", const.DANGER))
         app.after(0, lambda: messagebox.showerror("Network Error", 
             "Could not fetch initial data from the database. Please check your connection."))
 
-def update_dropdowns_in_gui(widgets, model_numbers, pallet_ids):
-    """Update comboboxes with fetched data (runs on main thread)."""
-    # Convert tuples to lists for combobox
-    model_list = list(model_numbers) if model_numbers else []
-    pallet_list = list(pallet_ids) if pallet_ids else []
-    
-    widgets['combo_model']['values'] = model_list
-    widgets['combo_pallet']['values'] = pallet_list
-    widgets['combo_view_pallet']['values'] = pallet_list
-    widgets['combo_view_model']['values'] = model_list
-    widgets['combo_product_model']['values'] = model_list
-    widgets['combo_remove_pallet']['values'] = pallet_list
-    widgets['combo_modify_pallet_select']['values'] = pallet_list # Added new combobox
-    
-    # Clear "Loading..." text
-    if widgets['combo_model'].get() == "Loading...":
-        widgets['combo_model'].set('')
-    if widgets['combo_pallet'].get() == "Loading...":
-        widgets['combo_pallet'].set('')
-    if widgets['combo_view_pallet'].get() == "Loading...":
-        widgets['combo_view_pallet'].set('')
-    if widgets['combo_view_model'].get() == "Loading...":
-        widgets['combo_view_model'].set('')
-    if widgets['combo_product_model'].get() == "Loading...":
-        widgets['combo_product_model'].set('')
-    if widgets['combo_remove_pallet'].get() == "Loading...":
-        widgets['combo_remove_pallet'].set('')
-    if widgets['combo_modify_pallet_select'].get() == "Loading...": # Added new combobox
-        widgets['combo_modify_pallet_select'].set('')
-    
+def update_dropdowns_in_gui(widgets, model_numbers=None, pallet_ids=None, aisle_names=None):
+    """
+    Update comboboxes with fetched data (runs on main thread). The lists are
+    kept, so a tab built later fills its comboboxes by calling this with no lists.
+    """
+    for name, values in (("model_numbers", model_numbers), ("pallet_ids", pallet_ids), ("aisle_names", aisle_names)):
+        if values is not None:
+            _dropdowns[name] = list(values)
+
+    for combo_name, source in DROPDOWN_COMBOS.items():
+        combo = widgets.get(combo_name)
+        if combo is None or source not in _dropdowns:
+            continue # Tab not built yet, or data not fetched yet
+        combo['values'] = _dropdowns[source]
+        # Clear "Loading..." text
+        if combo.get() == "Loading...":
+            combo.set('')
+
     print("Dropdowns updated with fresh data.")
 
+# --- Start-up Snapshot ---
+
+def _show_data_status(widgets, text, style=const.SECONDARY):
+    widgets['label_data_status'].config(text=text, bootstyle=style)
+
+def _saved_when():
+    return time.strftime("%b %d %H:%M", time.localtime(_snapshot["saved_at"]))
+
+def load_startup_snapshot(widgets):
+    """
+    Fill the dropdowns (and, when opened, the count and pallet info tabs) from
+    the data saved by the last launch, until the start-up fetch replaces it.
+    Returns True if there was a snapshot.
+    """
+    snapshot = loadStartupSnapshot()
+    if snapshot is None:
+        return False
+    _snapshot.update(snapshot)
+    data = snapshot["data"]
+    update_dropdowns_in_gui(widgets, data["model_numbers"], data["pallet_ids"], data["aisle_names"])
+    if snapshot["stale"]:
+        _show_data_status(widgets, f"Saved data from {_saved_when()} is out of date - refreshing...", const.WARNING)
+    else:
+        _show_data_status(widgets, f"Showing data saved {_saved_when()} - refreshing...")
+    return True
+
+def _reconcile_snapshot(widgets, overview, version):
+    """The start-up fetch has landed: drop the snapshot and say whether it had been out of date (main thread)."""
+    _reconciled.set()
+    _view_rows.update((name, overview[name]) for name in ("stock_counts", "pallet_counts", "pallet_info"))
+    if not _snapshot:
+        return
+    if version is None:
+        version = startupSnapshot.version(overview)
+    changed = version != _snapshot["version"]
+    _snapshot.clear()
+
+    # Tabs opened meanwhile show saved rows; reload them
+    tasks = widgets['tasks']
+    for tree_name, load in (('tree_stock', load_stock_counts), ('tree_pallet_counts', load_pallet_counts),
+                            ('tree_pallet_info', load_pallet_info)):
+        if tree_name in widgets and tree_name not in _loaded_views:
+            load(widgets[tree_name], tasks)
+
+    if changed:
+        _show_data_status(widgets, "Refreshed - the saved data was out of date", const.INFO)
+        widgets['app'].after(SNAPSHOT_NOTICE_MS, lambda: _show_data_status(widgets, ""))
+    else:
+        _show_data_status(widgets, "")
+
+def save_startup_snapshot():
+    """Save the session's latest data for the next launch (only once it has been fetched)."""
+    if _reconciled.is_set():
+        saveStartupSnapshot({**_view_rows, **_dropdowns})
+
 def gui_bulk_remove(widgets):
     """Remove multiple items by serial number."""
     text_bulk_remove = widgets['text_bulk_remove']
@@ -140,59 +266,242 @@ def gui_bulk_remove(widgets):
         messagebox.showwarning("Warning", "No serial numbers entered")
         return
     
-    count = bulkRemoveItems(sns)
-    messagebox.showinfo("Success", f"Removed {count} items.")
+    def show_result(result):
+        summary = f"Removed {len(result['deleted'])} items."
+        if result.get("queued"):
+            summary = f"Saved {len(result['queued'])} removals; they are being applied in the background."
+        _show_write_report("Remove Items", summary, [
+            ("Not found", result["not_found"]),
+            ("Already queued", result.get("duplicates", [])),
+            ("Failed", [f"{sn}: {reason}" for sn, reason in result["failed"]]),
+        ])
+
     text_bulk_remove.delete("1.0", "end")
+    widgets['tasks'].submit("Manage Items", lambda: bulkRemoveItemsReport(sns), show_result, _show_error)
 
-def gui_import_csv():
+def gui_import_csv(widgets):
     """Import items from CSV file."""
     path = filedialog.askopenfilename(title="Select CSV File", filetypes=[("CSV", "*.csv")])
     if not path:
         return
     
-    count = importFromCsv(path)
-    messagebox.showinfo("Import Complete", f"Imported {count} items from {path}")
+    def print_progress(report):
+        print(f'CSV import: {report["rows_read"]} rows read, {report["inserted"]} inserted')
+
+    def show_report(report):
+        if report.get("error"):
+            messagebox.showerror("Import Failed", f"Could not read {path}: {report['error']}")
+            return
+
+        message = (f"Imported {report['inserted']} of {report['rows_read']} items from {path}\n"
+                   f"Already in stock: {report['duplicates']}\n"
+                   f"Skipped rows: {report['skipped']}")
+        failed = report["failed_batches"]
+        if failed:
+            lines = [f"Lines {f['first_line']}-{f['last_line']}: {f['error']}" for f in failed[:10]]
+            if len(failed) > 10:
+                lines.append(f"...and {len(failed) - 10} more")
+            message += f"\n\n{len(failed)} batches failed:\n" + "\n".join(lines)
+            messagebox.showwarning("Import Completed With Errors", message)
+        else:
+            messagebox.showinfo("Import Complete", message)
+
+    widgets['tasks'].submit("Manage Items", lambda: streamImportFromCsv(path, on_progress=print_progress),
+                            show_report, _show_error)
+
+# kind -> (backend import, tab it runs on)
+CATALOG_IMPORTS = {
+    "products": (importProductsFromCsv, "Add Product"),
+    "pallets": (importPalletsFromCsv, "Manage Pallets"),
+}
+
+def gui_import_catalog(widgets, kind):
+    """Import products or pallets from a CSV file; dropdowns are refreshed once at the end."""
+    import_csv, tab = CATALOG_IMPORTS[kind]
+    noun = kind
+    path = filedialog.askopenfilename(title=f"Select {noun.title()} CSV File", filetypes=[("CSV", "*.csv")])
+    if not path:
+        return
+
+    def print_progress(report):
+        print(f'{noun.title()} import: {report["inserted"]} inserted, {report["failed"]} failed')
+
+    def show_report(report):
+        if report.get("error"):
+            messagebox.showerror("Import Failed", f"Could not import {path}: {report['error']}")
+            return
+        if report["inserted"]:
+            clear_dropdown_cache()
+            refresh_all_dropdowns(widgets['app'], widgets)
+
+        summary = f"Imported {report['inserted']} of {report['rows_read']} {noun} from {path}"
+        if report.get("shelves_added"):
+            summary += f"\nNew shelves added: {report['shelves_added']}"
+        sections = []
+        for status, label in (("failed", "Failed"), ("not_found", "Unknown model number"),
+                              ("duplicate", "Already exists / repeated"), ("invalid", "Invalid rows")):
+            rows = [r for r in report["rows"] if r["status"] == status]
+            sections.append((label, [f"Line {r['line']}: {r['key'] or '(blank)'} {r['message']}" for r in rows]))
+        _show_write_report("Import Completed With Errors", summary, sections)
+
+    widgets['tasks'].submit(tab, lambda: import_csv(path, on_progress=print_progress), show_report, _show_error)
 
-def gui_view_by_pallet(widgets):
-    """Display items filtered by pallet ID."""
+def gui_export(widgets, incremental=False):
+    """Export the selected dataset, in full or only what changed since its last export."""
+    dataset = widgets['combo_export_dataset'].get()
+    suffix = "-changes" if incremental else ""
+    path = filedialog.asksaveasfilename(
+        title="Export To",
+        initialfile=f"{dataset}{suffix}.parquet",
+        defaultextension=".parquet",
+        filetypes=[("Parquet", "*.parquet"), ("Compressed CSV", "*.csv.gz"), ("CSV", "*.csv"), ("Arrow", "*.arrow")],
+    )
+    if not path:
+        return
+
+    def export():
+        if incremental:
+            return exportChanges(dataset, path)
+        return exportSnapshot(dataset, path)
+
+    def show_report(report):
+        if report.get("error"):
+            messagebox.showerror("Export Failed", f"Could not export {dataset}: {report['error']}")
+        elif incremental:
+            messagebox.showinfo("Export Complete", f"Exported {report['rows']} changed and {report['deleted']} "
+                                                   f"deleted {dataset} rows to {path}")
+        else:
+            messagebox.showinfo("Export Complete", f"Exported {report['rows']} {dataset} rows to {path}")
+
+    widgets['tasks'].submit("Manage Items", export, show_report, _show_error)
+
+def gui_view_by_pallet(widgets, reveal=None):
+    """Display items filtered by pallet ID (then select item_id `reveal`, if given)."""
     combo_view_pallet = widgets['combo_view_pallet']
-    tree_items = widgets['tree_items']
+    virtual_items = widgets['virtual_items']
     
     pid = combo_view_pallet.get()
     if not pid:
         messagebox.showwarning("Missing Data", "Select a pallet ID")
         return
     
-    rows = selectItemsByPallet(pid)
-    
-    # Clear and populate tree
-    tree_items.delete(*tree_items.get_children())
-    for row in rows:
-        tree_items.insert('', 'end', values=row)
+    fetch_page = lambda **page: selectItemsPage("pallet_id", pid, **page)
+
+    def show_items(result):
+        rows, total = result
+        _shown['tree_items'] = pid
+        virtual_items.load(fetch_page, total, rows=rows)
+        if reveal is not None:
+            virtual_items.reveal(reveal)
+
+    # Only the first page is fetched; the rest load as the list is scrolled
+    widgets['tasks'].submit(
+        "View by Pallet",
+        lambda: asyncBackend.run(asyncBackend.selectItemsWithCount("pallet_id", pid, virtual_items.page_size)),
+        show_items,
+        _show_error,
+        request="view",
+    )
 
 def gui_view_by_product(widgets):
     """Display items filtered by model number."""
     combo_view_model = widgets['combo_view_model']
-    tree_items_product = widgets['tree_items_product']
+    virtual_items_product = widgets['virtual_items_product']
 
     model_number = combo_view_model.get()
     if not model_number:
         messagebox.showwarning("Missing Data", "Select a model number")
         return
     
-    # Get product_id for model
-    resp = supabase.table("product").select("product_id").eq("model_number", model_number).execute()
-    if not resp.data:
-        messagebox.showerror("Error", f"No product found for model {model_number}")
+    # The model filter joins product on the server, so no product_id lookup first
+    fetch_page = lambda **page: selectItemsPage("product.model_number", model_number, **page)
+
+    def show_items(result):
+        rows, total = result
+        _shown['tree_items_product'] = model_number
+        virtual_items_product.load(fetch_page, total, rows=rows)
+
+    widgets['tasks'].submit(
+        "View by Model",
+        lambda: asyncBackend.run(
+            asyncBackend.selectItemsWithCount("product.model_number", model_number, virtual_items_product.page_size)),
+        show_items,
+        _show_error,
+        request="view",
+    )
+
+# --- Global Search ---
+
+def gui_search_changed(widgets, event=None):
+    """Search once typing pauses; a newer search replaces one still in flight."""
+    if event is not None and event.keysym in SEARCH_NAV_KEYS:
         return
-    
-    product_id = resp.data[0]["product_id"]
-    rows = selectItemsByProduct(product_id)
-    
-    # Clear and populate tree
-    tree_items_product.delete(*tree_items_product.get_children())
-    for row in rows:
-        tree_items_product.insert('', 'end', values=row)
+    app = widgets['app']
+    if _search["job"] is not None:
+        app.after_cancel(_search["job"])
+    _search["job"] = app.after(SEARCH_DELAY_MS, lambda: gui_search(widgets))
+
+def gui_search(widgets):
+    """Search serials, model numbers and product names/descriptions for the search box text."""
+    _search["job"] = None
+    query = widgets['entry_search'].get().strip()
+    if len(query) < SEARCH_MIN_LENGTH:
+        _show_search_results(widgets, [])
+        return
+    widgets['tasks'].submit("Search", lambda: searchInventory(query),
+                            lambda rows: _show_search_results(widgets, rows, query), _show_error, request="search")
+
+def _show_search_results(widgets, rows, query=None):
+    """List ranked matches under the search box (hidden when there are none)."""
+    tree, label = widgets['tree_search'], widgets['label_search_status']
+    tree.delete(*tree.get_children())
+    _search["results"] = {}
+    for i, row in enumerate(rows):
+        if row["kind"] == "item":
+            where = f"Pallet {row['pallet_id']} ({row['model_number']})"
+        else:
+            where = f"Model {row['model_number']}"
+        tree.insert("", END, iid=str(i), values=(
+            row["text"], SEARCH_FIELDS.get(row["field"], row["field"]), where, f"{row['score']:.2f}"))
+        _search["results"][str(i)] = row
+
+    if rows:
+        tree.pack(after=widgets['frame_search'], fill=const.X, padx=10, pady=(5, 0))
+        tree.selection_set("0")
+        tree.focus("0")
+        label.configure(text=f"{len(rows)} matches")
+    else:
+        tree.pack_forget()
+        label.configure(text="No matches" if query else "")
+
+def gui_hide_search(widgets):
+    """Close the search results list."""
+    widgets['tree_search'].pack_forget()
+
+def gui_search_jump(widgets):
+    """Open the selected (or best) search result."""
+    tree = widgets['tree_search']
+    selected = tree.selection() or tree.get_children()[:1]
+    row = _search["results"].get(selected[0]) if selected else None
+    if row is None:
+        return
+    tree.pack_forget()
+    jump_to_result(widgets, row)
+
+def jump_to_result(widgets, row):
+    """Show a search result: a serial on its pallet in View by Pallet, a product in View by Model."""
+    if row["kind"] == "item":
+        tab, combo, value = "View by Pallet", "combo_view_pallet", row["pallet_id"]
+    else:
+        tab, combo, value = "View by Model", "combo_view_model", row["model_number"]
+    lazy = widgets['lazy']
+    widgets['tabs'].select(lazy.frames[tab])
+    lazy.build(tab)
+    widgets[combo].set(value)
+    if row["kind"] == "item":
+        gui_view_by_pallet(widgets, reveal=row["item_id"])
+    else:
+        gui_view_by_product(widgets)
 
 def gui_view_by_aisle(widgets):
     """Display pallets filtered by aisle."""
@@ -204,12 +513,13 @@ def gui_view_by_aisle(widgets):
         messagebox.showwarning("Missing Data", "Please select an aisle from the dropdown.")
         return
     
-    rows = viewPalletByAisle(aisle)
+    def show_pallets(rows):
+        tree_aisle_pallets.delete(*tree_aisle_pallets.get_children())
+        for row in rows:
+            # The backend function returns a dict, so get values in order for the tree
+            tree_aisle_pallets.insert('', 'end', iid=row["pallet_id"], values=(row["pallet_id"], row["shelf_id"], row["model_number"]))
 
-    tree_aisle_pallets.delete(*tree_aisle_pallets.get_children())
-    for row in rows:
-        # The backend function returns a dict, so get values in order for the tree
-        tree_aisle_pallets.insert('', 'end', values=(row["pallet_id"], row["shelf_id"], row["model_number"]))
+    widgets['tasks'].submit("View by Aisle", lambda: viewPalletByAisle(aisle), show_pallets, _show_error, request="view")
 
 def gui_add_product(widgets):
     """Add a new product to database."""
@@ -217,21 +527,25 @@ def gui_add_product(widgets):
     entry_prod_desc = widgets['entry_prod_desc']
     entry_model_num = widgets['entry_model_num']
 
-    # Get next product_id
-    resp_max = supabase.table("product").select("product_id").order("product_id", desc=True).limit(1).execute()
-    
-    try:
-        pid = resp_max.data[0]["product_id"] + 1 if resp_max.data else 1
-        pname = entry_prod_name.get().strip()
-        pdesc = entry_prod_desc.get().strip()
-        mnum = entry_model_num.get().strip()
+    pname = entry_prod_name.get().strip()
+    pdesc = entry_prod_desc.get().strip()
+    mnum = entry_model_num.get().strip()
 
-        if not pname or not mnum:
-            messagebox.showwarning("Missing Data", "Product Name and Model Number are required.")
-            return
+    if not pname or not mnum:
+        messagebox.showwarning("Missing Data", "Product Name and Model Number are required.")
+        return
 
-        success = addProduct(pid, pname, pdesc, mnum)
-        if success:
+    def add_product():
+        # Reserve the product_id on the server
+        pid = allocate_product_id()
+        if pid is None:
+            return None
+        return addProduct(pid, pname, pdesc, mnum)
+
+    def show_result(success):
+        if success is None:
+            messagebox.showerror("Error", "Could not reserve a product ID. Check the console.")
+        elif success:
             messagebox.showinfo("Success", f"Product {pname} added successfully.")
             
             # Clear form
@@ -244,8 +558,8 @@ def gui_add_product(widgets):
             refresh_all_dropdowns(widgets['app'], widgets)
         else:
             messagebox.showerror("Error", "Could not add product.")
-    except ValueError:
-        messagebox.showerror("Error", "Product ID must be an integer.")
+
+    widgets['tasks'].submit("Add Product", add_product, show_result, _show_error)
 
 def gui_add_pallet(widgets):
     """Add a new pallet to database."""
@@ -263,28 +577,32 @@ def gui_add_pallet(widgets):
         messagebox.showwarning("Missing Data", "Pallet ID, Shelf ID, and Product are required.")
         return
 
-    # Get product_id for model
-    resp = supabase.table("product").select("product_id").eq("model_number", model_number).execute()
-    if not resp.data:
-        messagebox.showerror("Error", f"No product found for model {model_number}")
-        return
-    product_id = resp.data[0]["product_id"]
+    def add_pallet():
+        # Get product_id for model
+        product_id = get_product_id_for_model(model_number)
+        if product_id is None:
+            return None
+        return addPallet(pid, sid, product_id, notes)
 
-    success = addPallet(pid, sid, product_id, notes)
-    if success:
-        messagebox.showinfo("Success", f"Pallet {pid} added successfully.")
-        
-        # Clear form
-        entry_pallet_id.delete(0, END)
-        entry_shelf_id.delete(0, END)
-        combo_product_model.set('')
-        entry_notes.delete(0, END)
-        
-        # Clear cache and refresh dropdowns
-        clear_dropdown_cache()
-        refresh_all_dropdowns(widgets['app'], widgets)
-    else:
-        messagebox.showerror("Error", "Could not add pallet.")
+    def show_result(success):
+        if success is None:
+            messagebox.showerror("Error", f"No product found for model {model_number}")
+        elif success:
+            messagebox.showinfo("Success", f"Pallet {pid} added successfully.")
+            
+            # Clear form
+            entry_pallet_id.delete(0, END)
+            entry_shelf_id.delete(0, END)
+            combo_product_model.set('')
+            entry_notes.delete(0, END)
+            
+            # Clear cache and refresh dropdowns
+            clear_dropdown_cache()
+            refresh_all_dropdowns(widgets['app'], widgets)
+        else:
+            messagebox.showerror("Error", "Could not add pallet.")
+
+    widgets['tasks'].submit("Manage Pallets", add_pallet, show_result, _show_error)
 
 def gui_remove_pallet(widgets):
     """GUI action to remove a pallet and all its associated items."""
@@ -306,9 +624,7 @@ def gui_remove_pallet(widgets):
     if not confirm:
         return # User clicked No
 
-    try:
-        success = removePallet(pallet_id) # Call the backend function
-        
+    def show_result(success):
         if success:
             messagebox.showinfo("Success", f"Pallet {pallet_id} and all its items were successfully removed.")
             
@@ -320,9 +636,9 @@ def gui_remove_pallet(widgets):
             refresh_all_dropdowns(widgets['app'], widgets)
         else:
             messagebox.showerror("Error", f"Could not remove pallet {pallet_id}. It may have already been deleted or another error occurred. Check the console.")
-            
-    except Exception as e:
-        messagebox.showerror("Error", f"An unexpected error occurred: {e}")
+
+    # Call the backend function
+    widgets['tasks'].submit("Manage Pallets", lambda: removePallet(pallet_id), show_result, _show_error)
 
 def gui_update_pallet_shelf(widgets):
     """GUI action to update the shelf ID of an existing pallet."""
@@ -336,9 +652,7 @@ def gui_update_pallet_shelf(widgets):
         messagebox.showwarning("Missing Data", "Please select a pallet AND enter a new shelf ID.")
         return
 
-    try:
-        success = updatePalletShelf(pallet_id, new_shelf_id)
-        
+    def show_result(success):
         if success:
             messagebox.showinfo("Success", f"Pallet {pallet_id} location updated to {new_shelf_id}.")
             
@@ -351,35 +665,127 @@ def gui_update_pallet_shelf(widgets):
             # or 'View by Aisle' tabs, as they reload data.
         else:
             messagebox.showerror("Error", f"Could not update pallet {pallet_id}. It may not exist.")
-            
-    except Exception as e:
-        messagebox.showerror("Error", f"An unexpected error occurred: {e}")
-
-def load_stock_counts(tree_stock):
-    """Load stock counts by model into treeview."""
-    tree_stock.delete(*tree_stock.get_children())
-    data = countItemsByModel()
-    for row in data:
-        tree_stock.insert("", END, values=(row["model_number"], row["count"]))
-
-def load_pallet_counts(tree_pallet_counts):
-    """Load pallet counts by model into treeview."""
-    tree_pallet_counts.delete(*tree_pallet_counts.get_children())
-    data = countPalletsByModel()
-    for row in data:
-        tree_pallet_counts.insert("", END, values=(row["model_number"], row["pallet_count"]))
-
-def load_pallet_info(tree_pallet_info):
-    """Load pallet info into treeview."""
-    tree_pallet_info.delete(*tree_pallet_info.get_children())
-    data = getPalletInfo()
-    for row in data:
-        tree_pallet_info.insert("", END, values=(row["pallet_id"], row["shelf_id"], row["model_number"]))
+
+    widgets['tasks'].submit("Manage Pallets", lambda: updatePalletShelf(pallet_id, new_shelf_id),
+                            show_result, _show_error)
+
+def gui_move_pallets(widgets):
+    """GUI action to move several pallets to one shelf in a single call."""
+    text_move = widgets['text_move_pallets']
+    entry_shelf = widgets['entry_move_shelf_id']
+
+    pallet_ids = [p.strip() for p in text_move.get("1.0", "end").splitlines() if p.strip()]
+    new_shelf_id = entry_shelf.get().strip()
+
+    if not pallet_ids or not new_shelf_id:
+        messagebox.showwarning("Missing Data", "Please enter pallet IDs AND a new shelf ID.")
+        return
+
+    def show_result(report):
+        if report.get("error"):
+            messagebox.showerror("Error", f"No pallets were moved: {report['error']}")
+            return
+        _show_write_report("Move Pallets", f"Moved {len(report['moved'])} pallets to {new_shelf_id}.", [
+            ("Not found", report["not_found"]),
+        ])
+        text_move.delete("1.0", "end")
+        entry_shelf.delete(0, END)
+
+    widgets['tasks'].submit("Manage Pallets", lambda: movePalletsToShelf(pallet_ids, new_shelf_id),
+                            show_result, _show_error)
+
+def gui_move_items(widgets):
+    """GUI action to move listed serials, or a whole pallet's items, to another pallet."""
+    text_move = widgets['text_move_serials']
+    combo_source = widgets['combo_move_source']
+    combo_target = widgets['combo_move_target']
+
+    target = combo_target.get().strip()
+    if widgets['move_mode'].get() == "pallet":
+        serials, source = None, combo_source.get().strip()
+    else:
+        serials, source = [s.strip() for s in text_move.get("1.0", "end").splitlines() if s.strip()], None
+
+    if not target or target == "Loading..." or not (serials or source) or source == "Loading...":
+        messagebox.showwarning("Missing Data", "Please enter serial numbers (or select a source pallet) AND a target pallet.")
+        return
+    if source == target:
+        messagebox.showwarning("Same Pallet", "The source and target pallets are the same.")
+        return
+    if source and not messagebox.askyesno(
+            "Confirm Move", f"Move every item on Pallet '{source}' to Pallet '{target}'?\n\n"
+                            f"Items of another product than '{target}' stay where they are."):
+        return
+
+    def show_result(report):
+        if report.get("error"):
+            messagebox.showerror("Error", f"No items were moved: {report['error']}")
+            return
+        _show_write_report("Move Items", f"Moved {len(report['moved'])} items to pallet {target}.", [
+            ("Different product than the target pallet", report["incompatible"]),
+            ("Already on the target pallet", report["already_there"]),
+            ("Not found", report["not_found"]),
+        ])
+        text_move.delete("1.0", "end")
+
+    widgets['tasks'].submit("Manage Items",
+                            lambda: moveItemsToPallet(target, serials=serials, source_pallet_id=source),
+                            show_result, _show_error)
+
+def load_stock_counts(tree_stock, tasks):
+    """Load stock counts by model into treeview (the start-up snapshot's rows meanwhile)."""
+    def show_counts(data, saved=False):
+        tree_stock.delete(*tree_stock.get_children())
+        for row in data:
+            tree_stock.insert("", END, iid=row["model_number"], values=(row["model_number"], row["count"]))
+        if not saved:
+            _view_rows["stock_counts"] = data
+            _loaded_views.add('tree_stock')
+
+    if _snapshot and not tree_stock.get_children():
+        show_counts(_snapshot["data"]["stock_counts"], saved=True)
+
+    tasks.submit("Stock Counts", countItemsByModel, show_counts, _show_error, request="load")
+
+def load_pallet_counts(tree_pallet_counts, tasks):
+    """Load pallet counts by model into treeview (the start-up snapshot's rows meanwhile)."""
+    def show_counts(data, saved=False):
+        tree_pallet_counts.delete(*tree_pallet_counts.get_children())
+        for row in data:
+            tree_pallet_counts.insert("", END, iid=row["model_number"], values=(row["model_number"], row["pallet_count"]))
+        if not saved:
+            _view_rows["pallet_counts"] = data
+            _loaded_views.add('tree_pallet_counts')
+
+    if _snapshot and not tree_pallet_counts.get_children():
+        show_counts(_snapshot["data"]["pallet_counts"], saved=True)
+
+    tasks.submit("Pallet Counts", countPalletsByModel, show_counts, _show_error, request="load")
+
+def load_pallet_info(tree_pallet_info, tasks):
+    """Load pallet info into treeview (the start-up snapshot's rows meanwhile)."""
+    def show_info(data, saved=False):
+        tree_pallet_info.delete(*tree_pallet_info.get_children())
+        for row in data:
+            tree_pallet_info.insert("", END, iid=row["pallet_id"], values=(row["pallet_id"], row["shelf_id"], row["model_number"]))
+        if not saved:
+            _view_rows["pallet_info"] = data
+            _loaded_views.add('tree_pallet_info')
+
+    if _snapshot and not tree_pallet_info.get_children():
+        show_info(_snapshot["data"]["pallet_info"], saved=True)
+
+    tasks.submit("Pallet Info", getPalletInfo, show_info, _show_error, request="load")
 
 def refresh_all_dropdowns(app, widgets):
-    """Refresh dropdown data in background thread."""
+    """Refresh dropdown data on a worker thread; a newer refresh replaces a pending one."""
     print("Refreshing dropdown data in background...")
-    threading.Thread(target=fetch_data_for_dropdowns, args=(app, widgets), daemon=True).start()
+    widgets['tasks'].submit(
+        "Dropdowns",
+        lambda: asyncBackend.run(asyncBackend.fetch_dropdowns()),
+        lambda data: update_dropdowns_in_gui(widgets, *data),
+        request="refresh",
+    )
 
 def on_tab_change(event, widgets):
     """Handle tab change events - load data as needed."""
@@ -389,12 +795,386 @@ def on_tab_change(event, widgets):
     except Exception:
         return # Error getting tab, probably during startup
 
+    # With a live change feed, loaded views are patched in place instead of reloaded
+    def needs_load(name):
+        return not (change_feed.live and name in _loaded_views)
+
     # Only refresh dropdowns for tabs that need them
     if tab_text in ("Manage Items", "View by Pallet", "View by Model", "Manage Pallets"): # Updated tab name
         refresh_all_dropdowns(app, widgets)
-    elif tab_text == "Stock Counts":
-        load_stock_counts(widgets['tree_stock'])
-    elif tab_text == "Pallet Counts":
-        load_pallet_counts(widgets['tree_pallet_counts'])
-    elif tab_text == 'Pallet Info':
-        load_pallet_info(widgets['tree_pallet_info'])
+    elif tab_text == "Stock Counts" and needs_load('tree_stock'):
+        load_stock_counts(widgets['tree_stock'], widgets['tasks'])
+    elif tab_text == "Pallet Counts" and needs_load('tree_pallet_counts'):
+        load_pallet_counts(widgets['tree_pallet_counts'], widgets['tasks'])
+    elif tab_text == 'Pallet Info' and needs_load('tree_pallet_info'):
+        load_pallet_info(widgets['tree_pallet_info'], widgets['tasks'])
+    elif tab_text == "Diagnostics":
+        refresh_diagnostics(widgets)
+
+# --- Scan Mode ---
+
+def _scan_queue(widgets):
+    """The session's scan queue, created on the first scan."""
+    if _scan_session["queue"] is None:
+        app = widgets['app']
+
+        def on_result(batch, report):
+            # Runs on the queue's thread
+            if not _scan_session["closing"]:
+                app.after(0, lambda: _apply_scan_result(widgets, batch, report))
+
+        _scan_session["queue"] = ScanQueue(scanItemsReport, on_result=on_result, is_known=serial_known)
+    return _scan_session["queue"]
+
+def gui_scan(widgets):
+    """Take the scan typed into the scan entry by a keyboard-wedge scanner."""
+    entry_scan = widgets['entry_scan']
+    serial = entry_scan.get()
+    entry_scan.delete(0, END)
+    accept_scan(widgets, serial)
+    return "break"
+
+def accept_scan(widgets, serial):
+    """Queue one scan for the selected pallet and show the verdict at once (main thread)."""
+    serial = str(serial).strip()
+    pallet_id = widgets['combo_pallet'].get().strip()
+    label = widgets['label_scan_status']
+    if not serial:
+        return
+    if pallet_id not in widgets['combo_pallet']['values']:
+        widgets['app'].bell()
+        label.config(text=f"Select a pallet before scanning ({serial} not queued)", bootstyle=const.DANGER)
+        return
+
+    status = _scan_queue(widgets).add(serial, pallet_id)
+    tree = widgets['tree_scans']
+    row = tree.insert("", 0, values=(serial, pallet_id, status))
+    counts = _scan_session["counts"]
+    if status == "queued":
+        counts["queued"] += 1
+        _scan_session["rows"][serial] = row
+        label.config(text=f"Queued {serial}", bootstyle=const.SUCCESS)
+    else:
+        counts["duplicates"] += 1
+        widgets['app'].bell()
+        label.config(text=f"Duplicate {serial} - already scanned or in stock", bootstyle=const.WARNING)
+
+    for old in tree.get_children()[SCAN_LOG_ROWS:]:
+        tree.delete(old)
+    _show_scan_counts(widgets)
+
+def _apply_scan_result(widgets, batch, report):
+    """Mark a written (or journaled) micro-batch in the scan log (main thread)."""
+    tree = widgets['tree_scans']
+    rows = _scan_session["rows"]
+    for serial in report.get("queued", ()):
+        row = rows.get(serial)
+        if row is not None and tree.exists(row):
+            tree.set(row, "status", "waiting to sync")
+    outcomes = [(serial, "saved") for serial in report["inserted"]]
+    outcomes += [(serial, "duplicate") for serial in report["duplicates"]]
+    outcomes += [(serial, f"failed: {reason}") for serial, reason in report["failed"]]
+    _record_scan_outcomes(widgets, outcomes)
+    if report["failed"]:
+        widgets['app'].bell()
+        widgets['label_scan_status'].config(
+            text=f"{len(report['failed'])} scans failed - scan them again", bootstyle=const.DANGER)
+
+def _record_scan_outcomes(widgets, outcomes):
+    """Final status of scans in the log: "saved", "duplicate", or a failure/conflict."""
+    tree = widgets['tree_scans']
+    counts = _scan_session["counts"]
+    rows = _scan_session["rows"]
+    for serial, status in outcomes:
+        if serial not in rows:
+            continue
+        counts["queued"] -= 1
+        counts["saved" if status == "saved" else "duplicates" if status == "duplicate" else "failed"] += 1
+        row = rows.pop(serial)
+        if tree.exists(row):
+            tree.set(row, "status", status)
+    _show_scan_counts(widgets)
+
+def _show_scan_counts(widgets):
+    counts = _scan_session["counts"]
+    widgets['label_scan_counts'].config(
+        text=f"Waiting: {counts['queued']}   Saved: {counts['saved']}   "
+             f"Duplicates: {counts['duplicates']}   Failed: {counts['failed']}")
+
+def gui_toggle_serial_scanner(widgets):
+    """Connect to (or disconnect from) a serial-port scanner."""
+    app = widgets['app']
+    btn = widgets['btn_scan_port']
+    scanner = _scan_session["scanner"]
+    if scanner is not None:
+        _scan_session["scanner"] = None
+        scanner.close()
+        btn.config(text="Connect Scanner")
+        widgets['label_scan_status'].config(text=f"Disconnected from {scanner.port}", bootstyle=const.DEFAULT)
+        return
+
+    port = widgets['entry_scan_port'].get().strip()
+    if not port:
+        messagebox.showwarning("Missing Data", "Please enter the scanner's serial port (e.g. COM3 or /dev/ttyUSB0).")
+        return
+
+    def on_error(error):
+        app.after(0, lambda: messagebox.showerror("Scanner Error", f"Scanner on {port} stopped: {error}"))
+
+    try:
+        _scan_session["scanner"] = SerialScanner(
+            port, lambda serial: app.after(0, lambda: accept_scan(widgets, serial)), on_error=on_error)
+    except Exception as e:
+        messagebox.showerror("Scanner Error", f"Could not open {port}: {e}")
+        return
+    btn.config(text="Disconnect Scanner")
+    widgets['label_scan_status'].config(text=f"Listening on {port}", bootstyle=const.INFO)
+
+# --- Offline Sync ---
+
+def start_sync(widgets):
+    """Start the write journal's sync worker and show its progress on Manage Items."""
+    app = widgets['app']
+    if not start_journal_sync():
+        widgets['label_sync_status'].config(text="Sync: off - writes go straight to the database")
+        return
+
+    def on_sync(op, results):
+        # Runs on the sync worker's thread, so the journal is read here too
+        status = journal_status()
+        app.after(0, lambda: _apply_sync_result(widgets, op, results, status))
+
+    journal_sync.subscribe(on_sync)
+    widgets['tasks'].submit("Manage Items", journal_status,
+                            lambda status: _apply_sync_result(widgets, None, {}, status))
+
+def _apply_sync_result(widgets, op, results, status):
+    """Show a replay's outcome in the scan log and the sync status line (main thread)."""
+    conflicts = [c for r in results.values() for c in r["conflicts"]]
+    if op == "scan_items":
+        outcomes = [(serial, "saved") for r in results.values() for serial in r["synced"]]
+        outcomes += [(serial, f"conflict: {reason}") for serial, reason in conflicts]
+        _record_scan_outcomes(widgets, outcomes)
+    if conflicts:
+        widgets['app'].bell()
+
+    if status is None:
+        return
+    if status["online"]:
+        text = f"Sync: online - {status['pending_rows']} writes waiting"
+    else:
+        text = f"Sync: database unreachable, retrying - {status['pending_rows']} writes saved locally"
+    if status["conflicts"]:
+        text += f" - {status['conflicts']} conflicts"
+    widgets['label_sync_status'].config(
+        text=text, bootstyle=const.DANGER if status["conflicts"] else const.DEFAULT if status["online"] else const.WARNING)
+
+def gui_show_sync_conflicts(widgets):
+    """List the journaled writes that could not be applied."""
+    def show_conflicts(conflicts):
+        if not conflicts:
+            messagebox.showinfo("Sync Conflicts", "No sync conflicts.")
+            return
+        _show_write_report("Sync Conflicts",
+                           f"{len(conflicts)} journaled writes could not be applied "
+                           f"(export them with: python maintenance.py journal-conflicts).",
+                           [("Conflicts", [f"{c['serial_number']}: {c['reason']} ({c['op']})" for c in conflicts])])
+
+    widgets['tasks'].submit("Manage Items", journal_conflicts, show_conflicts, _show_error)
+
+def stop_scanning():
+    """Close the serial scanner and write out any queued scans (on exit)."""
+    _scan_session["closing"] = True
+    if _scan_session["scanner"] is not None:
+        _scan_session["scanner"].close()
+    if _scan_session["queue"] is not None:
+        _scan_session["queue"].close()
+
+# --- Diagnostics ---
+
+def refresh_diagnostics(widgets, reschedule=True):
+    """
+    Show the per-operation call metrics and the selected operation's latency
+    histogram. Reads in-memory counters only, so it runs on the Tk thread;
+    it re-runs every DIAGNOSTICS_REFRESH_MS while the Diagnostics tab is open.
+    """
+    global _diagnostics_job
+    app, tabs, tree = widgets['app'], widgets['tabs'], widgets['tree_diagnostics']
+    if reschedule:
+        _diagnostics_job = None
+        if tabs.tab(tabs.select(), "text") != "Diagnostics":
+            return
+
+    operations = metrics.snapshot()["operations"]
+    for name in sorted(operations):
+        s = operations[name]
+        lookups = s["cache_hits"] + s["cache_misses"]
+        values = (
+            name, s["calls"], s["errors"],
+            f"{s['p50_ms']:.1f}", f"{s['p99_ms']:.1f}", f"{s['mean_ms']:.1f}",
+            f"{s['round_trips'] / s['calls']:.1f}" if s["calls"] else "0",
+            s["rows"], f"{s['bytes'] / 1024:.1f}",
+            f"{100 * s['cache_hits'] / lookups:.0f}" if lookups else "",
+            s["retries"],
+        )
+        _insert_sorted(tree, name, values)
+    for name in tree.get_children():
+        if name not in operations:
+            tree.delete(name)
+
+    selected = tree.selection()
+    if selected and selected[0] in operations:
+        draw_latency_histogram(widgets['canvas_histogram'], selected[0], operations[selected[0]]["buckets"])
+    else:
+        draw_latency_histogram(widgets['canvas_histogram'], None, [])
+
+    exports = [f"Call log: {METRICS_FILE}" if METRICS_FILE else "Call log: off"]
+    if METRICS_PORT:
+        exports.append(f"Prometheus: http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    widgets['label_metrics_export'].config(text="   ".join(exports))
+
+    if reschedule and _diagnostics_job is None:
+        _diagnostics_job = app.after(DIAGNOSTICS_REFRESH_MS, lambda: refresh_diagnostics(widgets))
+
+def draw_latency_histogram(canvas, name, buckets):
+    """Bar chart of call counts per latency bucket."""
+    canvas.delete("all")
+    width = max(canvas.winfo_width(), 400)
+    height = max(canvas.winfo_height(), 150)
+    colors = ttk.Style().colors
+    if not buckets or not sum(buckets):
+        canvas.create_text(width / 2, height / 2, text="Select an operation above", fill=colors.secondary)
+        return
+
+    labels = [f"≤{b * 1000:g}ms" for b in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1] * 1000:g}ms"]
+    top, bottom = 20, height - 25
+    slot = (width - 20) / len(buckets)
+    tallest = max(buckets)
+    canvas.create_text(10, 8, text=f"{name}  ({sum(buckets)} calls)", anchor="w", fill=colors.fg)
+    for i, (count, label) in enumerate(zip(buckets, labels)):
+        x0 = 10 + i * slot + 3
+        x1 = 10 + (i + 1) * slot - 3
+        y0 = bottom - (bottom - top) * count / tallest
+        canvas.create_rectangle(x0, y0, x1, bottom, fill=colors.info, outline="")
+        if count:
+            canvas.create_text((x0 + x1) / 2, y0 - 7, text=str(count), fill=colors.fg, font=("TkDefaultFont", 8))
+        canvas.create_text((x0 + x1) / 2, bottom + 12, text=label, fill=colors.fg, font=("TkDefaultFont", 8))
+
+def gui_reset_metrics(widgets):
+    """Clear the collected call metrics."""
+    metrics.reset()
+    refresh_diagnostics(widgets, reschedule=False)
+
+# --- Live Updates ---
+
+def start_live_updates(widgets):
+    """Subscribe the open views to the backend change feed."""
+    app = widgets['app']
+
+    def on_change(event):
+        # Runs on the feed's thread: resolve the model here, it may need a query
+        event = dict(event)
+        row = event["record"] or event["old_record"]
+        if event["table"] in ("item", "pallet") and row.get("product_id") is not None:
+            event["model_number"] = get_model_for_product(row["product_id"])
+        _pending_changes.append(event)
+        if not _flush_scheduled.is_set():
+            _flush_scheduled.set()
+            app.after(50, lambda: _apply_pending_changes(widgets))
+
+    change_feed.subscribe(on_change)
+    # Starting the feed creates the database client; keep that off the Tk thread
+    def feed_started(live):
+        if live:
+            print("Live updates enabled.")
+    widgets['tasks'].submit("Live Updates", start_change_feed, feed_started)
+
+def _apply_pending_changes(widgets):
+    """Apply queued change events to the open Treeviews (runs on main thread)."""
+    _flush_scheduled.clear()
+    refresh_dropdowns = False
+    while _pending_changes:
+        event = _pending_changes.popleft()
+        try:
+            _patch_views(widgets, event)
+        except Exception as e:
+            print(f"Could not apply {event['table']} {event['type']} to the views: {e}")
+        refresh_dropdowns = refresh_dropdowns or event["table"] in ("pallet", "product")
+
+    if refresh_dropdowns:
+        refresh_all_dropdowns(widgets['app'], widgets)
+
+def _insert_sorted(tree, iid, values, key=str):
+    """Insert a row keeping the tree ordered by iid (updates it if already shown)."""
+    if tree.exists(iid):
+        tree.item(iid, values=values)
+        return
+    children = tree.get_children()
+    index = bisect_left([key(c) for c in children], key(iid))
+    tree.insert('', index, iid=iid, values=values)
+
+def _adjust_count(widgets, tree_name, model_number, delta):
+    """Add delta to a model's count row, dropping the row when it reaches zero."""
+    if tree_name not in _loaded_views:
+        return
+    tree = widgets[tree_name]
+    if model_number is None:
+        # Can't tell which row changed; reload next time the tab is opened
+        _loaded_views.discard(tree_name)
+        return
+    if tree.exists(model_number):
+        count = int(tree.item(model_number, "values")[1]) + delta
+        if count > 0:
+            tree.item(model_number, values=(model_number, count))
+        else:
+            tree.delete(model_number)
+    elif delta > 0:
+        _insert_sorted(tree, model_number, (model_number, delta))
+
+def _patch_views(widgets, event):
+    """Apply one change event as a diff to the stock, pallet and item views."""
+    table, kind = event["table"], event["type"]
+    new, old = event["record"], event["old_record"]
+    model_number = event.get("model_number")
+
+    if table == "item":
+        if kind == "INSERT":
+            _adjust_count(widgets, 'tree_stock', model_number, 1)
+        elif kind == "DELETE":
+            _adjust_count(widgets, 'tree_stock', model_number, -1)
+
+        iid = str((new or old).get("item_id"))
+        # The pallet view is keyed by pallet_id, the model view by model number
+        pallet_id = (new or {}).get("pallet_id")
+        for tree_name, virtual_name, shown in (('tree_items', 'virtual_items', pallet_id),
+                                               ('tree_items_product', 'virtual_items_product', model_number)):
+            virtual = widgets.get(virtual_name)
+            if virtual is None:
+                continue # Tab not built yet
+            if kind in ("UPDATE", "DELETE"):
+                virtual.remove_row(iid)
+            if kind in ("INSERT", "UPDATE") and shown is not None and _shown.get(tree_name) == shown:
+                virtual.upsert_row((new["item_id"], new["serial_number"], new["pallet_id"], new["product_id"]))
+
+    elif table == "pallet":
+        pallet_id = (new or old).get("pallet_id")
+        if kind == "INSERT":
+            _adjust_count(widgets, 'tree_pallet_counts', model_number, 1)
+        elif kind == "DELETE":
+            _adjust_count(widgets, 'tree_pallet_counts', model_number, -1)
+
+        # Either tree is missing until its tab is first opened
+        tree_info, tree_aisle = widgets.get('tree_pallet_info'), widgets.get('tree_aisle_pallets')
+        if kind == "DELETE":
+            for tree in (tree_info, tree_aisle):
+                if tree is not None and tree.exists(pallet_id):
+                    tree.delete(pallet_id)
+            return
+
+        values = (pallet_id, new.get("shelf_id"), model_number)
+        if tree_info is not None and tree_info.exists(pallet_id):
+            tree_info.item(pallet_id, values=values)
+        elif 'tree_pallet_info' in _loaded_views:
+            _insert_sorted(tree_info, pallet_id, values)
+        if tree_aisle is not None and tree_aisle.exists(pallet_id):
+            tree_aisle.item(pallet_id, values=values)
@@ -0,0 +1,48 @@
+-- Sequences behind item_id / product_id so clients never compute max(id) + 1
+-- (re-running the script never moves a sequence backwards)
+create sequence if not exists item_id_seq owned by item.item_id;
+select setval('item_id_seq', greatest(coalesce((select max(item_id) from item), 0),
+                                      coalesce(pg_sequence_last_value('item_id_seq'), 0)) + 1, false);
+alter table item alter column item_id set default nextval('item_id_seq');
+
+create sequence if not exists product_id_seq owned by product.product_id;
+select setval('product_id_seq', greatest(coalesce((select max(product_id) from product), 0),
+                                         coalesce(pg_sequence_last_value('product_id_seq'), 0)) + 1, false);
+alter table product alter column product_id set default nextval('product_id_seq');
+
+-- Reserve a block of ids in one round trip, e.g. select * from allocate_ids('item_id_seq', 50)
+-- The app never writes explicit ids (item CSV imports ignore the file's
+-- item_id), since one could fall inside a block another workstation holds.
+-- Rows written with explicit ids by hand can still be ahead of the sequence,
+-- so it is first moved past the table's largest id, as the SQLite engine does.
+-- The advisory lock keeps two reservations from racing that check, which could
+-- otherwise move the sequence back over a block just handed out. It only
+-- serialises allocate_ids calls: an insert that takes its id from the column
+-- default (plain nextval) doesn't wait for it, which is safe because nextval
+-- never repeats a value, but an explicit-id insert is not covered by the lock.
+create or replace function allocate_ids(seq_name text, block_size int)
+returns setof bigint
+language plpgsql
+as $$
+declare
+    v_max bigint;
+begin
+    if seq_name not in ('item_id_seq', 'product_id_seq') then
+        return;
+    end if;
+
+    perform pg_advisory_xact_lock(hashtext(seq_name));
+    if seq_name = 'item_id_seq' then
+        select max(item_id) into v_max from item;
+    else
+        select max(product_id) into v_max from product;
+    end if;
+    if v_max > coalesce(pg_sequence_last_value(seq_name::regclass), 0) then
+        perform setval(seq_name::regclass, v_max);
+    end if;
+
+    return query
+    select nextval(seq_name::regclass)
+    from generate_series(1, greatest(block_size, 1));
+end;
+$$;
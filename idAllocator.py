@@ -0,0 +1,26 @@
+import threading
+from collections import deque
+
+class IdAllocator:
+    """
+    Hands out primary keys from blocks reserved on the server.
+    One engine call reserves `block_size` ids, so most adds need no round
+    trip, and ids can never collide with another workstation's.
+    """
+    def __init__(self, engine, sequence, block_size=100):
+        self.engine = engine
+        self.sequence = sequence
+        self.block_size = block_size
+        self._ids = deque()
+        self._lock = threading.Lock()
+
+    def take(self, count=1):
+        """Return a list of `count` unused ids, reserving a new block if needed."""
+        with self._lock:
+            missing = count - len(self._ids)
+            if missing > 0:
+                resp = self.engine.allocate_ids(self.sequence, max(missing, self.block_size))
+                self._ids.extend(resp.data or [])
+            if len(self._ids) < count:
+                raise RuntimeError(f"Could not reserve {count} ids from {self.sequence}")
+            return [self._ids.popleft() for _ in range(count)]
@@ -0,0 +1,227 @@
+import threading
+
+# Rows fetched per request while loading (PostgREST caps responses at 1000)
+LOAD_PAGE_SIZE = 1000
+
+def iter_table(engine, table, columns, key, page_size=LOAD_PAGE_SIZE):
+    """Yield every row of a table using keyset pages ordered by `key`."""
+    after = None
+    while True:
+        rows = engine.select_page(table, columns, key, after=after, limit=page_size).data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        after = rows[-1][key]
+
+class InventoryIndex:
+    """
+    Client-side copy of the item, pallet, product and shelf tables.
+    Loaded once, then patched by the backend's own writes so lookups
+    (serial, pallet, product, shelf, model) never leave the machine.
+    A lookup returns None when the index isn't loaded or the key is unknown,
+    meaning "ask the database". Patches are ignored unless the index is enabled.
+    """
+    def __init__(self, enabled=False):
+        self._lock = threading.RLock()
+        self.enabled = enabled
+        self.loaded = False
+        self._reset()
+
+    def _reset(self):
+        self.items = {}        # item_id -> (item_id, serial_number, pallet_id, product_id)
+        self.by_serial = {}    # serial_number -> item_id
+        self.by_pallet = {}    # pallet_id -> set of item_ids
+        self.by_product = {}   # product_id -> set of item_ids
+        self.pallets = {}      # pallet_id -> (shelf_id, product_id)
+        self.by_shelf = {}     # shelf_id -> set of pallet_ids
+        self.models = {}       # product_id -> model_number
+        self.by_model = {}     # model_number -> product_id
+
+    def load(self, engine):
+        """(Re)load every table from the engine."""
+        with self._lock:
+            self.enabled = True
+            self._reset()
+            for r in iter_table(engine, "product", "product_id,model_number", "product_id"):
+                self._add_product(r)
+            for r in iter_table(engine, "shelf", "shelf_id", "shelf_id"):
+                self.by_shelf.setdefault(r["shelf_id"], set())
+            for r in iter_table(engine, "pallet", "pallet_id,shelf_id,product_id", "pallet_id"):
+                self._add_pallet(r)
+            for r in iter_table(engine, "item", "item_id,serial_number,pallet_id,product_id", "item_id"):
+                self._add_item(r)
+            self.loaded = True
+        print(f"Inventory index loaded: {len(self.items)} items, {len(self.pallets)} pallets, "
+              f"{len(self.models)} products")
+
+    # Lookups
+    def item_for_serial(self, serial):
+        with self._lock:
+            if not self.loaded:
+                return None
+            item_id = self.by_serial.get(serial)
+            return self.items[item_id] if item_id is not None else None
+
+    def items_on_pallet(self, pallet_id):
+        with self._lock:
+            if not self.loaded or pallet_id not in self.pallets:
+                return None
+            return [self.items[i] for i in sorted(self.by_pallet.get(pallet_id, ()))]
+
+    def items_for_product(self, product_id):
+        with self._lock:
+            if not self.loaded or product_id not in self.models:
+                return None
+            return [self.items[i] for i in sorted(self.by_product.get(product_id, ()))]
+
+    def items_page(self, column, value, after_id=None, before_id=None, limit=200):
+        """Keyset page of items on a pallet ("pallet_id") or for a product ("product_id")."""
+        with self._lock:
+            if not self.loaded:
+                return None
+            if column == "pallet_id":
+                known, ids = value in self.pallets, self.by_pallet.get(value, ())
+            else:
+                known, ids = value in self.models, self.by_product.get(value, ())
+            if not known:
+                return None
+            if before_id is not None:
+                page = sorted(i for i in ids if i < before_id)[-limit:]
+            else:
+                page = sorted(i for i in ids if after_id is None or i > after_id)[:limit]
+            return [self.items[i] for i in page]
+
+    def count_items(self, column, value):
+        with self._lock:
+            if not self.loaded:
+                return None
+            if column == "pallet_id":
+                return len(self.by_pallet.get(value, ())) if value in self.pallets else None
+            return len(self.by_product.get(value, ())) if value in self.models else None
+
+    def pallets_on_shelf(self, shelf_id):
+        with self._lock:
+            if not self.loaded or shelf_id not in self.by_shelf:
+                return None
+            return sorted(self.by_shelf[shelf_id])
+
+    def product_for_pallet(self, pallet_id):
+        with self._lock:
+            if not self.loaded:
+                return None
+            pallet = self.pallets.get(pallet_id)
+            return pallet[1] if pallet else None
+
+    def model_for_pallet(self, pallet_id):
+        with self._lock:
+            if not self.loaded:
+                return None
+            pallet = self.pallets.get(pallet_id)
+            return self.models.get(pallet[1]) if pallet else None
+
+    def model_for_product(self, product_id):
+        with self._lock:
+            if not self.loaded:
+                return None
+            return self.models.get(product_id)
+
+    def product_for_model(self, model_number):
+        with self._lock:
+            if not self.loaded:
+                return None
+            return self.by_model.get(model_number)
+
+    def pallet_info(self):
+        """Rows shaped like pallet_info_view, ordered by pallet_id."""
+        with self._lock:
+            if not self.loaded:
+                return None
+            return [
+                {"pallet_id": pid, "shelf_id": shelf_id, "model_number": self.models.get(product_id)}
+                for pid, (shelf_id, product_id) in sorted(self.pallets.items())
+            ]
+
+    # Patching (called after successful writes)
+    def _add_item(self, r):
+        row = (r["item_id"], r["serial_number"], r["pallet_id"], r["product_id"])
+        self.items[row[0]] = row
+        self.by_serial[row[1]] = row[0]
+        self.by_pallet.setdefault(row[2], set()).add(row[0])
+        self.by_product.setdefault(row[3], set()).add(row[0])
+
+    def _remove_item(self, item_id):
+        row = self.items.pop(item_id, None)
+        if row is None:
+            return
+        self.by_serial.pop(row[1], None)
+        self.by_pallet.get(row[2], set()).discard(item_id)
+        self.by_product.get(row[3], set()).discard(item_id)
+
+    def _add_pallet(self, r):
+        pid = r["pallet_id"]
+        self._remove_pallet(pid)
+        self.pallets[pid] = (r["shelf_id"], r["product_id"])
+        self.by_shelf.setdefault(r["shelf_id"], set()).add(pid)
+
+    def _remove_pallet(self, pallet_id):
+        pallet = self.pallets.pop(pallet_id, None)
+        if pallet:
+            self.by_shelf.get(pallet[0], set()).discard(pallet_id)
+
+    def _add_product(self, r):
+        self.models[r["product_id"]] = r["model_number"]
+        self.by_model.setdefault(r["model_number"], r["product_id"])
+
+    def add_items(self, rows):
+        with self._lock:
+            if not self.enabled:
+                return
+            for r in rows:
+                self._add_item(r)
+
+    def remove_serials(self, serials):
+        with self._lock:
+            if not self.enabled:
+                return
+            for serial in serials:
+                item_id = self.by_serial.get(serial)
+                if item_id is not None:
+                    self._remove_item(item_id)
+
+    def move_items(self, item_ids, pallet_id):
+        with self._lock:
+            if not self.enabled:
+                return
+            for item_id in item_ids:
+                row = self.items.get(item_id)
+                if row:
+                    self._remove_item(item_id)
+                    self._add_item({"item_id": row[0], "serial_number": row[1], "pallet_id": pallet_id, "product_id": row[3]})
+
+    def add_pallet(self, row):
+        with self._lock:
+            if not self.enabled:
+                return
+            self._add_pallet(row)
+
+    def remove_pallet(self, pallet_id):
+        with self._lock:
+            if not self.enabled:
+                return
+            for item_id in list(self.by_pallet.pop(pallet_id, ())):
+                self._remove_item(item_id)
+            self._remove_pallet(pallet_id)
+
+    def move_pallet(self, pallet_id, shelf_id):
+        with self._lock:
+            if not self.enabled:
+                return
+            pallet = self.pallets.get(pallet_id)
+            if pallet:
+                self._add_pallet({"pallet_id": pallet_id, "shelf_id": shelf_id, "product_id": pallet[1]})
+
+    def add_product(self, row):
+        with self._lock:
+            if not self.enabled:
+                return
+            self._add_product(row)
@@ -0,0 +1,3 @@
+-- Composite indexes so keyset pages (filter + order by item_id) are index range scans
+create index if not exists idx_item_pallet_item on item (pallet_id, item_id);
+create index if not exists idx_item_product_item on item (product_id, item_id);
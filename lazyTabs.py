@@ -0,0 +1,45 @@
+import ttkbootstrap as ttk
+from metrics import metrics
+
+# ---------------- Lazy notebook tabs ----------------
+# Tabs are added as empty frames and filled by their builder the first time
+# they are shown, so start-up only pays for the tab that is actually open.
+# build(frame) creates the tab's widgets; each build is timed as
+# gui.build_tab.<tab text>.
+
+class LazyNotebook:
+    def __init__(self, notebook, on_build=None):
+        self.notebook = notebook
+        self.on_build = on_build      # on_build(tab text), after a tab is built
+        self.frames = {}              # tab text -> frame
+        self._builders = {}           # tab text -> build(frame), until built
+
+    def add(self, text, build):
+        """Add an empty tab whose contents build(frame) creates on first view."""
+        frame = ttk.Frame(self.notebook)
+        self.notebook.add(frame, text=text)
+        self.frames[text] = frame
+        self._builders[text] = build
+        return frame
+
+    def built(self, text):
+        return text in self.frames and text not in self._builders
+
+    def build(self, text=None):
+        """Build a tab (default: the selected one) if it hasn't been yet; returns its text."""
+        if text is None:
+            selected = self.notebook.select()
+            if not selected:
+                return None
+            text = self.notebook.tab(selected, "text")
+        build = self._builders.pop(text, None)
+        if build is not None:
+            with metrics.operation(f"gui.build_tab.{text}"):
+                build(self.frames[text])
+            if self.on_build is not None:
+                self.on_build(text)
+        return text
+
+    def build_all(self):
+        for text in list(self._builders):
+            self.build(text)
@@ -1,27 +1,33 @@
+import time
+STARTED = time.perf_counter() # Before the other imports, so --measure-startup counts them
+import os
+import sys
+import argparse
 import ttkbootstrap as ttk
 import ttkbootstrap.constants as const
 from tkinter.constants import BOTH, X, YES, NW, EW, W
 import guiFunctions as gui_actions
+from virtualTree import VirtualTreeview
+from taskExecutor import TaskExecutor
+from lazyTabs import LazyNotebook
 import threading
 
-def main():
-    """
-    Main function to create and run the ttkbootstrap GUI application.
-    """
-    # ---------- Main Window & Tabs ----------
-    app = ttk.Window(title="Inventory Manager", themename="darkly", size=(1500, 900))
-    tabs = ttk.Notebook(app)
-    tabs.pack(fill=BOTH, expand=YES, padx=10, pady=10)
+# Time-to-first-window budget checked by --measure-startup
+STARTUP_BUDGET_MS = float(os.getenv("INVENTORY_STARTUP_BUDGET_MS", "1000"))
+# --measure-startup gives up waiting for the dropdowns after this long
+STARTUP_MEASURE_TIMEOUT_MS = 30000
+
+# ---------- Tab Builders ----------
+# Each builds one tab's widgets into its frame, adds them to `widgets` and
+# binds their commands. A tab is built the first time it is shown (lazyTabs.py).
 
-    # --- Manage Items ---
-    tab1 = ttk.Frame(tabs)
-    tabs.add(tab1, text="Manage Items")
+def build_manage_items(tab1, widgets):
     frame1 = ttk.LabelFrame(tab1, text="Select Pallet → Add Serials")
     frame1.pack(fill=X, padx=5, pady=5)
     ttk.Label(frame1, text="Serial Numbers (one per line):").grid(row=0, column=0, sticky=NW, padx=5, pady=2)
     text_serials = ttk.Text(frame1, height=5)
     text_serials.grid(row=0, column=1, sticky=EW, padx=5, pady=2)
-    
+
     ttk.Label(frame1, text="Pallet ID:").grid(row=1, column=0, sticky=W, padx=5, pady=2)
     combo_pallet = ttk.Combobox(frame1, values=[], state="readonly")
     combo_pallet.grid(row=1, column=1, sticky=EW, padx=5, pady=2)
@@ -36,22 +42,107 @@ def main():
     btn_add.grid(row=3, column=0, columnspan=2, pady=10)
     frame1.columnconfigure(1, weight=1)
 
+    # Scans go to the pallet selected above as soon as they are read; see scanQueue.py
+    frame_scan = ttk.LabelFrame(tab1, text="Scan Mode (barcode scanner → selected pallet)")
+    frame_scan.pack(fill=X, padx=5, pady=5)
+    ttk.Label(frame_scan, text="Scan:").grid(row=0, column=0, sticky=W, padx=5, pady=2)
+    entry_scan = ttk.Entry(frame_scan)
+    entry_scan.grid(row=0, column=1, sticky=EW, padx=5, pady=2)
+    label_scan_status = ttk.Label(frame_scan, text="Click here and scan (keyboard-wedge scanner)")
+    label_scan_status.grid(row=0, column=2, columnspan=2, sticky=W, padx=5, pady=2)
+    ttk.Label(frame_scan, text="Serial Port:").grid(row=1, column=0, sticky=W, padx=5, pady=2)
+    entry_scan_port = ttk.Entry(frame_scan)
+    entry_scan_port.grid(row=1, column=1, sticky=EW, padx=5, pady=2)
+    btn_scan_port = ttk.Button(frame_scan, text="Connect Scanner", bootstyle=const.INFO)
+    btn_scan_port.grid(row=1, column=2, sticky=W, padx=5, pady=2)
+    label_scan_counts = ttk.Label(frame_scan, text="")
+    label_scan_counts.grid(row=1, column=3, sticky=W, padx=5, pady=2)
+    tree_scans = ttk.Treeview(frame_scan, columns=("serial_number", "pallet_id", "status"), show="headings", height=5)
+    tree_scans.grid(row=2, column=0, columnspan=4, sticky=EW, padx=5, pady=5)
+    tree_scans.heading("serial_number", text="Serial Number")
+    tree_scans.heading("pallet_id", text="Pallet ID")
+    tree_scans.heading("status", text="Status")
+    frame_scan.columnconfigure(1, weight=1)
+
     frame3 = ttk.LabelFrame(tab1, text="Serial Numbers to Delete")
     frame3.pack(fill=X, padx=5, pady=5)
     text_bulk_remove = ttk.Text(frame3, height=5)
     text_bulk_remove.pack(fill=X, padx=5, pady=5)
     btn_remove = ttk.Button(frame3, text="Remove Items", bootstyle=const.DANGER)
     btn_remove.pack(pady=5)
-    
+
+    # One set-based update; items of another product than the target pallet stay put
+    frame_move = ttk.LabelFrame(tab1, text="Move Items to Another Pallet")
+    frame_move.pack(fill=X, padx=5, pady=5)
+    move_mode = ttk.StringVar(value="serials")
+    ttk.Radiobutton(frame_move, text="Serial Numbers (one per line):", variable=move_mode,
+                    value="serials").grid(row=0, column=0, sticky=NW, padx=5, pady=2)
+    text_move_serials = ttk.Text(frame_move, height=4)
+    text_move_serials.grid(row=0, column=1, sticky=EW, padx=5, pady=2)
+    ttk.Radiobutton(frame_move, text="Everything on Pallet:", variable=move_mode,
+                    value="pallet").grid(row=1, column=0, sticky=W, padx=5, pady=2)
+    combo_move_source = ttk.Combobox(frame_move, values=[], state="readonly")
+    combo_move_source.grid(row=1, column=1, sticky=EW, padx=5, pady=2)
+    combo_move_source.set("Loading...")
+    ttk.Label(frame_move, text="Target Pallet:").grid(row=2, column=0, sticky=W, padx=5, pady=2)
+    combo_move_target = ttk.Combobox(frame_move, values=[], state="readonly")
+    combo_move_target.grid(row=2, column=1, sticky=EW, padx=5, pady=2)
+    combo_move_target.set("Loading...")
+    btn_move_items = ttk.Button(frame_move, text="Move Items", bootstyle=const.PRIMARY)
+    btn_move_items.grid(row=3, column=0, columnspan=2, pady=10)
+    frame_move.columnconfigure(1, weight=1)
+
     frame2 = ttk.LabelFrame(tab1, text="Import Items from CSV")
     frame2.pack(fill=X, padx=5, pady=5)
-    btn_csv = ttk.Button(frame2, text="Select CSV and Import", bootstyle=const.INFO, command=gui_actions.gui_import_csv)
+    btn_csv = ttk.Button(frame2, text="Select CSV and Import", bootstyle=const.INFO)
     btn_csv.pack(pady=10)
 
-    # --- Manage Pallets ---
-    tab7 = ttk.Frame(tabs)
-    tabs.add(tab7, text="Manage Pallets")
-    
+    # Paged exports with bounded memory; see snapshotExport.py
+    frame_export = ttk.LabelFrame(tab1, text="Export Snapshot (CSV, Parquet or Arrow)")
+    frame_export.pack(fill=X, padx=5, pady=5)
+    ttk.Label(frame_export, text="Dataset:").grid(row=0, column=0, sticky=W, padx=5, pady=2)
+    combo_export_dataset = ttk.Combobox(frame_export, values=gui_actions.EXPORT_DATASETS, state="readonly")
+    combo_export_dataset.grid(row=0, column=1, sticky=EW, padx=5, pady=2)
+    combo_export_dataset.set(gui_actions.EXPORT_DATASETS[0])
+    btn_export = ttk.Button(frame_export, text="Export All...", bootstyle=const.INFO)
+    btn_export.grid(row=0, column=2, padx=5, pady=2)
+    btn_export_changes = ttk.Button(frame_export, text="Export Changes...", bootstyle=const.SECONDARY)
+    btn_export_changes.grid(row=0, column=3, padx=5, pady=2)
+    frame_export.columnconfigure(1, weight=1)
+
+    # Scans and removals are journaled locally and synced in the background; see writeJournal.py
+    frame_sync = ttk.Frame(tab1)
+    frame_sync.pack(fill=X, padx=5, pady=5)
+    label_sync_status = ttk.Label(frame_sync, text="Sync: starting...")
+    label_sync_status.pack(side="left", padx=5)
+    btn_sync_conflicts = ttk.Button(frame_sync, text="View Sync Conflicts", bootstyle=const.SECONDARY)
+    btn_sync_conflicts.pack(side="right", padx=5)
+
+    widgets.update({
+        "text_serials": text_serials, "combo_model": combo_model, "combo_pallet": combo_pallet,
+        "text_bulk_remove": text_bulk_remove,
+        "move_mode": move_mode, "text_move_serials": text_move_serials,
+        "combo_move_source": combo_move_source, "combo_move_target": combo_move_target,
+        "entry_scan": entry_scan, "label_scan_status": label_scan_status, "entry_scan_port": entry_scan_port,
+        "btn_scan_port": btn_scan_port, "label_scan_counts": label_scan_counts, "tree_scans": tree_scans,
+        "label_sync_status": label_sync_status, "combo_export_dataset": combo_export_dataset,
+    })
+
+    # Bind the event handler to the pallet combobox
+    combo_pallet.bind("<<ComboboxSelected>>", lambda event: gui_actions.on_pallet_select(event, widgets))
+
+    btn_add['command'] = lambda: gui_actions.gui_bulk_add_serials(widgets)
+    btn_remove['command'] = lambda: gui_actions.gui_bulk_remove(widgets)
+    btn_move_items['command'] = lambda: gui_actions.gui_move_items(widgets)
+    entry_scan.bind("<Return>", lambda event: gui_actions.gui_scan(widgets))
+    entry_scan.bind("<KP_Enter>", lambda event: gui_actions.gui_scan(widgets))
+    btn_scan_port['command'] = lambda: gui_actions.gui_toggle_serial_scanner(widgets)
+    btn_sync_conflicts['command'] = lambda: gui_actions.gui_show_sync_conflicts(widgets)
+    btn_csv['command'] = lambda: gui_actions.gui_import_csv(widgets)
+    btn_export['command'] = lambda: gui_actions.gui_export(widgets)
+    btn_export_changes['command'] = lambda: gui_actions.gui_export(widgets, incremental=True)
+
+def build_manage_pallets(tab7, widgets):
     # Frame for ADDING pallet
     frame7 = ttk.LabelFrame(tab7, text="Add New Pallet")
     frame7.pack(fill=X, padx=5, pady=5)
@@ -86,24 +177,54 @@ def main():
     # NEW Frame for MODIFYING pallet shelf
     frame9 = ttk.LabelFrame(tab7, text="Modify Pallet Shelf")
     frame9.pack(fill=X, padx=5, pady=(10, 5))
-    
+
     ttk.Label(frame9, text="Select Pallet to Modify:").grid(row=0, column=0, sticky=W, padx=5, pady=2)
     combo_modify_pallet_select = ttk.Combobox(frame9, values=[], state="readonly")
     combo_modify_pallet_select.grid(row=0, column=1, sticky=EW, padx=5, pady=2)
     combo_modify_pallet_select.set("Loading...")
-    
+
     ttk.Label(frame9, text="New Shelf ID:").grid(row=1, column=0, sticky=W, padx=5, pady=2)
     entry_new_shelf_id = ttk.Entry(frame9)
     entry_new_shelf_id.grid(row=1, column=1, sticky=EW, padx=5, pady=2)
-    
+
     btn_update_shelf = ttk.Button(frame9, text="Update Shelf Location", bootstyle=const.INFO)
     btn_update_shelf.grid(row=2, column=0, columnspan=2, pady=10)
-    
+
     frame9.columnconfigure(1, weight=1)
 
-    # --- Add Product ---
-    tab6 = ttk.Frame(tabs)
-    tabs.add(tab6, text="Add Product")
+    # Frame for MOVING many pallets at once (e.g. re-slotting an aisle)
+    frame10 = ttk.LabelFrame(tab7, text="Move Pallets to Shelf")
+    frame10.pack(fill=X, padx=5, pady=(10, 5))
+    ttk.Label(frame10, text="Pallet IDs (one per line):").grid(row=0, column=0, sticky=NW, padx=5, pady=2)
+    text_move_pallets = ttk.Text(frame10, height=4)
+    text_move_pallets.grid(row=0, column=1, sticky=EW, padx=5, pady=2)
+    ttk.Label(frame10, text="New Shelf ID:").grid(row=1, column=0, sticky=W, padx=5, pady=2)
+    entry_move_shelf_id = ttk.Entry(frame10)
+    entry_move_shelf_id.grid(row=1, column=1, sticky=EW, padx=5, pady=2)
+    btn_move_pallets = ttk.Button(frame10, text="Move Pallets", bootstyle=const.INFO)
+    btn_move_pallets.grid(row=2, column=0, columnspan=2, pady=10)
+    frame10.columnconfigure(1, weight=1)
+
+    # Frame for IMPORTING pallets (e.g. a new shipment)
+    frame_import_pallets = ttk.LabelFrame(tab7, text="Import Pallets from CSV (pallet_id, shelf_id, model_number, notes)")
+    frame_import_pallets.pack(fill=X, padx=5, pady=(10, 5))
+    btn_import_pallets = ttk.Button(frame_import_pallets, text="Select CSV and Import", bootstyle=const.INFO)
+    btn_import_pallets.pack(pady=10)
+
+    widgets.update({
+        "entry_pallet_id": entry_pallet_id, "entry_shelf_id": entry_shelf_id, "combo_product_model": combo_product_model, "entry_notes": entry_notes,
+        "combo_remove_pallet": combo_remove_pallet,
+        "combo_modify_pallet_select": combo_modify_pallet_select, "entry_new_shelf_id": entry_new_shelf_id,
+        "text_move_pallets": text_move_pallets, "entry_move_shelf_id": entry_move_shelf_id,
+    })
+
+    btn_add_pallet['command'] = lambda: gui_actions.gui_add_pallet(widgets)
+    btn_remove_pallet['command'] = lambda: gui_actions.gui_remove_pallet(widgets)
+    btn_update_shelf['command'] = lambda: gui_actions.gui_update_pallet_shelf(widgets)
+    btn_move_pallets['command'] = lambda: gui_actions.gui_move_pallets(widgets)
+    btn_import_pallets['command'] = lambda: gui_actions.gui_import_catalog(widgets, "pallets")
+
+def build_add_product(tab6, widgets):
     frame6 = ttk.LabelFrame(tab6, text="Add New Product")
     frame6.pack(fill=X, padx=5, pady=5)
     ttk.Label(frame6, text="Product Name:").grid(row=1, column=0, sticky=W, padx=5, pady=2)
@@ -118,10 +239,18 @@ def main():
     btn_add_product = ttk.Button(frame6, text="Add Product", bootstyle=const.SUCCESS)
     btn_add_product.grid(row=4, column=0, columnspan=2, pady=10)
     frame6.columnconfigure(1, weight=1)
-    
-    # --- View by Pallet ---
-    tab4 = ttk.Frame(tabs)
-    tabs.add(tab4, text="View by Pallet")
+
+    frame_import_products = ttk.LabelFrame(tab6, text="Import Products from CSV (product_name, model_number, product_description)")
+    frame_import_products.pack(fill=X, padx=5, pady=5)
+    btn_import_products = ttk.Button(frame_import_products, text="Select CSV and Import", bootstyle=const.INFO)
+    btn_import_products.pack(pady=10)
+
+    widgets.update({"entry_prod_name": entry_prod_name, "entry_prod_desc": entry_prod_desc, "entry_model_num": entry_model_num})
+    btn_add_product['command'] = lambda: gui_actions.gui_add_product(widgets)
+    btn_import_products['command'] = lambda: gui_actions.gui_import_catalog(widgets, "products")
+
+def build_view_by_pallet(tab4, widgets):
+    tasks = widgets['tasks']
     frame4 = ttk.LabelFrame(tab4, text="Filter Items by Pallet")
     frame4.pack(fill=X, padx=5, pady=5)
     ttk.Label(frame4, text="Select Pallet ID:").grid(row=0, column=0, sticky=W, padx=5, pady=2)
@@ -132,14 +261,24 @@ def main():
     btn_view.grid(row=0, column=2, padx=5, pady=2)
     frame4.columnconfigure(1, weight=1)
     columns = ("item_id", "serial_number", "pallet_id", "product_id")
-    tree_items = ttk.Treeview(tab4, columns=columns, show="headings", bootstyle=const.INFO)
-    tree_items.pack(fill=BOTH, expand=YES, padx=5, pady=5)
+    frame_items = ttk.Frame(tab4)
+    frame_items.pack(fill=BOTH, expand=YES, padx=5, pady=5)
+    tree_items = ttk.Treeview(frame_items, columns=columns, show="headings", bootstyle=const.INFO)
+    scroll_items = ttk.Scrollbar(frame_items, orient="vertical")
+    scroll_items.pack(side="right", fill="y")
+    tree_items.pack(fill=BOTH, expand=YES)
     for col in columns:
         tree_items.heading(col, text=col.replace("_", " ").title())
+    label_items_status = ttk.Label(tab4, text="")
+    label_items_status.pack(anchor=W, padx=5)
+    virtual_items = VirtualTreeview(tree_items, scroll_items, label_items_status,
+                                    run=lambda work, done: tasks.submit("View by Pallet", work, done))
 
-    # --- View by Model ---
-    tab5 = ttk.Frame(tabs)
-    tabs.add(tab5, text="View by Model")
+    widgets.update({"combo_view_pallet": combo_view_pallet, "tree_items": tree_items, "virtual_items": virtual_items})
+    btn_view['command'] = lambda: gui_actions.gui_view_by_pallet(widgets)
+
+def build_view_by_model(tab5, widgets):
+    tasks = widgets['tasks']
     frame5 = ttk.LabelFrame(tab5, text="Filter Items by Product (Model Number)")
     frame5.pack(fill=X, padx=5, pady=5)
     ttk.Label(frame5, text="Select Model Number:").grid(row=0, column=0, sticky=W, padx=5, pady=2)
@@ -150,19 +289,29 @@ def main():
     btn_view_product.grid(row=0, column=2, padx=5, pady=2)
     frame5.columnconfigure(1, weight=1)
     columns_product = ("item_id", "serial_number", "pallet_id", "product_id")
-    tree_items_product = ttk.Treeview(tab5, columns=columns_product, show="headings", bootstyle=const.INFO)
-    tree_items_product.pack(fill=BOTH, expand=YES, padx=5, pady=5)
+    frame_items_product = ttk.Frame(tab5)
+    frame_items_product.pack(fill=BOTH, expand=YES, padx=5, pady=5)
+    tree_items_product = ttk.Treeview(frame_items_product, columns=columns_product, show="headings", bootstyle=const.INFO)
+    scroll_items_product = ttk.Scrollbar(frame_items_product, orient="vertical")
+    scroll_items_product.pack(side="right", fill="y")
+    tree_items_product.pack(fill=BOTH, expand=YES)
     for col in columns_product:
         tree_items_product.heading(col, text=col.replace("_", " ").title())
+    label_items_product_status = ttk.Label(tab5, text="")
+    label_items_product_status.pack(anchor=W, padx=5)
+    virtual_items_product = VirtualTreeview(tree_items_product, scroll_items_product, label_items_product_status,
+                                            run=lambda work, done: tasks.submit("View by Model", work, done))
 
-    # View by Aisle
-    tab_aisle = ttk.Frame(tabs)
-    tabs.add(tab_aisle, text="View by Aisle")
+    widgets.update({"combo_view_model": combo_view_model, "tree_items_product": tree_items_product,
+                    "virtual_items_product": virtual_items_product})
+    btn_view_product['command'] = lambda: gui_actions.gui_view_by_product(widgets)
+
+def build_view_by_aisle(tab_aisle, widgets):
     frame_aisle = ttk.LabelFrame(tab_aisle, text="Filter Pallets by Aisle Location")
     frame_aisle.pack(fill=X, padx=5, pady=5)
     ttk.Label(frame_aisle, text="Select Aisle:").grid(row=0, column=0, sticky=W, padx=5, pady=2)
-    aisle_names = ['Narrow Aisle', 'Wide Aisle', 'Cable Aisle', 'Aisle 4', 'Loading bay']
-    combo_view_aisle = ttk.Combobox(frame_aisle, values=aisle_names, state="readonly")
+    # Aisle names come from the aisle table with the other dropdowns
+    combo_view_aisle = ttk.Combobox(frame_aisle, values=[], state="readonly")
     combo_view_aisle.grid(row=0, column=1, sticky=EW, padx=5, pady=2)
     combo_view_aisle.set("Select an Aisle")
     btn_view_aisle = ttk.Button(frame_aisle, text="View Pallets")
@@ -173,31 +322,30 @@ def main():
     tree_aisle_pallets.pack(fill=BOTH, expand=YES, padx=5, pady=5)
     tree_aisle_pallets.heading("pallet_id", text="Pallet ID")
     tree_aisle_pallets.heading("shelf_id", text="Shelf Location")
-    tree_aisle_pallets.heading("model_number", text="Model Number")        
+    tree_aisle_pallets.heading("model_number", text="Model Number")
+
+    widgets.update({"tree_aisle_pallets": tree_aisle_pallets, "combo_view_aisle": combo_view_aisle})
+    btn_view_aisle['command'] = lambda: gui_actions.gui_view_by_aisle(widgets)
 
-    # --- Stock Counts ---
-    tab_stock = ttk.Frame(tabs)
-    tabs.add(tab_stock, text="Stock Counts")
+def build_stock_counts(tab_stock, widgets):
     frame_stock = ttk.LabelFrame(tab_stock, text="Current Stock by Model Number")
     frame_stock.pack(fill=BOTH, expand=YES, padx=5, pady=5)
     tree_stock = ttk.Treeview(frame_stock, columns=("model_number", "count"), show="headings", bootstyle=const.INFO)
     tree_stock.pack(fill=BOTH, expand=YES)
     tree_stock.heading("model_number", text="Model Number")
     tree_stock.heading("count", text="Count")
+    widgets["tree_stock"] = tree_stock
 
-    # --- Pallet Counts ---
-    tab_pallet_counts = ttk.Frame(tabs)
-    tabs.add(tab_pallet_counts, text="Pallet Counts")
+def build_pallet_counts(tab_pallet_counts, widgets):
     frame_pallet_counts = ttk.LabelFrame(tab_pallet_counts, text="Number of Pallets by Model Number")
     frame_pallet_counts.pack(fill=BOTH, expand=YES, padx=5, pady=5)
     tree_pallet_counts = ttk.Treeview(frame_pallet_counts, columns=("model_number", "pallet_count"), show="headings", bootstyle=const.INFO)
     tree_pallet_counts.pack(fill=BOTH, expand=YES)
     tree_pallet_counts.heading("model_number", text="Model Number")
     tree_pallet_counts.heading("pallet_count", text="Pallet Count")
+    widgets["tree_pallet_counts"] = tree_pallet_counts
 
-    # --- Pallet Info ---
-    tab_pallet_info = ttk.Frame(tabs)
-    tabs.add(tab_pallet_info, text='Pallet Info')
+def build_pallet_info(tab_pallet_info, widgets):
     frame_pallet_info = ttk.LabelFrame(tab_pallet_info, text="Pallet Details (Location and Model)")
     frame_pallet_info.pack(fill=BOTH, expand=YES, padx=5, pady=5)
     pallet_info_cols = ("pallet_id", "shelf_id", "model_number")
@@ -206,51 +354,191 @@ def main():
     tree_pallet_info.heading("pallet_id", text="Pallet ID")
     tree_pallet_info.heading("shelf_id", text="Shelf Location")
     tree_pallet_info.heading("model_number", text="Model Number")
+    widgets["tree_pallet_info"] = tree_pallet_info
 
-    # ---------- Widget Dictionary and Command Binding ----------
-    widgets = {
-        "app": app,
-        "text_serials": text_serials, "combo_model": combo_model, "combo_pallet": combo_pallet,
-        "text_bulk_remove": text_bulk_remove,
-        "combo_view_pallet": combo_view_pallet, "tree_items": tree_items,
-        "combo_view_model": combo_view_model, "tree_items_product": tree_items_product,
-        "entry_prod_name": entry_prod_name, "entry_prod_desc": entry_prod_desc, "entry_model_num": entry_model_num,
-        "entry_pallet_id": entry_pallet_id, "entry_shelf_id": entry_shelf_id, "combo_product_model": combo_product_model, "entry_notes": entry_notes,
-        "combo_remove_pallet": combo_remove_pallet,
-        "combo_modify_pallet_select": combo_modify_pallet_select, "entry_new_shelf_id": entry_new_shelf_id, # Added new widgets
-        "tree_stock": tree_stock,
-        "tree_pallet_counts": tree_pallet_counts,
-        "tree_pallet_info": tree_pallet_info,
-        "tree_stock": tree_stock,
-        "tree_aisle_pallets": tree_aisle_pallets,
-        "combo_view_aisle": combo_view_aisle
-    }
+def build_diagnostics(tab_diagnostics, widgets):
+    frame_diagnostics = ttk.LabelFrame(tab_diagnostics, text="Backend Calls (since start-up)")
+    frame_diagnostics.pack(fill=BOTH, expand=YES, padx=5, pady=5)
+    diagnostics_cols = ("operation", "calls", "errors", "p50_ms", "p99_ms", "mean_ms",
+                        "round_trips", "rows", "kb", "cache_hit", "retries")
+    tree_diagnostics = ttk.Treeview(frame_diagnostics, columns=diagnostics_cols, show="headings", bootstyle=const.INFO)
+    tree_diagnostics.pack(fill=BOTH, expand=YES)
+    for col, title in zip(diagnostics_cols, ("Operation", "Calls", "Errors", "p50 ms", "p99 ms", "Mean ms",
+                                             "Round Trips", "Rows", "KB", "Cache Hit %", "Retries")):
+        tree_diagnostics.heading(col, text=title)
+        tree_diagnostics.column(col, width=320 if col == "operation" else 80, anchor=W if col == "operation" else "e")
+    frame_histogram = ttk.LabelFrame(tab_diagnostics, text="Latency Histogram (selected operation)")
+    frame_histogram.pack(fill=X, padx=5, pady=5)
+    canvas_histogram = ttk.Canvas(frame_histogram, height=200, highlightthickness=0)
+    canvas_histogram.pack(fill=X, expand=YES, padx=5, pady=5)
+    frame_diagnostics_actions = ttk.Frame(tab_diagnostics)
+    frame_diagnostics_actions.pack(fill=X, padx=5)
+    btn_reset_metrics = ttk.Button(frame_diagnostics_actions, text="Reset", bootstyle=const.SECONDARY)
+    btn_reset_metrics.pack(side="left", padx=5, pady=2)
+    label_metrics_export = ttk.Label(frame_diagnostics_actions, text="")
+    label_metrics_export.pack(side="left", padx=5)
 
-    # Bind the event handler to the pallet combobox
-    combo_pallet.bind("<<ComboboxSelected>>", lambda event: gui_actions.on_pallet_select(event, widgets))
+    widgets.update({"tree_diagnostics": tree_diagnostics, "canvas_histogram": canvas_histogram,
+                    "label_metrics_export": label_metrics_export})
+    btn_reset_metrics['command'] = lambda: gui_actions.gui_reset_metrics(widgets)
+    tree_diagnostics.bind("<<TreeviewSelect>>", lambda event: gui_actions.refresh_diagnostics(widgets, reschedule=False))
 
-    btn_add['command'] = lambda: gui_actions.gui_bulk_add_serials(widgets)
-    btn_remove['command'] = lambda: gui_actions.gui_bulk_remove(widgets)
-    btn_view['command'] = lambda: gui_actions.gui_view_by_pallet(widgets)
-    btn_view_product['command'] = lambda: gui_actions.gui_view_by_product(widgets)
-    btn_add_product['command'] = lambda: gui_actions.gui_add_product(widgets)
-    btn_add_pallet['command'] = lambda: gui_actions.gui_add_pallet(widgets)
-    btn_remove_pallet['command'] = lambda: gui_actions.gui_remove_pallet(widgets)
-    btn_update_shelf['command'] = lambda: gui_actions.gui_update_pallet_shelf(widgets)
-    btn_view_aisle['command'] = lambda: gui_actions.gui_view_by_aisle(widgets)
+TABS = (
+    ("Manage Items", build_manage_items),
+    ("Manage Pallets", build_manage_pallets),
+    ("Add Product", build_add_product),
+    ("View by Pallet", build_view_by_pallet),
+    ("View by Model", build_view_by_model),
+    ("View by Aisle", build_view_by_aisle),
+    ("Stock Counts", build_stock_counts),
+    ("Pallet Counts", build_pallet_counts),
+    ("Pallet Info", build_pallet_info),
+    ("Diagnostics", build_diagnostics),
+)
+
+def report_startup(marks):
+    """Print the start-up marks (ms since launch); True if the first window was within budget."""
+    print("Start-up (ms since launch):")
+    for name, ms in marks.items():
+        print(f"  {name:<14}{ms:8.1f}")
+    first_window = marks.get("first_window")
+    within = first_window is not None and first_window <= STARTUP_BUDGET_MS
+    print(f"Time to first window: {'-' if first_window is None else f'{first_window:.1f}'} ms "
+          f"(budget {STARTUP_BUDGET_MS:.0f} ms) - {'OK' if within else 'OVER BUDGET'}")
+    return within
+
+def main(argv=None):
+    """
+    Main function to create and run the ttkbootstrap GUI application.
+    The window is shown first; the database client, the open tab's widgets
+    and the dropdown data all come after it has painted.
+    """
+    parser = argparse.ArgumentParser(description="Inventory Manager")
+    parser.add_argument("--measure-startup", action="store_true",
+                        help="print start-up timings, then exit (status 1 if over INVENTORY_STARTUP_BUDGET_MS)")
+    args = parser.parse_args(argv)
+
+    marks = {"imports": (time.perf_counter() - STARTED) * 1000}
+    def mark(name):
+        marks.setdefault(name, (time.perf_counter() - STARTED) * 1000)
+
+    # ---------- Main Window & Tabs ----------
+    app = ttk.Window(title="Inventory Manager", themename="darkly", size=(1500, 900))
+    # Backend calls run on worker threads so the window never blocks on the network
+    tasks = TaskExecutor(app)
+    # Says when the window shows the last launch's saved data (see startupSnapshot.py)
+    label_data_status = ttk.Label(app, text="")
+    label_data_status.pack(side="bottom", anchor=W, padx=10, pady=(0, 5))
+
+    # Global search (searchIndex.py): part of a serial, model number or product name;
+    # Enter or a double-click opens the match's pallet or model
+    frame_search = ttk.Frame(app)
+    frame_search.pack(fill=X, padx=10, pady=(10, 0))
+    ttk.Label(frame_search, text="Search:").pack(side="left", padx=(0, 5))
+    entry_search = ttk.Entry(frame_search)
+    entry_search.pack(side="left", fill=X, expand=YES)
+    label_search_status = ttk.Label(frame_search, text="", width=14)
+    label_search_status.pack(side="left", padx=5)
+    search_columns = ("match", "field", "location", "score")
+    tree_search = ttk.Treeview(app, columns=search_columns, show="headings", height=6, bootstyle=const.INFO)
+    for col, width in zip(search_columns, (300, 140, 300, 60)):
+        tree_search.heading(col, text=col.title())
+        tree_search.column(col, width=width, stretch=col != "score")
+
+    tabs = ttk.Notebook(app)
+    tabs.pack(fill=BOTH, expand=YES, padx=10, pady=10)
+    widgets = {"app": app, "tasks": tasks, "tabs": tabs, "label_data_status": label_data_status,
+               "frame_search": frame_search, "entry_search": entry_search,
+               "label_search_status": label_search_status, "tree_search": tree_search}
+
+    entry_search.bind("<KeyRelease>", lambda event: gui_actions.gui_search_changed(widgets, event))
+    entry_search.bind("<Return>", lambda event: gui_actions.gui_search_jump(widgets))
+    entry_search.bind("<KP_Enter>", lambda event: gui_actions.gui_search_jump(widgets))
+    entry_search.bind("<Down>", lambda event: tree_search.focus_set())
+    entry_search.bind("<Escape>", lambda event: gui_actions.gui_hide_search(widgets))
+    tree_search.bind("<Double-1>", lambda event: gui_actions.gui_search_jump(widgets))
+    tree_search.bind("<Return>", lambda event: gui_actions.gui_search_jump(widgets))
+    tree_search.bind("<Escape>", lambda event: gui_actions.gui_hide_search(widgets))
+
+    # Tabs start empty and are built when first shown; a new tab's comboboxes
+    # get the dropdown data already fetched
+    lazy = LazyNotebook(tabs, on_build=lambda text: gui_actions.update_dropdowns_in_gui(widgets))
+    widgets["lazy"] = lazy
+    for text, build in TABS:
+        lazy.add(text, lambda frame, build=build: build(frame, widgets))
+
+    # ---------- Busy Indicators ----------
+    for text, frame in lazy.frames.items():
+        busy = ttk.Progressbar(frame, mode="indeterminate", bootstyle=const.INFO)
+        busy.pack(side="bottom", fill=X, padx=5, pady=(0, 5))
+        tasks.set_indicator(text, busy)
+    mark("window")
+
+    # ---------- Start-up (after the first paint) ----------
+    state = {"scheduled": False, "started": False, "exit_code": 0}
+
+    def on_tab_changed(event):
+        if not state["started"]:
+            return # finish_startup builds the first tab
+        lazy.build()
+        gui_actions.on_tab_change(event, widgets)
+    tabs.bind("<<NotebookTabChanged>>", on_tab_changed)
+
+    def finish_measure():
+        if app.winfo_exists():
+            state["exit_code"] = 0 if report_startup(marks) else 1
+            app.destroy()
+
+    def dropdowns_loaded():
+        mark("dropdowns")
+        if args.measure_startup:
+            finish_measure()
+
+    def finish_startup():
+        mark("first_window")
+        state["started"] = True
+        # Last launch's data first (a local file), so the first tab opens filled
+        if gui_actions.load_startup_snapshot(widgets):
+            mark("snapshot")
+        lazy.build()
+        app.update_idletasks()
+        mark("first_tab")
+
+        # Journal item writes locally and replay them in the background
+        gui_actions.start_sync(widgets)
+
+        # Optional Prometheus endpoint (INVENTORY_METRICS_PORT)
+        gui_actions.metrics.serve_prometheus()
+
+        # Patch open views from the change feed instead of reloading them
+        gui_actions.start_live_updates(widgets)
 
-    tabs.bind("<<NotebookTabChanged>>", lambda event: gui_actions.on_tab_change(event, widgets))
+        # Background data fetch
+        initial_load_thread = threading.Thread(
+            target=gui_actions.fetch_data_for_dropdowns,
+            args=(app, widgets, dropdowns_loaded),
+            daemon=True
+        )
+        initial_load_thread.start()
+        if args.measure_startup:
+            app.after(STARTUP_MEASURE_TIMEOUT_MS, finish_measure)
 
-    # Background data fetch
-    initial_load_thread = threading.Thread(
-        target=gui_actions.fetch_data_for_dropdowns, 
-        args=(app, widgets), 
-        daemon=True
-    )
-    initial_load_thread.start()
+    def on_first_map(event):
+        if event.widget is app and not state["scheduled"]:
+            state["scheduled"] = True
+            app.after_idle(finish_startup)
+    app.bind("<Map>", on_first_map, add="+")
 
     # ---------- Run the App ----------
     app.mainloop()
+    gui_actions.stop_scanning()
+    gui_actions.save_startup_snapshot()
+    # Anything not yet synced stays in the journal for the next start
+    gui_actions.journal_sync.stop()
+    tasks.shutdown()
+    gui_actions.asyncBackend.close()
+    gui_actions.metrics.close()
+    return state["exit_code"]
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import argparse
+import csv
+import sys
+import time
+from datetime import datetime
+import backend
+
+# ---------------- Maintenance commands ----------------
+# python maintenance.py check-counts     report products whose stored counts drifted
+# python maintenance.py rebuild-counts   recompute the stored counts from item/pallet
+# python maintenance.py aisle-rules      list the shelf-prefix -> aisle rules
+# python maintenance.py set-aisle-rules rules.csv
+#                                        replace the rules (shelf_prefix,aisle_name rows) and reassign shelves
+# python maintenance.py journal-status   unsynced writes and conflicts in the local write journal
+# python maintenance.py sync-journal     replay the write journal now and wait until it is caught up
+# python maintenance.py journal-conflicts [--csv conflicts.csv] [--clear]
+#                                        report (or export, then clear) writes the sync could not apply
+# python maintenance.py export item items.parquet [--incremental]
+#                                        export a dataset (item, pallet, product, pallet_info) to .csv.gz,
+#                                        .csv, .parquet or .arrow; --incremental writes only rows changed
+#                                        since that dataset's last export (needs changeLog.sql)
+# python maintenance.py prune-changes [--days 30]
+#                                        delete old change-log entries
+# python maintenance.py import-products products.csv
+# python maintenance.py import-pallets pallets.csv
+#                                        bulk-add products / pallets and print the result of every row
+
+def check_counts(args):
+    mismatches = backend.checkModelCounts()
+    if mismatches is None:
+        return 2
+    if not mismatches:
+        print("Product counts are consistent.")
+        return 0
+    print(f"{len(mismatches)} products have inconsistent counts:")
+    for r in mismatches:
+        print(f"  product {r['product_id']}: items {r['stored_items']} stored / {r['actual_items']} actual, "
+              f"pallets {r['stored_pallets']} stored / {r['actual_pallets']} actual")
+    if args.fix:
+        return 0 if backend.rebuildModelCounts() else 2
+    return 1
+
+def rebuild_counts(args):
+    return 0 if backend.rebuildModelCounts() else 2
+
+def aisle_rules(args):
+    rules = backend.getAisleRules()
+    if rules is None:
+        return 2
+    for r in rules:
+        print(f"  {r['shelf_prefix']:<6} {r['aisle_name']}")
+    return 0
+
+def set_aisle_rules(args):
+    try:
+        with open(args.csv_path, newline='', encoding='utf-8') as f:
+            rules = [(row["shelf_prefix"], row["aisle_name"]) for row in csv.DictReader(f)]
+    except (OSError, KeyError) as e:
+        print(f"Could not read aisle rules from {args.csv_path}: {e}")
+        return 2
+    reassigned = backend.setAisleRules(rules)
+    if reassigned is None:
+        return 2
+    print(f"Loaded {len(rules)} aisle rules; {reassigned} shelves changed aisle.")
+    return 0
+
+def journal_status(args):
+    status = backend.journal_status()
+    if status is None:
+        return 2
+    print(f"{status['pending']} journal entries ({status['pending_rows']} writes) waiting to sync, "
+          f"{status['conflicts']} conflicts.")
+    return 0
+
+def sync_journal(args):
+    if not backend.start_journal_sync():
+        print("The write journal is disabled (INVENTORY_JOURNAL=0).")
+        return 2
+    deadline = time.monotonic() + args.timeout
+    while time.monotonic() < deadline:
+        status = backend.journal_status()
+        if status is None:
+            return 2
+        if not status["pending"]:
+            print(f"Journal is caught up; {status['conflicts']} conflicts.")
+            return 0 if not status["conflicts"] else 1
+        if not status["online"]:
+            print(f"Database unreachable ({status['last_error']}); {status['pending_rows']} writes still waiting.")
+            return 2
+        time.sleep(0.5)
+    print("Timed out waiting for the journal to sync.")
+    return 2
+
+def journal_conflicts(args):
+    conflicts = backend.journal_conflicts()
+    for c in conflicts:
+        print(f"  {datetime.fromtimestamp(c['at']):%Y-%m-%d %H:%M:%S}  {c['op']:<13} {c['serial_number']}: {c['reason']}")
+    print(f"{len(conflicts)} conflicts.")
+    if args.csv:
+        with open(args.csv, "w", newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=["at", "op", "serial_number", "reason", "key"])
+            writer.writeheader()
+            writer.writerows(conflicts)
+        print(f"Exported to {args.csv}")
+    if args.clear:
+        backend.journal.clear_conflicts()
+        print("Conflicts cleared.")
+    return 0
+
+def export(args):
+    export_fn = backend.exportChanges if args.incremental else backend.exportSnapshot
+    report = export_fn(args.dataset, args.path, state_path=args.state)
+    return 2 if report.get("error") else 0
+
+def prune_changes(args):
+    return 0 if backend.pruneChangeLog(args.days) is not None else 2
+
+def import_catalog(args):
+    import_csv = backend.importProductsFromCsv if args.kind == "products" else backend.importPalletsFromCsv
+    report = import_csv(args.csv_path)
+    if report.get("error"):
+        return 2
+    for r in report["rows"]:
+        print(f"  line {r['line']}: {r['key'] or '(blank)'} {r['status']} {r['message']}".rstrip())
+    print(", ".join(f"{status} {report[status]}" for status in backend.CATALOG_STATUSES))
+    return 0 if report["inserted"] + report["duplicate"] == report["rows_read"] else 1
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inventory database maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    check = commands.add_parser("check-counts", help="Compare stored stock/pallet counts with a recount")
+    check.add_argument("--fix", action="store_true", help="Rebuild the counts if they are inconsistent")
+    check.set_defaults(func=check_counts)
+
+    rebuild = commands.add_parser("rebuild-counts", help="Recompute stored stock/pallet counts")
+    rebuild.set_defaults(func=rebuild_counts)
+
+    rules = commands.add_parser("aisle-rules", help="List the shelf-prefix -> aisle rules")
+    rules.set_defaults(func=aisle_rules)
+
+    set_rules = commands.add_parser("set-aisle-rules", help="Replace the aisle rules from a CSV file")
+    set_rules.add_argument("csv_path", help="CSV with shelf_prefix,aisle_name columns")
+    set_rules.set_defaults(func=set_aisle_rules)
+
+    status = commands.add_parser("journal-status", help="Show unsynced writes in the local write journal")
+    status.set_defaults(func=journal_status)
+
+    sync = commands.add_parser("sync-journal", help="Replay the local write journal to the database")
+    sync.add_argument("--timeout", type=float, default=300, help="Seconds to wait for the journal to catch up")
+    sync.set_defaults(func=sync_journal)
+
+    conflicts = commands.add_parser("journal-conflicts", help="Report writes the sync could not apply")
+    conflicts.add_argument("--csv", help="Also export the conflicts to this CSV file")
+    conflicts.add_argument("--clear", action="store_true", help="Clear the conflicts after reporting them")
+    conflicts.set_defaults(func=journal_conflicts)
+
+    exports = commands.add_parser("export", help="Export a dataset to CSV, Parquet or Arrow")
+    exports.add_argument("dataset", choices=backend.EXPORT_DATASETS)
+    exports.add_argument("path", help="Output file; the extension picks the format")
+    exports.add_argument("--incremental", action="store_true",
+                         help="Only rows changed since this dataset's last export")
+    exports.add_argument("--state", default=backend.EXPORT_STATE_FILE, help="Export state file")
+    exports.set_defaults(func=export)
+
+    prune = commands.add_parser("prune-changes", help="Delete old change-log entries")
+    prune.add_argument("--days", type=float, default=30, help="Keep entries newer than this")
+    prune.set_defaults(func=prune_changes)
+
+    for kind in ("products", "pallets"):
+        imports = commands.add_parser(f"import-{kind}", help=f"Bulk-add {kind} from a CSV file")
+        imports.add_argument("csv_path", help="CSV with " + ", ".join(
+            backend.PRODUCT_CSV_COLUMNS + ("product_description",) if kind == "products"
+            else backend.PALLET_CSV_COLUMNS + ("notes",)) + " columns")
+        imports.set_defaults(func=import_catalog, kind=kind)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
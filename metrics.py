@@ -0,0 +1,351 @@
+import contextvars
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+# ---------------- Metrics ----------------
+# Timing, row and byte counts, round trips, cache hits and retries for every
+# backend function and every storage engine call. Calls nest: a backend
+# function's totals include the engine calls (and cache lookups) made inside
+# it, so one record shows what a tab switch or button press cost.
+
+# Histogram bucket upper bounds in seconds (the last bucket is everything slower)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Latest latencies kept per operation for the percentiles
+RECENT_SAMPLES = 500
+
+# One JSON line per call to this file when INVENTORY_METRICS_FILE is set (off by default)
+METRICS_FILE = os.getenv("INVENTORY_METRICS_FILE", "")
+METRICS_FILE_MAX_BYTES = 5 * 1024 * 1024
+METRICS_FILE_BACKUPS = 3
+# Response sizes cost a JSON encoding of every engine response, so they are
+# only measured with INVENTORY_METRICS_BYTES=1 (bytes read 0 otherwise)
+METRICS_BYTES = os.getenv("INVENTORY_METRICS_BYTES", "0") == "1"
+# Prometheus text endpoint on http://METRICS_HOST:METRICS_PORT/metrics when the port is set
+METRICS_PORT = int(os.getenv("INVENTORY_METRICS_PORT", "0")) or None
+METRICS_HOST = os.getenv("INVENTORY_METRICS_HOST", "127.0.0.1")
+
+# Engine attributes that are not database calls
+_UNMETERED = {"name", "table", "async_engine", "aclose", "start_change_feed"}
+
+def _percentile(ordered, pct):
+    if not ordered:
+        return None
+    return ordered[min(int(pct / 100 * len(ordered)), len(ordered) - 1)]
+
+def _payload_size(data):
+    """Approximate wire size of a response payload (its compact JSON length)."""
+    if not data:
+        return 0
+    try:
+        return len(json.dumps(data, separators=(",", ":"), default=str))
+    except (TypeError, ValueError):
+        return 0
+
+class _Call:
+    """One timed call in progress; its counters roll up into the enclosing call."""
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.start = time.perf_counter()
+        self.rows = 0
+        self.bytes = 0
+        self.round_trips = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.retries = 0
+        self.errors = 0     # this call and nested calls that raised
+        self.error = None
+
+class Series:
+    """Totals and a latency histogram for one operation."""
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+        self.rows = 0
+        self.bytes = 0
+        self.round_trips = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.retries = 0
+
+    def add(self, call, seconds):
+        self.calls += 1
+        self.errors += call.errors > 0
+        self.seconds += seconds
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.recent.append(seconds)
+        self.rows += call.rows
+        self.bytes += call.bytes
+        self.round_trips += call.round_trips
+        self.cache_hits += call.cache_hits
+        self.cache_misses += call.cache_misses
+        self.retries += call.retries
+
+    def snapshot(self):
+        ordered = sorted(self.recent)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "mean_ms": self.seconds / self.calls * 1000 if self.calls else 0.0,
+            "p50_ms": (_percentile(ordered, 50) or 0.0) * 1000,
+            "p99_ms": (_percentile(ordered, 99) or 0.0) * 1000,
+            "max_ms": (ordered[-1] if ordered else 0.0) * 1000,
+            "buckets": list(self.buckets),
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "round_trips": self.round_trips,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "retries": self.retries,
+        }
+
+class Metrics:
+    """
+    Collects a Series per operation name. Use `timed` on functions,
+    `operation(name)` around blocks, and MeteredEngine around a storage
+    engine. Snapshots feed the Diagnostics tab; the same numbers go to a
+    rotating JSON-lines file and an optional Prometheus endpoint.
+    """
+    def __init__(self):
+        self._series = {}
+        self._cache = {}    # query name -> [hits, misses]
+        self._lock = threading.Lock()
+        self._current = contextvars.ContextVar("metrics_call", default=None)
+        self._log = None
+        self._server = None
+
+    # Recording
+    @contextmanager
+    def operation(self, name):
+        """Time the enclosed block as one call of `name`; yields the call so counters can be added."""
+        call = _Call(name, self._current.get())
+        token = self._current.set(call)
+        try:
+            yield call
+        except BaseException as e:
+            call.error = e
+            call.errors += 1
+            raise
+        finally:
+            self._current.reset(token)
+            self._finish(call)
+
+    def timed(self, func):
+        """Decorator: record every call of a function (sync or async) as module.function."""
+        name = f"{func.__module__}.{func.__name__}"
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_timed(*args, **kwargs):
+                with self.operation(name):
+                    return await func(*args, **kwargs)
+            return async_timed
+
+        @wraps(func)
+        def timed(*args, **kwargs):
+            with self.operation(name):
+                return func(*args, **kwargs)
+        return timed
+
+    def cache_lookup(self, name, hit):
+        """Count a query cache hit or miss (QueryCache's on_lookup hook)."""
+        with self._lock:
+            counters = self._cache.setdefault(name, [0, 0])
+            counters[0 if hit else 1] += 1
+            call = self._current.get()
+            if call is not None:
+                if hit:
+                    call.cache_hits += 1
+                else:
+                    call.cache_misses += 1
+
+    def retry(self, count=1):
+        """Count a retried request against the current call."""
+        with self._lock:
+            call = self._current.get()
+            if call is not None:
+                call.retries += count
+
+    def _finish(self, call):
+        seconds = time.perf_counter() - call.start
+        with self._lock:
+            self._series.setdefault(call.name, Series()).add(call, seconds)
+            parent = call.parent
+            if parent is not None:
+                parent.rows += call.rows
+                parent.bytes += call.bytes
+                parent.round_trips += call.round_trips
+                parent.cache_hits += call.cache_hits
+                parent.cache_misses += call.cache_misses
+                parent.retries += call.retries
+                parent.errors += call.errors
+        if self._log is not None:
+            self._log.info(json.dumps({
+                "ts": round(time.time(), 3),
+                "op": call.name,
+                "parent": parent.name if parent is not None else None,
+                "ms": round(seconds * 1000, 3),
+                "rows": call.rows,
+                "bytes": call.bytes,
+                "round_trips": call.round_trips,
+                "cache_hits": call.cache_hits,
+                "cache_misses": call.cache_misses,
+                "retries": call.retries,
+                "error": str(call.error) if call.error is not None else None,
+            }))
+
+    # Reading
+    def snapshot(self):
+        """{"operations": {name: stats}, "cache": {query: {"hits", "misses"}}}"""
+        with self._lock:
+            return {
+                "operations": {name: series.snapshot() for name, series in self._series.items()},
+                "cache": {name: {"hits": h, "misses": m} for name, (h, m) in self._cache.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self._cache.clear()
+
+    # Export
+    def log_to_file(self, path, max_bytes=METRICS_FILE_MAX_BYTES, backups=METRICS_FILE_BACKUPS):
+        """Append one JSON line per finished call to a size-rotated file (opened on the first line)."""
+        log = logging.getLogger("inventory.metrics")
+        log.setLevel(logging.INFO)
+        log.propagate = False
+        for handler in list(log.handlers):
+            log.removeHandler(handler)
+            handler.close()
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log.addHandler(handler)
+        self._log = log
+
+    def prometheus_text(self):
+        """All series in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        lines = []
+
+        def family(metric, kind, help_text):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+
+        family("inventory_call_seconds", "histogram", "Latency of backend functions and engine calls.")
+        for name, s in snap["operations"].items():
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, s["buckets"]):
+                cumulative += count
+                lines.append(f'inventory_call_seconds_bucket{{op="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'inventory_call_seconds_bucket{{op="{name}",le="+Inf"}} {s["calls"]}')
+            lines.append(f'inventory_call_seconds_sum{{op="{name}"}} {s["mean_ms"] * s["calls"] / 1000:.6f}')
+            lines.append(f'inventory_call_seconds_count{{op="{name}"}} {s["calls"]}')
+
+        for key, help_text in (
+            ("errors", "Calls that raised, or whose nested calls raised."),
+            ("rows", "Rows returned by engine calls."),
+            ("bytes", "Approximate response payload bytes (with INVENTORY_METRICS_BYTES=1)."),
+            ("round_trips", "Database round trips."),
+            ("retries", "Retried requests."),
+        ):
+            family(f"inventory_call_{key}_total", "counter", help_text)
+            for name, s in snap["operations"].items():
+                lines.append(f'inventory_call_{key}_total{{op="{name}"}} {s[key]}')
+
+        family("inventory_cache_lookups_total", "counter", "Query cache lookups by result.")
+        for name, c in snap["cache"].items():
+            lines.append(f'inventory_cache_lookups_total{{query="{name}",result="hit"}} {c["hits"]}')
+            lines.append(f'inventory_cache_lookups_total{{query="{name}",result="miss"}} {c["misses"]}')
+        return "\n".join(lines) + "\n"
+
+    def serve_prometheus(self, port=METRICS_PORT, host=METRICS_HOST):
+        """Serve prometheus_text() on http://host:port/metrics from a daemon thread."""
+        if self._server is not None or not port:
+            return self._server
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"Metrics served on http://{host}:{port}/metrics")
+        return self._server
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+class MeteredEngine:
+    """
+    Wraps a storage engine (sync or async) so every database call is recorded
+    as `<prefix>.<method>`: one round trip, the rows returned and, with
+    METRICS_BYTES, the payload size.
+    """
+    def __init__(self, engine, metrics, prefix="engine"):
+        self.engine = engine
+        self.metrics = metrics
+        self.prefix = prefix
+
+    def __getattr__(self, name):
+        attr = getattr(self.engine, name)
+        if name in _UNMETERED or name.startswith("_") or not callable(attr):
+            return attr
+        op = f"{self.prefix}.{name}"
+        metrics = self.metrics
+
+        if inspect.iscoroutinefunction(attr):
+            @wraps(attr)
+            async def async_call(*args, **kwargs):
+                with metrics.operation(op) as call:
+                    call.round_trips = 1
+                    resp = await attr(*args, **kwargs)
+                    MeteredEngine._measure(call, resp)
+                    return resp
+            return async_call
+
+        @wraps(attr)
+        def call_engine(*args, **kwargs):
+            with metrics.operation(op) as call:
+                call.round_trips = 1
+                resp = attr(*args, **kwargs)
+                MeteredEngine._measure(call, resp)
+                return resp
+        return call_engine
+
+    @staticmethod
+    def _measure(call, resp):
+        data = getattr(resp, "data", None)
+        if isinstance(data, list):
+            call.rows = len(data)
+        if METRICS_BYTES:
+            call.bytes = _payload_size(data)
+
+# Shared by the backend, the async backend and the GUI
+metrics = Metrics()
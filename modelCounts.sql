@@ -0,0 +1,122 @@
+-- Per-product item and pallet totals kept current by triggers, so the count
+-- tabs read one row per product instead of re-aggregating item and pallet.
+create table if not exists product_counts (
+    product_id INT PRIMARY KEY REFERENCES product(product_id) ON DELETE CASCADE,
+    item_count BIGINT NOT NULL DEFAULT 0,
+    pallet_count BIGINT NOT NULL DEFAULT 0
+);
+
+-- Statement-level triggers: one upsert per product per statement, not per row
+create or replace function product_counts_from_items()
+returns trigger
+language plpgsql
+as $$
+begin
+    if TG_OP in ('INSERT', 'UPDATE') then
+        insert into product_counts as pc (product_id, item_count)
+        select product_id, count(*) from new_rows group by product_id
+        on conflict (product_id) do update set item_count = pc.item_count + excluded.item_count;
+    end if;
+    if TG_OP in ('DELETE', 'UPDATE') then
+        update product_counts pc set item_count = pc.item_count - d.n
+        from (select product_id, count(*) as n from old_rows group by product_id) d
+        where pc.product_id = d.product_id;
+    end if;
+    return null;
+end;
+$$;
+
+create or replace function product_counts_from_pallets()
+returns trigger
+language plpgsql
+as $$
+begin
+    if TG_OP in ('INSERT', 'UPDATE') then
+        insert into product_counts as pc (product_id, pallet_count)
+        select product_id, count(*) from new_rows group by product_id
+        on conflict (product_id) do update set pallet_count = pc.pallet_count + excluded.pallet_count;
+    end if;
+    if TG_OP in ('DELETE', 'UPDATE') then
+        update product_counts pc set pallet_count = pc.pallet_count - d.n
+        from (select product_id, count(*) as n from old_rows group by product_id) d
+        where pc.product_id = d.product_id;
+    end if;
+    return null;
+end;
+$$;
+
+create or replace trigger item_counts_insert after insert on item
+    referencing new table as new_rows
+    for each statement execute function product_counts_from_items();
+create or replace trigger item_counts_update after update on item
+    referencing old table as old_rows new table as new_rows
+    for each statement execute function product_counts_from_items();
+create or replace trigger item_counts_delete after delete on item
+    referencing old table as old_rows
+    for each statement execute function product_counts_from_items();
+
+create or replace trigger pallet_counts_insert after insert on pallet
+    referencing new table as new_rows
+    for each statement execute function product_counts_from_pallets();
+create or replace trigger pallet_counts_update after update on pallet
+    referencing old table as old_rows new table as new_rows
+    for each statement execute function product_counts_from_pallets();
+create or replace trigger pallet_counts_delete after delete on pallet
+    referencing old table as old_rows
+    for each statement execute function product_counts_from_pallets();
+
+-- O(models) replacements for stock_counts and pallet_counts_by_model
+create or replace view stock_counts_fast as
+select p.model_number, sum(c.item_count) as count
+from product_counts c
+join product p on p.product_id = c.product_id
+group by p.model_number
+having sum(c.item_count) > 0
+order by p.model_number;
+
+create or replace view pallet_counts_fast as
+select p.model_number, sum(c.pallet_count) as pallet_count
+from product_counts c
+join product p on p.product_id = c.product_id
+group by p.model_number
+having sum(c.pallet_count) > 0
+order by p.model_number;
+
+-- Products whose stored totals differ from a full recount
+create or replace function check_product_counts()
+returns table (product_id int, stored_items bigint, actual_items bigint, stored_pallets bigint, actual_pallets bigint)
+language sql
+stable
+as $$
+    select p.product_id,
+           coalesce(c.item_count, 0), coalesce(i.n, 0),
+           coalesce(c.pallet_count, 0), coalesce(pl.n, 0)
+    from product p
+    left join product_counts c on c.product_id = p.product_id
+    left join (select product_id, count(*) as n from item group by product_id) i on i.product_id = p.product_id
+    left join (select product_id, count(*) as n from pallet group by product_id) pl on pl.product_id = p.product_id
+    where coalesce(c.item_count, 0) <> coalesce(i.n, 0)
+       or coalesce(c.pallet_count, 0) <> coalesce(pl.n, 0);
+$$;
+
+-- Recompute every total from item and pallet; returns the number of products counted
+create or replace function rebuild_product_counts()
+returns int
+language plpgsql
+as $$
+declare
+    rebuilt int;
+begin
+    lock table item, pallet in share mode;
+    delete from product_counts;
+    insert into product_counts (product_id, item_count, pallet_count)
+    select p.product_id,
+           (select count(*) from item i where i.product_id = p.product_id),
+           (select count(*) from pallet pl where pl.product_id = p.product_id)
+    from product p;
+    get diagnostics rebuilt = row_count;
+    return rebuilt;
+end;
+$$;
+
+select rebuild_product_counts();
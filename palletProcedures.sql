@@ -0,0 +1,90 @@
+-- Pallet operations that must not be split across HTTP calls.
+-- Each function runs in one transaction and is called once through PostgREST RPC.
+
+-- Delete a pallet and every item on it. Returns one row, or no rows (and
+-- deletes nothing) when the pallet doesn't exist.
+-- e.g. select * from remove_pallet_with_items('A1')
+create or replace function remove_pallet_with_items(p_pallet_id text)
+returns table (pallet_id text, items_deleted int)
+language plpgsql
+as $$
+declare
+    n int;
+begin
+    -- Lock the pallet so items can't be added to it while it is removed
+    perform 1 from pallet p where p.pallet_id = p_pallet_id for update;
+    if not found then
+        return;
+    end if;
+
+    delete from item i where i.pallet_id = p_pallet_id;
+    get diagnostics n = row_count;
+    delete from pallet p where p.pallet_id = p_pallet_id;
+
+    return query select p_pallet_id, n;
+end;
+$$;
+
+-- Move many pallets to one shelf in a single statement. Returns the moved
+-- pallet rows; ids that don't exist are simply not returned.
+-- e.g. select * from move_pallets_to_shelf(array['A1', 'A2'], '3-1')
+create or replace function move_pallets_to_shelf(p_pallet_ids text[], p_shelf_id text)
+returns setof pallet
+language sql
+as $$
+    update pallet
+    set shelf_id = p_shelf_id
+    where pallet_id = any(p_pallet_ids)
+    returning *;
+$$;
+
+-- Move items to another pallet in one statement: the serials in p_serials,
+-- or every item on p_source_pallet_id when it is given. Only items of the
+-- target pallet's product are moved. Returns one row per requested item with
+-- status 'moved', 'incompatible' (another product), 'same_pallet' or
+-- 'not_found' (listed serials only); no rows when the target pallet doesn't exist.
+-- e.g. select * from move_items_to_pallet(array['SN1', 'SN2'], null, 'A2')
+--      select * from move_items_to_pallet(null, 'A1', 'A2')
+create or replace function move_items_to_pallet(p_serials text[], p_source_pallet_id text, p_target_pallet_id text)
+returns table (serial_number text, item_id int, product_id int, from_pallet_id text, status text)
+language plpgsql
+as $$
+declare
+    target_product int;
+begin
+    -- Lock the target so it can't be removed during the move
+    select p.product_id into target_product from pallet p where p.pallet_id = p_target_pallet_id for update;
+    if not found then
+        return;
+    end if;
+
+    return query
+    with requested as (
+        select i.item_id, i.serial_number, i.pallet_id, i.product_id
+        from item i
+        where (p_source_pallet_id is not null and i.pallet_id = p_source_pallet_id)
+           or (p_source_pallet_id is null and i.serial_number = any(p_serials))
+        for update
+    ),
+    moved as (
+        update item i
+        set pallet_id = p_target_pallet_id
+        from requested r
+        where i.item_id = r.item_id
+          and r.product_id = target_product
+          and r.pallet_id <> p_target_pallet_id
+        returning i.item_id
+    )
+    select r.serial_number::text, r.item_id, r.product_id, r.pallet_id::text,
+           case when m.item_id is not null then 'moved'
+                when r.pallet_id = p_target_pallet_id then 'same_pallet'
+                else 'incompatible' end
+    from requested r
+    left join moved m on m.item_id = r.item_id
+    union all
+    select s.serial, null::int, null::int, null::text, 'not_found'
+    from unnest(p_serials) as s(serial)
+    where p_source_pallet_id is null
+      and not exists (select 1 from requested r where r.serial_number = s.serial);
+end;
+$$;
@@ -0,0 +1,174 @@
+import re
+
+# ---------------- Projection queries ----------------
+# Select("item", "item_id", "serial_number", "pallet.shelf_id", "product.model_number")
+#     .where("product.model_number", "MDL-00001").order_by("item_id").limit(200)
+# fetches only those columns, pulling shelf_id and model_number from the
+# referenced pallet and product rows in the same request, and returns each
+# row as a tuple in column order. A filter whose value is a tuple matches any
+# of its values (SQL IN). Engines run it with
+# select_projection(**query.spec()) / count_projection(**query.count_spec()).
+
+# Parent tables a row can pull columns from: (table, parent) -> foreign key column
+# (the parent's primary key has the same name)
+RELATIONS = {
+    ("item", "pallet"): "pallet_id",
+    ("item", "product"): "product_id",
+    ("pallet", "product"): "product_id",
+    ("pallet", "shelf"): "shelf_id",
+}
+TABLES = ("shelf", "product", "pallet", "item")
+
+_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+def split_column(table, column):
+    """("parent", "col") for "parent.col", (None, "col") for a column of `table` itself."""
+    parent, _, name = column.rpartition(".")
+    if not _NAME.match(name) or (parent and (table, parent) not in RELATIONS):
+        raise ValueError(f"Unknown column for {table}: {column}")
+    return parent or None, name
+
+def _parents(table, columns, filters):
+    """Referenced parent tables in first-use order, and those a filter uses (inner joins)."""
+    if table not in TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    parents, inner = {}, set()
+    for column in columns:
+        parent, name = split_column(table, column)
+        if parent:
+            parents.setdefault(parent, []).append(name)
+    for column, _ in filters:
+        parent, _ = split_column(table, column)
+        if parent:
+            parents.setdefault(parent, [])
+            inner.add(parent)
+    return parents, inner
+
+class Select:
+    """A projection query on one table; methods return self so calls chain."""
+    def __init__(self, table, *columns):
+        if table not in TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        for column in columns:
+            split_column(table, column)
+        self.table = table
+        self.columns = tuple(columns)
+        self.filters = ()
+        self.key = None
+        self._after = None
+        self._before = None
+        self._limit = None
+
+    def where(self, column, value):
+        """Equality filter on a column or a parent's column."""
+        split_column(self.table, column)
+        self.filters += ((column, value),)
+        return self
+
+    def where_in(self, column, values):
+        """Match any of `values`."""
+        return self.where(column, tuple(values))
+
+    def order_by(self, key):
+        """Order by a column of the table itself (the keyset for after/before)."""
+        if split_column(self.table, key)[0]:
+            raise ValueError("Order by a column of the table itself")
+        self.key = key
+        return self
+
+    def after(self, value):
+        self._after = value
+        return self
+
+    def before(self, value):
+        self._before = value
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def spec(self):
+        """Keyword arguments for engine.select_projection (hashable, so results can be cached)."""
+        return {
+            "table": self.table,
+            "columns": self.columns,
+            "filters": self.filters,
+            "key": self.key,
+            "after": self._after,
+            "before": self._before,
+            "limit": self._limit,
+        }
+
+    def count_spec(self):
+        """Keyword arguments for engine.count_projection."""
+        return {"table": self.table, "filters": self.filters}
+
+def to_columns(rows, columns):
+    """Tuple rows -> {column: [values]} (column arrays)."""
+    arrays = {column: [] for column in columns}
+    lists = list(arrays.values())
+    for row in rows:
+        for values, value in zip(lists, row):
+            values.append(value)
+    return arrays
+
+# PostgREST
+def postgrest_select(table, columns, filters=()):
+    """The select= string: own columns plus one embedded resource per parent (inner when filtered)."""
+    parents, inner = _parents(table, columns, filters)
+    parts = [split_column(table, c)[1] for c in columns if not split_column(table, c)[0]]
+    for parent, names in parents.items():
+        key = RELATIONS[(table, parent)]
+        hint = f"{parent}!{key}" + ("!inner" if parent in inner else "")
+        parts.append(f"{hint}({','.join(dict.fromkeys(names)) or key})")
+    return ",".join(parts) or "*"
+
+def postgrest_row(row, table, columns):
+    """Flatten one PostgREST row (with embedded parents) into a tuple in column order."""
+    values = []
+    for column in columns:
+        parent, name = split_column(table, column)
+        values.append((row.get(parent) or {}).get(name) if parent else row.get(name))
+    return tuple(values)
+
+# SQL
+def sql_select(table, columns, filters=(), key=None, after=None, before=None, limit=None, count=False):
+    """(sql, params) for a projection, with a join per parent table (inner when filtered)."""
+    parents, inner = _parents(table, columns, filters)
+    if key and split_column(table, key)[0]:
+        raise ValueError("Order by a column of the table itself")
+
+    def expr(column):
+        parent, name = split_column(table, column)
+        return f"{parent or 't'}.{name}"
+
+    select = "count(*)" if count else ", ".join(expr(c) for c in columns)
+    sql = [f"SELECT {select} FROM {table} t"]
+    for parent in parents:
+        fk = RELATIONS[(table, parent)]
+        join = "JOIN" if parent in inner else "LEFT JOIN"
+        sql.append(f"{join} {parent} ON {parent}.{fk} = t.{fk}")
+
+    where, params = [], []
+    for column, value in filters:
+        if isinstance(value, tuple):
+            where.append(f"{expr(column)} IN ({', '.join('?' for _ in value)})")
+            params.extend(value)
+        else:
+            where.append(f"{expr(column)} = ?")
+            params.append(value)
+    if key and before is not None:
+        where.append(f"t.{key} < ?")
+        params.append(before)
+    elif key and after is not None:
+        where.append(f"t.{key} > ?")
+        params.append(after)
+    if where:
+        sql.append("WHERE " + " AND ".join(where))
+    if key and not count:
+        sql.append(f"ORDER BY t.{key}" + (" DESC" if before is not None else ""))
+    if limit is not None and not count:
+        sql.append("LIMIT ?")
+        params.append(limit)
+    return " ".join(sql), params
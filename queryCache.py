@@ -0,0 +1,213 @@
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+# Engine read methods that are cached: method -> (ttl seconds, tables it reads)
+READ_POLICIES = {
+    "select_model_for_pallet": (300, ("pallet", "product")),
+    "select_pallet_products": (300, ("pallet",)),
+    "select_product": (600, ("product",)),
+    "select_products_by_model": (600, ("product",)),
+    "select_products_by_models": (600, ("product",)),
+    "select_projection": (30, ("item", "pallet", "product", "shelf")),
+    "count_projection": (30, ("item", "pallet", "product", "shelf")),
+    "list_pallet_ids": (120, ("pallet",)),
+    "list_model_numbers": (300, ("product",)),
+    "select_stock_counts": (30, ("item", "product")),
+    "select_pallet_counts": (60, ("pallet", "product")),
+    "select_pallet_info": (60, ("pallet", "product")),
+    "list_aisles": (600, ("aisle",)),
+    "select_pallets_by_aisle": (60, ("pallet", "product", "shelf")),
+    "search_inventory": (30, ("item", "product")),
+}
+
+# Engine write methods and the tables whose cached reads they invalidate
+WRITE_TABLES = {
+    "insert_shelves": ("shelf",),
+    "insert_items": ("item",),
+    "delete_items_by_serials": ("item",),
+    "delete_items_by_pallet": ("item",),
+    "insert_pallet": ("pallet",),
+    "insert_pallets": ("pallet",),
+    "delete_pallet": ("pallet",),
+    "update_pallet_shelf": ("pallet",),
+    "remove_pallet_with_items": ("item", "pallet"),
+    "move_pallets_to_shelf": ("pallet",),
+    "move_items_to_pallet": ("item",),
+    "insert_product": ("product",),
+    "insert_products": ("product",),
+    "rebuild_counts": ("item", "pallet"),
+    "set_aisle_rules": ("aisle", "shelf"),
+    "prune_changes": ("change_log",),
+}
+
+def _freeze(value):
+    """Turn call arguments into a hashable cache key."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_freeze(v) for v in value))
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+class QueryCache:
+    """
+    Size-bounded LRU cache with a TTL per entry and invalidation by table.
+    Keeps hit/miss counters overall and per query name; `on_lookup(name, hit)`
+    is also called after every lookup when given.
+    """
+    def __init__(self, maxsize=256, on_lookup=None):
+        self.maxsize = maxsize
+        self.on_lookup = on_lookup
+        self._entries = OrderedDict()   # key -> (expires_at, tables, value)
+        self._by_table = {}             # table -> set of keys
+        self._versions = {}             # table -> invalidation counter
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.per_query = {}             # name -> [hits, misses]
+
+    def _count(self, name, hit):
+        counters = self.per_query.setdefault(name, [0, 0])
+        if hit:
+            self.hits += 1
+            counters[0] += 1
+        else:
+            self.misses += 1
+            counters[1] += 1
+
+    def get(self, key):
+        """Return (found, value) for a key, dropping it if it has expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            found = entry is not None and entry[0] > time.monotonic()
+            if found:
+                self._entries.move_to_end(key)
+            elif entry is not None:
+                self._drop(key)
+            self._count(key[0], found)
+        if self.on_lookup is not None:
+            self.on_lookup(key[0], found)
+        return (True, entry[2]) if found else (False, None)
+
+    def versions(self, tables):
+        with self._lock:
+            return tuple(self._versions.get(t, 0) for t in tables)
+
+    def set(self, key, value, ttl, tables, versions=None):
+        """
+        Store a value. When `versions` (from versions()) is given and any of
+        the tables was invalidated since, the value is stale and not stored.
+        """
+        with self._lock:
+            if versions is not None and versions != tuple(self._versions.get(t, 0) for t in tables):
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, tables, value)
+            for t in tables:
+                self._by_table.setdefault(t, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, tables, _ = self._entries.pop(key)
+        for t in tables:
+            self._by_table.get(t, set()).discard(key)
+
+    def invalidate(self, *tables):
+        """Drop every entry that reads any of `tables` (all entries if none given)."""
+        with self._lock:
+            if not tables:
+                tables = tuple(self._by_table) + tuple(self._versions)
+                self._entries.clear()
+                self._by_table.clear()
+            for t in set(tables):
+                self._versions[t] = self._versions.get(t, 0) + 1
+                for key in list(self._by_table.get(t, ())):
+                    if key in self._entries:
+                        self._drop(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "per_query": {name: {"hits": h, "misses": m} for name, (h, m) in self.per_query.items()},
+            }
+
+class CachedEngine:
+    """
+    Wraps a storage engine: read methods in READ_POLICIES are served from the
+    cache, write methods in WRITE_TABLES invalidate the tables they touch.
+    Anything else is passed straight through. Errors are never cached.
+    Works the same for async engines (coroutine methods); a sync and an async
+    engine wrapped with the same cache share entries.
+    """
+    def __init__(self, engine, cache):
+        self.engine = engine
+        self.cache = cache
+
+    def __getattr__(self, name):
+        attr = getattr(self.engine, name)
+        if name in READ_POLICIES:
+            return self._cached_read(name, attr)
+        if name in WRITE_TABLES:
+            return self._invalidating_write(name, attr)
+        return attr
+
+    def _cached_read(self, name, method):
+        ttl, tables = READ_POLICIES[name]
+
+        if inspect.iscoroutinefunction(method):
+            @wraps(method)
+            async def async_read(*args, **kwargs):
+                key = (name, _freeze(args), _freeze(kwargs))
+                found, value = self.cache.get(key)
+                if found:
+                    return value
+                versions = self.cache.versions(tables)
+                value = await method(*args, **kwargs)
+                self.cache.set(key, value, ttl, tables, versions)
+                return value
+            return async_read
+
+        @wraps(method)
+        def read(*args, **kwargs):
+            key = (name, _freeze(args), _freeze(kwargs))
+            found, value = self.cache.get(key)
+            if found:
+                return value
+            versions = self.cache.versions(tables)
+            value = method(*args, **kwargs)
+            self.cache.set(key, value, ttl, tables, versions)
+            return value
+        return read
+
+    def _invalidating_write(self, name, method):
+        tables = WRITE_TABLES[name]
+
+        if inspect.iscoroutinefunction(method):
+            @wraps(method)
+            async def async_write(*args, **kwargs):
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    self.cache.invalidate(*tables)
+            return async_write
+
+        @wraps(method)
+        def write(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            finally:
+                # Even a failed write may have partially applied
+                self.cache.invalidate(*tables)
+        return write
@@ -0,0 +1,7 @@
+-- Stream item/pallet/product changes to every workstation through Supabase Realtime
+alter publication supabase_realtime add table item, pallet, product;
+
+-- Send the full old row on UPDATE/DELETE so clients can patch counts and lists
+alter table item replica identity full;
+alter table pallet replica identity full;
+alter table product replica identity full;
@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import deque
+
+try:
+    import serial   # pyserial, only needed for serial-port scanners
+except ImportError:
+    serial = None
+
+# Flush a micro-batch when it reaches this many scans...
+SCAN_BATCH_SIZE = 25
+# ...or when no scan has arrived for this long (seconds)...
+SCAN_IDLE_DELAY = 0.3
+# ...or when its oldest scan has waited this long
+SCAN_MAX_DELAY = 2.0
+
+class ScanQueue:
+    """
+    In-memory queue between a barcode scanner and the database. add() answers
+    at once ("queued", "duplicate" or "empty") and never touches the network;
+    a worker thread sends the queued scans to `flush` in micro-batches and
+    hands each batch's report to `on_result(batch, report)` on that thread.
+
+    flush(batch) takes a list of (serial, pallet_id) and returns a report dict
+    with "inserted", "duplicates" and "failed" [(serial, reason)] lists.
+    Serials are rejected locally when already scanned this session or when
+    `is_known(serial)` says they are in the database. A failed serial may be
+    scanned again.
+    """
+    def __init__(self, flush, on_result=None, is_known=None, batch_size=SCAN_BATCH_SIZE,
+                 idle_delay=SCAN_IDLE_DELAY, max_delay=SCAN_MAX_DELAY):
+        self.flush = flush
+        self.on_result = on_result
+        self.is_known = is_known
+        self.batch_size = batch_size
+        self.idle_delay = idle_delay
+        self.max_delay = max_delay
+        self._pending = deque()     # (serial, pallet_id, queued_at)
+        self._seen = set()          # serials pending, in flight or saved this session
+        self._last_scan = 0.0
+        self._in_flight = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="scan-queue", daemon=True)
+        self._thread.start()
+
+    def add(self, serial, pallet_id):
+        """Queue one scan; returns "queued", "duplicate" or "empty"."""
+        serial = str(serial or "").strip()
+        if not serial or not pallet_id:
+            return "empty"
+        with self._cond:
+            if serial in self._seen:
+                return "duplicate"
+            if self.is_known is not None and self.is_known(serial):
+                return "duplicate"
+            self._seen.add(serial)
+            now = time.monotonic()
+            self._pending.append((serial, str(pallet_id).strip(), now))
+            self._last_scan = now
+            self._cond.notify()
+        return "queued"
+
+    def pending(self):
+        """Scans queued or being written."""
+        with self._cond:
+            return len(self._pending) + self._in_flight
+
+    def _due(self, now):
+        """Seconds until the pending batch must be flushed (0 = now)."""
+        if len(self._pending) >= self.batch_size or self._closed:
+            return 0
+        oldest = self._pending[0][2]
+        return max(min(self._last_scan + self.idle_delay, oldest + self.max_delay) - now, 0)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._pending:
+                        wait = self._due(time.monotonic())
+                        if wait == 0:
+                            break
+                        self._cond.wait(wait)
+                    elif self._closed:
+                        return
+                    else:
+                        self._cond.wait()
+                count = min(len(self._pending), self.batch_size)
+                batch = [self._pending.popleft()[:2] for _ in range(count)]
+                self._in_flight = count
+
+            try:
+                report = self.flush(batch)
+            except Exception as e:
+                report = {"inserted": [], "duplicates": [], "failed": [(s, str(e)) for s, _ in batch]}
+            with self._cond:
+                self._in_flight = 0
+                # Failed scans may be retried by scanning them again
+                for serial, _ in report["failed"]:
+                    self._seen.discard(serial)
+                self._cond.notify_all()
+            if self.on_result is not None:
+                self.on_result(batch, report)
+
+    def drain(self, timeout=None):
+        """Flush everything queued now and wait until it has been written."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._last_scan = 0.0
+            self._cond.notify_all()
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        """Flush what is queued, then stop the worker."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+class SerialScanner:
+    """
+    Reads scans from a serial-port barcode scanner (one code per line) on a
+    daemon thread and passes each to on_scan(serial). Needs pyserial.
+    """
+    def __init__(self, port, on_scan, baudrate=9600, on_error=None):
+        if serial is None:
+            raise RuntimeError("Serial-port scanners need pyserial (pip install pyserial)")
+        self.port = port
+        self.on_scan = on_scan
+        self.on_error = on_error
+        self._conn = serial.Serial(port, baudrate=baudrate, timeout=0.5)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"scanner-{port}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        buffer = b""
+        while not self._stop.is_set():
+            try:
+                buffer += self._conn.read(self._conn.in_waiting or 1)
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(e)
+                return
+            # Scanners end each code with CR, LF or CRLF
+            *codes, buffer = buffer.replace(b"\r", b"\n").split(b"\n")
+            for code in codes:
+                code = code.decode("utf-8", errors="replace").strip()
+                if code:
+                    self.on_scan(code)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(1)
+        self._conn.close()
@@ -0,0 +1,414 @@
+import heapq
+import re
+import threading
+from array import array
+from collections import Counter
+from inventoryIndex import iter_table
+
+# ---------------- Search index ----------------
+# Ranked prefix, substring and fuzzy matches over serial numbers, model
+# numbers, product names and product descriptions, answered in memory.
+# The local counterpart of search_inventory in searchIndex.sql: texts are
+# split into pg_trgm's trigrams (each alphanumeric word lowercased and padded
+# with two spaces in front and one behind) and every trigram keeps a compact
+# array of the entries containing it.
+#
+# Ranking and matching follow searchIndex.sql exactly, so a query gets the
+# same results whichever side answers it:
+#   1.0  the whole text equals the query (case-insensitive)
+#   0.9  the text starts with the query
+#   0.8  the text contains the query (ilike '%query%')
+#   0.7 * trigram similarity for fuzzy matches: similarity() of at least
+#        SIMILARITY_THRESHOLD, or word_similarity() of at least
+#        WORD_SIMILARITY_THRESHOLD (pg_trgm's % and <%)
+# Ties go to the shorter text. A product is listed once, under its best field.
+# When a query would need more work than MAX_SCAN / MAX_FUZZY_CANDIDATES allow
+# to answer exactly, search() returns None and the database answers instead.
+
+# Searchable fields; an entry's field is stored as its index here
+FIELDS = ("serial_number", "model_number", "product_name", "product_description")
+PRODUCT_FIELDS = FIELDS[1:]
+EXACT, PREFIX, SUBSTRING, FUZZY = 1.0, 0.9, 0.8, 0.7
+# Lowest similarity() and word_similarity() that count as a fuzzy match
+# (pg_trgm's defaults for % and <%)
+SIMILARITY_THRESHOLD = 0.3
+WORD_SIMILARITY_THRESHOLD = 0.6
+# Trigrams found in more entries than this are skipped when collecting fuzzy
+# candidates (they match nearly everything), and at most this many substring
+# candidates are checked
+MAX_SCAN = 20000
+# A substring query whose rarest trigram is in more entries than this is left
+# to the database (too many entries to narrow down)
+MAX_INTERSECT = 100000
+# Most fuzzy candidates scored per search, best-sharing first
+MAX_FUZZY_CANDIDATES = 1000
+# Dead entries (removed or replaced) left in the arrays before they are rebuilt
+COMPACT_THRESHOLD = 100000
+
+_WORD = re.compile(r"[^\W_]+")
+
+def normalize(text):
+    """Lowercased text with runs of whitespace collapsed."""
+    return " ".join(str(text or "").lower().split())
+
+def _ordered_trigrams(text):
+    """pg_trgm's trigrams of a text in order, word by word (repeats kept)."""
+    grams = []
+    for word in _WORD.findall(str(text or "").lower()):
+        padded = f"  {word} "
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def trigrams(text):
+    """pg_trgm's trigram set of a text."""
+    return set(_ordered_trigrams(text))
+
+def _similarity(grams, other):
+    if not grams or not other:
+        return 0.0
+    shared = len(grams & other)
+    return shared / (len(grams) + len(other) - shared)
+
+def _word_similarity(grams, text):
+    # A port of pg_trgm's iterate_word_similarity: the best similarity of the
+    # query's trigrams to a run of the text's ordered trigrams
+    if not grams:
+        return 0.0
+    ordered = _ordered_trigrams(text)
+    ulen1 = len(grams)
+    lastpos = {}
+    ulen2 = count = 0
+    lower = -1
+    best = 0.0
+    for i, gram in enumerate(ordered):
+        found = gram in grams
+        if lower >= 0 or found:
+            if gram not in lastpos:
+                ulen2 += 1
+                if found:
+                    count += 1
+            lastpos[gram] = i
+        if not found:
+            continue
+        if lower == -1:
+            lower = i
+            ulen2 = 1
+        current = count / (ulen1 + ulen2 - count)
+        # Try moving the start of the run up for a better match
+        tmp_count, tmp_ulen2, prev_lower = count, ulen2, lower
+        for tmp_lower in range(lower, i + 1):
+            tmp = tmp_count / (ulen1 + tmp_ulen2 - tmp_count)
+            if tmp > current:
+                current, ulen2, lower, count = tmp, tmp_ulen2, tmp_lower, tmp_count
+            dropped = ordered[tmp_lower]
+            if lastpos.get(dropped) == tmp_lower:
+                tmp_ulen2 -= 1
+                if dropped in grams:
+                    tmp_count -= 1
+        best = max(best, current)
+        for tmp_lower in range(prev_lower, lower):
+            dropped = ordered[tmp_lower]
+            if lastpos.get(dropped) == tmp_lower:
+                del lastpos[dropped]
+    return best
+
+def similarity(query, text):
+    """Trigram similarity: shared trigrams over all trigrams of both (0 to 1)."""
+    return _similarity(trigrams(query), trigrams(text))
+
+def word_similarity(query, text):
+    """pg_trgm's word_similarity: the query's best similarity to a stretch of the text."""
+    return _word_similarity(trigrams(query), text)
+
+def score(query, text, query_grams=None):
+    """Rank of `text` for a normalized query; 0 when it doesn't match."""
+    value = str(text or "").lower()
+    if not query or not value:
+        return 0.0
+    if value == query:
+        return EXACT
+    if value.startswith(query):
+        return PREFIX
+    if query in value:
+        return SUBSTRING
+    grams = trigrams(query) if query_grams is None else query_grams
+    whole = _similarity(grams, trigrams(value))
+    word = _word_similarity(grams, value)
+    if whole >= SIMILARITY_THRESHOLD or word >= WORD_SIMILARITY_THRESHOLD:
+        return FUZZY * max(whole, word)
+    return 0.0
+
+def _substring_grams(query):
+    """
+    Trigrams every text containing `query` has. A word inside the query is a
+    whole word of the text, so its padded trigrams all count; the first and
+    last words may continue in the text, so their outer padding doesn't.
+    Empty when nothing is certain (e.g. a query of one or two letters).
+    """
+    grams = set()
+    for match in _WORD.finditer(query):
+        padded = f"  {match.group()} "
+        first = 0 if match.start() > 0 else 2
+        last = len(padded) - 3 if match.end() < len(query) else len(padded) - 4
+        grams.update(padded[i:i + 3] for i in range(first, last + 1))
+    return grams
+
+class SearchIndex:
+    """
+    In-memory trigram index of the item and product tables. Loaded once,
+    then kept current with add_item / remove_serial / add_product (the
+    backend applies change-feed events). search() returns None while the
+    index isn't loaded, meaning "ask the database".
+    """
+    def __init__(self, enabled=True):
+        self._lock = threading.RLock()
+        self.enabled = enabled
+        self.loaded = False
+        self._reset()
+
+    def _reset(self):
+        self._texts = []            # entry -> text (None once removed)
+        self._fields = bytearray()  # entry -> index into FIELDS
+        self._owners = []           # entry -> serial_number or product_id
+        self._postings = {}         # trigram -> array of entries
+        self._items = {}            # serial_number -> (entry, item_id, pallet_id, product_id)
+        self._products = {}         # product_id -> (entries, model_number)
+        self._dead = 0
+
+    def load(self, engine, on_item=None):
+        """
+        (Re)load the item and product tables from the engine. on_item(row),
+        if given, sees every item row, so another cache can share the scan.
+        """
+        products = list(iter_table(engine, "product", "product_id,model_number,product_name,product_description",
+                                   "product_id"))
+        items = iter_table(engine, "item", "item_id,serial_number,pallet_id,product_id", "item_id")
+        with self._lock:
+            self.enabled = True
+            self._reset()
+            for r in products:
+                self._add_product(r)
+            for r in items:
+                self._add_item(r)
+                if on_item is not None:
+                    on_item(r)
+            self.loaded = True
+        print(f"Search index loaded: {len(self._items)} serials, {len(self._products)} products, "
+              f"{len(self._postings)} trigrams")
+
+    def __len__(self):
+        with self._lock:
+            return len(self._texts) - self._dead
+
+    # Entries
+    def _add_entry(self, field, text, owner):
+        entry = len(self._texts)
+        self._texts.append(text)
+        self._fields.append(FIELDS.index(field))
+        self._owners.append(owner)
+        for gram in trigrams(text):
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array("I")
+            postings.append(entry)
+        return entry
+
+    def _drop_entry(self, entry):
+        self._texts[entry] = None
+        self._dead += 1
+
+    def _add_item(self, r):
+        serial = r["serial_number"]
+        # A known serial (e.g. moved to another pallet) keeps its entry
+        old = self._items.get(serial)
+        entry = old[0] if old is not None else self._add_entry("serial_number", serial, serial)
+        self._items[serial] = (entry, r.get("item_id"), r.get("pallet_id"), r.get("product_id"))
+
+    def _remove_serial(self, serial):
+        item = self._items.pop(serial, None)
+        if item is not None:
+            self._drop_entry(item[0])
+
+    def _add_product(self, r):
+        product_id = r["product_id"]
+        old = self._products.pop(product_id, None)
+        if old is not None:
+            for entry in old[0]:
+                self._drop_entry(entry)
+        entries = tuple(self._add_entry(field, r[field], product_id)
+                        for field in PRODUCT_FIELDS if r.get(field))
+        self._products[product_id] = (entries, r.get("model_number"))
+
+    def _compact(self):
+        """Rebuild the entry arrays without the dead entries."""
+        items = [{"serial_number": s, "item_id": i, "pallet_id": p, "product_id": pid}
+                 for s, (_, i, p, pid) in self._items.items()]
+        products = []
+        for product_id, (entries, model_number) in self._products.items():
+            row = {"product_id": product_id, "model_number": model_number}
+            row.update((FIELDS[self._fields[e]], self._texts[e]) for e in entries)
+            products.append(row)
+        self._reset()
+        for r in products:
+            self._add_product(r)
+        for r in items:
+            self._add_item(r)
+
+    def _patched(self):
+        if self._dead > COMPACT_THRESHOLD and self._dead > len(self._texts) // 2:
+            self._compact()
+
+    # Patching (called for change-feed events)
+    def add_item(self, row):
+        with self._lock:
+            if not self.enabled or not row.get("serial_number"):
+                return
+            self._add_item(row)
+            self._patched()
+
+    def remove_serial(self, serial):
+        with self._lock:
+            if not self.enabled:
+                return
+            self._remove_serial(serial)
+            self._patched()
+
+    def add_product(self, row):
+        with self._lock:
+            if not self.enabled or row.get("product_id") is None:
+                return
+            # Change events may carry only some columns; keep the rest
+            old = self._products.get(row["product_id"])
+            if old is not None:
+                merged = {"model_number": old[1]}
+                merged.update((FIELDS[self._fields[e]], self._texts[e]) for e in old[0])
+                merged.update((k, v) for k, v in row.items() if v is not None)
+                row = merged
+            self._add_product(row)
+            self._patched()
+
+    # Search
+    def _substring_candidates(self, query):
+        # Every entry containing the query, plus some that don't (checked by
+        # the caller); None when there are more than MAX_SCAN to check
+        grams = _substring_grams(query)
+        if not grams:
+            if len(self._texts) > MAX_SCAN:
+                return None
+            return range(len(self._texts))
+        lists = sorted((self._postings.get(g, ()) for g in grams), key=len)
+        if len(lists[0]) > MAX_INTERSECT:
+            return None
+        candidates = set(lists[0])
+        for postings in lists[1:]:
+            if len(candidates) <= MAX_SCAN // 10:
+                break
+            candidates.intersection_update(postings)
+        if len(candidates) > MAX_SCAN:
+            return None
+        return candidates
+
+    def _keep(self, results, entry, rank):
+        # Serials have one entry each; a product (by product_id, as in the SQL) is
+        # kept under its best-scoring field, the shortest text and then the first field on a tie
+        text = self._texts[entry]
+        if self._fields[entry] == 0:
+            results[(0, text)] = (-rank, len(text), text, entry)
+            return
+        owner = self._owners[entry]
+        current = results.get((1, owner))
+        if current is None or (-rank, len(text), self._fields[entry]) < (*current[:2], self._fields[current[3]]):
+            results[(1, owner)] = (-rank, len(text), self._products[owner][1] or "", entry)
+
+    @staticmethod
+    def _beaten(results, limit, bound):
+        """True when `limit` results already score above `bound`."""
+        if len(results) < limit:
+            return False
+        return -heapq.nsmallest(limit, results.values())[-1][0] > bound
+
+    def _add_fuzzy(self, query, results, limit, seen):
+        """
+        Add the fuzzy matches that could make the best `limit` to `results`;
+        False when that can't be settled within MAX_FUZZY_CANDIDATES.
+        """
+        grams = trigrams(query)
+        if not grams or self._beaten(results, limit, FUZZY):
+            return True
+        counts = Counter()
+        skipped = 0
+        for gram in grams:
+            postings = self._postings.get(gram, ())
+            if len(postings) > MAX_SCAN:
+                skipped += 1
+                continue
+            counts.update(postings)
+        by_count = {}
+        for entry, n in counts.items():
+            by_count.setdefault(n, []).append(entry)
+
+        # Both similarities are at most shared / query trigrams, and an entry
+        # counted n times shares at most n + skipped trigrams with the query
+        needed = SIMILARITY_THRESHOLD * len(grams) - 1e-9
+        texts = self._texts
+        checked = 0
+        for n in sorted(by_count, reverse=True) + [0]:
+            shared = n + skipped
+            if shared < needed:
+                return True
+            if self._beaten(results, limit, FUZZY * min(shared / len(grams), 1.0)):
+                return True
+            if n == 0:
+                return False    # Entries sharing only the skipped trigrams could still place
+            entries = [e for e in by_count[n] if texts[e] is not None and e not in seen]
+            checked += len(entries)
+            if checked > MAX_FUZZY_CANDIDATES:
+                return False
+            for entry in entries:
+                rank = score(query, texts[entry], grams)
+                if rank:
+                    self._keep(results, entry, rank)
+        return True
+
+    def _result(self, entry, rank):
+        field = FIELDS[self._fields[entry]]
+        owner = self._owners[entry]
+        if field == "serial_number":
+            _, item_id, pallet_id, product_id = self._items[owner]
+            model = self._products.get(product_id, ((), None))[1]
+            return {"kind": "item", "key": owner, "field": field, "text": self._texts[entry],
+                    "score": rank, "item_id": item_id, "pallet_id": pallet_id, "model_number": model}
+        model = self._products[owner][1]
+        return {"kind": "product", "key": model, "field": field, "text": self._texts[entry],
+                "score": rank, "item_id": None, "pallet_id": None, "model_number": model}
+
+    def search(self, query, limit=20):
+        """
+        The best `limit` matches for `query`, best first: dicts with kind
+        ("item" or "product"), key (serial or model number), field, text,
+        score, item_id, pallet_id and model_number. None when the index isn't
+        loaded or can't answer this query exactly, meaning "ask the database".
+        """
+        query = normalize(query)
+        with self._lock:
+            if not self.loaded:
+                return None
+            if not query:
+                return []
+            texts = self._texts
+            candidates = self._substring_candidates(query)
+            if candidates is None:
+                return None
+            results, seen = {}, set()
+            for entry in candidates:
+                text = texts[entry]
+                if text is None:
+                    continue
+                text = text.lower()
+                if query in text:
+                    seen.add(entry)
+                    self._keep(results, entry,
+                               EXACT if text == query else PREFIX if text.startswith(query) else SUBSTRING)
+            if not self._add_fuzzy(query, results, limit, seen):
+                return None
+            return [self._result(r[3], round(-r[0], 4)) for r in heapq.nsmallest(limit, results.values())]
@@ -0,0 +1,66 @@
+-- Fuzzy and prefix search over serial numbers, model numbers, product names
+-- and product descriptions (pg_trgm), behind the app's global search box.
+-- Ranking matches searchIndex.py, the app's local copy of this index:
+--   1.0  exact (case-insensitive), 0.9 prefix, 0.8 substring,
+--   0.7 * trigram similarity for fuzzy matches (% on the whole text, or <% on a stretch of it)
+create extension if not exists pg_trgm;
+
+-- Trigram indexes serve ilike '%...%' as well as the % and <% similarity operators
+create index if not exists idx_item_serial_trgm on item using gin (serial_number gin_trgm_ops);
+create index if not exists idx_product_model_trgm on product using gin (model_number gin_trgm_ops);
+create index if not exists idx_product_name_trgm on product using gin (product_name gin_trgm_ops);
+create index if not exists idx_product_description_trgm on product using gin (product_description gin_trgm_ops);
+
+-- The best p_limit matches, best first; a product is listed once (by product_id:
+-- model numbers need not be unique), under its best field, the first of
+-- model number, name, description on a tie (as in searchIndex.py).
+-- e.g. select * from search_inventory('48 port swtch', 20)
+create or replace function search_inventory(p_query text, p_limit int default 20)
+returns table (kind text, key text, field text, text text, score real, item_id int, pallet_id text, model_number text)
+language sql
+stable
+as $$
+    with q as (
+        select lower(btrim(regexp_replace(p_query, '\s+', ' ', 'g'))) as q
+    ),
+    p as (
+        -- The query as an ilike pattern, with its own wildcards escaped
+        select q.q, '%' || replace(replace(replace(q.q, '\', '\\'), '%', '\%'), '_', '\_') || '%' as pattern
+        from q
+        where q.q <> ''
+    ),
+    matches as (
+        select 'item' as kind, i.serial_number as key, i.serial_number as owner, 0 as field_order,
+               'serial_number' as field, i.serial_number as text, i.item_id, i.pallet_id, pr.model_number
+        from p, item i
+        join product pr on pr.product_id = i.product_id
+        where i.serial_number ilike p.pattern or i.serial_number % p.q or p.q <% i.serial_number
+        union all
+        select 'product', pr.model_number, pr.product_id::text, 1, 'model_number', pr.model_number, null, null, pr.model_number
+        from p, product pr
+        where pr.model_number ilike p.pattern or pr.model_number % p.q or p.q <% pr.model_number
+        union all
+        select 'product', pr.model_number, pr.product_id::text, 2, 'product_name', pr.product_name, null, null, pr.model_number
+        from p, product pr
+        where pr.product_name ilike p.pattern or pr.product_name % p.q or p.q <% pr.product_name
+        union all
+        select 'product', pr.model_number, pr.product_id::text, 3, 'product_description', pr.product_description, null, null, pr.model_number
+        from p, product pr
+        where pr.product_description ilike p.pattern or pr.product_description % p.q or p.q <% pr.product_description
+    ),
+    scored as (
+        select distinct on (m.kind, m.owner)
+               m.kind, m.key, m.field, m.text,
+               (case when lower(m.text) = p.q then 1.0
+                     when starts_with(lower(m.text), p.q) then 0.9
+                     when strpos(lower(m.text), p.q) > 0 then 0.8
+                     else 0.7 * greatest(similarity(p.q, m.text), word_similarity(p.q, m.text)) end)::real as score,
+               m.item_id, m.pallet_id, m.model_number
+        from matches m, p
+        order by m.kind, m.owner, score desc, length(m.text), m.field_order
+    )
+    select s.kind, s.key, s.field, s.text, s.score, s.item_id, s.pallet_id, s.model_number
+    from scored s
+    order by s.score desc, length(s.text), s.key
+    limit p_limit;
+$$;
@@ -0,0 +1,126 @@
+import threading
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+
+# Serials fetched per request while loading (PostgREST caps responses at 1000)
+LOAD_PAGE_SIZE = 1000
+# Recent additions are folded into the sorted array once there are this many
+MERGE_THRESHOLD = 50000
+
+def serial_hash(serial):
+    """64-bit fingerprint of a serial number."""
+    return int.from_bytes(blake2b(serial.encode("utf-8"), digest_size=8).digest(), "little")
+
+class SerialSet:
+    """
+    Compact membership set of every serial number in the item table, so a
+    batch of incoming serials can be split into new and already-present ones
+    without a round trip.
+
+    Each serial is stored as a 64-bit hash in a sorted array (8 bytes per
+    serial, about 16 MB for 2M items) plus small sets of recent additions
+    and removals. With 64-bit hashes a false "present" needs a collision,
+    about n / 2**64 per lookup, so answers are exact in practice.
+    Until load() has run, split() returns None, meaning "ask the database".
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._sorted = array("Q")
+        self._added = set()
+        self._removed = set()
+
+    def load(self, engine, page_size=LOAD_PAGE_SIZE):
+        """Load every serial from the item table in keyset pages."""
+        def serials():
+            after = None
+            while True:
+                rows = engine.select_page("item", "serial_number", "serial_number", after=after, limit=page_size).data or []
+                yield from (r["serial_number"] for r in rows)
+                if len(rows) < page_size:
+                    return
+                after = rows[-1]["serial_number"]
+        self.load_serials(serials())
+
+    def load_serials(self, serials):
+        """Replace the set with `serials` (e.g. collected by another scan of the item table)."""
+        hashes = array("Q", sorted(serial_hash(serial) for serial in serials))
+        with self._lock:
+            self._sorted = hashes
+            self._added.clear()
+            self._removed.clear()
+            self.loaded = True
+        print(f"Serial set loaded: {len(hashes)} serials ({hashes.itemsize * len(hashes) // 1024} KB)")
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sorted) + len(self._added) - len(self._removed)
+
+    def _has(self, h):
+        if h in self._added:
+            return True
+        if h in self._removed:
+            return False
+        i = bisect_left(self._sorted, h)
+        return i < len(self._sorted) and self._sorted[i] == h
+
+    def contains(self, serial):
+        """True/False, or None when the set isn't loaded."""
+        if not self.loaded:
+            return None
+        h = serial_hash(serial)
+        with self._lock:
+            return self._has(h)
+
+    def split(self, serials):
+        """
+        (new, present, repeated) lists for `serials`, where `repeated` are
+        serials that occur more than once in the input (after the first).
+        None when the set isn't loaded.
+        """
+        if not self.loaded:
+            return None
+        new, present, repeated = [], [], []
+        seen = set()
+        hashes = [(serial, serial_hash(serial)) for serial in serials]
+        with self._lock:
+            for serial, h in hashes:
+                if serial in seen:
+                    repeated.append(serial)
+                    continue
+                seen.add(serial)
+                (present if self._has(h) else new).append(serial)
+        return new, present, repeated
+
+    # Patches from writes and the change feed
+    def add(self, serials):
+        if not (self.enabled and self.loaded):
+            return
+        hashes = [serial_hash(s) for s in serials if s]
+        with self._lock:
+            for h in hashes:
+                if h in self._removed:
+                    self._removed.discard(h)
+                else:
+                    self._added.add(h)
+            if len(self._added) >= MERGE_THRESHOLD:
+                self._merge()
+
+    def remove(self, serials):
+        if not (self.enabled and self.loaded):
+            return
+        hashes = [serial_hash(s) for s in serials if s]
+        with self._lock:
+            for h in hashes:
+                if h in self._added:
+                    self._added.discard(h)
+                elif self._has(h):
+                    self._removed.add(h)
+
+    def _merge(self):
+        kept = (h for h in self._sorted if h not in self._removed) if self._removed else self._sorted
+        self._sorted = array("Q", sorted([*kept, *self._added]))
+        self._added.clear()
+        self._removed.clear()
@@ -0,0 +1,271 @@
+import csv
+import gzip
+import json
+import os
+import time
+from contextlib import contextmanager
+from queryBuilder import Select, to_columns
+
+
+# ---------------- Snapshot export ----------------
+# Streams a table, or the joined pallet info, to a gzip CSV, Parquet or Arrow
+# file in keyset pages, so memory stays bounded by one page (one batch for
+# Parquet/Arrow) whatever the table size. Incremental exports read the change
+# log (changeLog.sql) and write only the rows changed since the last export,
+# plus an "_op" column: "upsert" rows hold the current values, "delete" rows
+# only the key. Files are written under a .part name and renamed when complete.
+
+# Rows per request (PostgREST caps responses at 1000)
+EXPORT_PAGE_SIZE = 1000
+# Rows buffered per Parquet row group / Arrow record batch
+EXPORT_BATCH_ROWS = 65536
+# Keys per IN (...) filter when fetching changed rows (keeps request URLs short)
+EXPORT_KEYS_PER_REQUEST = 200
+
+# table, (column, arrow type) in file order, the key it is paged by, and the
+# change-log tables whose changes touch its rows -> the column holding their key
+DATASETS = {
+    "item": {
+        "table": "item",
+        "columns": (("item_id", "int64"), ("serial_number", "string"), ("pallet_id", "string"), ("product_id", "int64")),
+        "key": "item_id",
+        "sources": {"item": "item_id"},
+    },
+    "pallet": {
+        "table": "pallet",
+        "columns": (("pallet_id", "string"), ("shelf_id", "string"), ("product_id", "int64"), ("notes", "string")),
+        "key": "pallet_id",
+        "sources": {"pallet": "pallet_id"},
+    },
+    "product": {
+        "table": "product",
+        "columns": (("product_id", "int64"), ("product_name", "string"),
+                    ("product_description", "string"), ("model_number", "string")),
+        "key": "product_id",
+        "sources": {"product": "product_id"},
+    },
+    # Same rows as pallet_info_view, joined in the request
+    "pallet_info": {
+        "table": "pallet",
+        "columns": (("pallet_id", "string"), ("shelf_id", "string"), ("product.model_number", "string")),
+        "key": "pallet_id",
+        "sources": {"pallet": "pallet_id", "product": "product_id"},
+    },
+}
+# Change-log keys are text; these key columns are integers
+INT_KEYS = ("item_id", "product_id")
+
+# File extension -> format
+FORMATS = (
+    (".csv.gz", "csv.gz"),
+    (".csv", "csv"),
+    (".parquet", "parquet"),
+    (".arrow", "arrow"),
+    (".feather", "arrow"),
+)
+
+def export_format(path):
+    """The format for a file name, from its extension."""
+    for extension, fmt in FORMATS:
+        if path.lower().endswith(extension):
+            return fmt
+    raise ValueError(f"Unknown export format for {path} (use .csv.gz, .csv, .parquet or .arrow)")
+
+def _dataset(name):
+    if name not in DATASETS:
+        raise ValueError(f"Unknown dataset: {name} (choose from {', '.join(DATASETS)})")
+    return DATASETS[name]
+
+def _select(spec):
+    return Select(spec["table"], *(column for column, _ in spec["columns"])).order_by(spec["key"])
+
+def _key_index(spec):
+    return [column for column, _ in spec["columns"]].index(spec["key"])
+
+def _typed_keys(column, keys):
+    return [int(k) for k in keys] if column in INT_KEYS else list(keys)
+
+# Writers: write(rows) takes a list of tuples in column order
+class _CsvWriter:
+    def __init__(self, path, names, types, compress):
+        if compress:
+            self._file = gzip.open(path, "wt", newline="", encoding="utf-8")
+        else:
+            self._file = open(path, "w", newline="", encoding="utf-8")
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(names)
+
+    def write(self, rows):
+        self._csv.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+class _ArrowWriter:
+    """Buffers rows into EXPORT_BATCH_ROWS column batches (Parquet row groups / Arrow record batches)."""
+    def __init__(self, path, names, types, parquet):
+        # Imported here: pyarrow is optional and slow to import, so start-up doesn't pay for it
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet and Arrow exports need pyarrow (pip install pyarrow)") from None
+        self._pa = pa
+        self.names = names
+        self.schema = pa.schema([(name, getattr(pa, t)()) for name, t in zip(names, types)])
+        if parquet:
+            self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_file(path, self.schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+        self._rows = []
+
+    def write(self, rows):
+        self._rows.extend(rows)
+        if len(self._rows) >= EXPORT_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            arrays = to_columns(self._rows, self.names)
+            pa = self._pa
+            self._writer.write_batch(pa.record_batch(
+                [pa.array(arrays[f.name], type=f.type) for f in self.schema], schema=self.schema))
+            self._rows = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+@contextmanager
+def _open_writer(path, spec, incremental=False):
+    """A writer for `path` that only replaces it once everything is written."""
+    names = [column.rpartition(".")[2] for column, _ in spec["columns"]]
+    types = [t for _, t in spec["columns"]]
+    if incremental:
+        names.append("_op")
+        types.append("string")
+    fmt = export_format(path)
+    part = path + ".part"
+    if fmt in ("csv", "csv.gz"):
+        writer = _CsvWriter(part, names, types, compress=fmt == "csv.gz")
+    else:
+        writer = _ArrowWriter(part, names, types, parquet=fmt == "parquet")
+    try:
+        yield writer
+    except BaseException:
+        writer.close()
+        os.remove(part)
+        raise
+    writer.close()
+    os.replace(part, path)
+
+def _pages(engine, query, key_index, page_size):
+    """Keyset pages of a projection query, until a short page."""
+    after = None
+    while True:
+        page = engine.select_projection(**query.after(after).limit(page_size).spec()).data or []
+        yield page
+        if len(page) < page_size:
+            return
+        after = page[-1][key_index]
+
+def change_position(engine):
+    """
+    The change-log position ([txid, change_id]) to continue from, or None
+    without a change log. Every change not yet visible lands after it.
+    """
+    try:
+        rows = engine.change_position().data or []
+    except Exception as e:
+        print(f"No change log (run changeLog.sql for incremental exports): {e}")
+        return None
+    return [rows[0]["txid"], rows[0]["change_id"]] if rows else [0, 0]
+
+def export_snapshot(engine, dataset, path, page_size=EXPORT_PAGE_SIZE, on_progress=None):
+    """
+    Write every row of `dataset` to `path` (format from its extension).
+    Returns {"rows", "position", "seconds"}: position is the change-log
+    position to continue from with export_changes. Changes made while the
+    export runs are included again by the next incremental export.
+    """
+    spec = _dataset(dataset)
+    position = change_position(engine)
+    start = time.perf_counter()
+    rows = 0
+    with _open_writer(path, spec) as writer:
+        for page in _pages(engine, _select(spec), _key_index(spec), page_size):
+            writer.write(page)
+            rows += len(page)
+            if on_progress is not None:
+                on_progress(rows)
+    return {"rows": rows, "position": position, "seconds": time.perf_counter() - start}
+
+def export_changes(engine, dataset, path, since, page_size=EXPORT_PAGE_SIZE, on_progress=None):
+    """
+    Write the rows of `dataset` changed after change-log position `since`,
+    in change order. Returns {"rows", "deleted", "position", "seconds"}:
+    position is the position this export reached. Only changes of finished
+    transactions are read, so one committing later can't land behind it.
+    """
+    spec = _dataset(dataset)
+    table, key_index = spec["table"], _key_index(spec)
+    width = len(spec["columns"])
+    start = time.perf_counter()
+    rows = deleted = 0
+    position = list(since)
+    with _open_writer(path, spec, incremental=True) as writer:
+        while True:
+            changes = engine.select_changes(tuple(spec["sources"]), position, page_size).data or []
+            if not changes:
+                break
+            position = [changes[-1]["txid"], changes[-1]["change_id"]]
+
+            # The last change to each row in this page decides what is written
+            last = {}
+            for c in changes:
+                last[(c["table_name"], c["row_key"])] = c["op"]
+            changed, gone = {}, []
+            for (source, row_key), op in last.items():
+                if op != "D":
+                    changed.setdefault(source, []).append(row_key)
+                elif source == table:
+                    gone.append(row_key)
+
+            # Current values of the changed rows; rows deleted since are absent (their delete comes later)
+            current = {}
+            for source, keys in changed.items():
+                column = spec["sources"][source]
+                keys = _typed_keys(column, keys)
+                for i in range(0, len(keys), EXPORT_KEYS_PER_REQUEST):
+                    query = _select(spec).where_in(column, keys[i:i + EXPORT_KEYS_PER_REQUEST])
+                    for page in _pages(engine, query, key_index, page_size):
+                        current.update((row[key_index], row) for row in page)
+            writer.write([(*row, "upsert") for row in current.values()])
+
+            tombstones = []
+            for key in _typed_keys(spec["key"], gone):
+                row = [None] * width
+                row[key_index] = key
+                tombstones.append((*row, "delete"))
+            writer.write(tombstones)
+
+            rows += len(current)
+            deleted += len(tombstones)
+            if on_progress is not None:
+                on_progress(rows + deleted)
+            if len(changes) < page_size:
+                break
+    return {"rows": rows, "deleted": deleted, "position": position, "seconds": time.perf_counter() - start}
+
+# Export state: {dataset: {"position", "path", "at"}} for the last export of each dataset
+def load_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_state(path, state):
+    part = path + ".part"
+    with open(part, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(part, path)
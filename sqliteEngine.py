@@ -0,0 +1,529 @@
+import os
+import re
+import sqlite3
+import threading
+from storageEngine import StorageEngine, EngineResponse, DEFAULT_AISLES, DEFAULT_AISLE_RULES
+from queryBuilder import sql_select
+import searchIndex
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Schema files shared with the Supabase project, applied in order
+SCHEMA_FILES = (
+    "databaseSchema.sql",
+    "stockCountsView.sql",
+    "palletCountsView.sql",
+    "palletInfoView.sql",
+)
+
+TABLES = ("shelf", "product", "pallet", "item")
+
+# Local-only indexes so per-pallet / per-product reads stay sub-millisecond
+SQLITE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_item_pallet_item ON item(pallet_id, item_id)",
+    "CREATE INDEX IF NOT EXISTS idx_item_product_item ON item(product_id, item_id)",
+    "CREATE INDEX IF NOT EXISTS idx_pallet_product_id ON pallet(product_id)",
+    "CREATE INDEX IF NOT EXISTS idx_product_model_number ON product(model_number)",
+)
+
+# SQLite version of modelCounts.sql (row-level triggers; SQLite has no statement triggers)
+SQLITE_COUNT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS product_counts (
+    product_id INTEGER PRIMARY KEY REFERENCES product(product_id) ON DELETE CASCADE,
+    item_count INTEGER NOT NULL DEFAULT 0,
+    pallet_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TRIGGER IF NOT EXISTS item_counts_insert AFTER INSERT ON item BEGIN
+    INSERT INTO product_counts (product_id, item_count) VALUES (new.product_id, 1)
+    ON CONFLICT (product_id) DO UPDATE SET item_count = item_count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS item_counts_delete AFTER DELETE ON item BEGIN
+    UPDATE product_counts SET item_count = item_count - 1 WHERE product_id = old.product_id;
+END;
+CREATE TRIGGER IF NOT EXISTS item_counts_update AFTER UPDATE OF product_id ON item
+WHEN old.product_id IS NOT new.product_id BEGIN
+    UPDATE product_counts SET item_count = item_count - 1 WHERE product_id = old.product_id;
+    INSERT INTO product_counts (product_id, item_count) VALUES (new.product_id, 1)
+    ON CONFLICT (product_id) DO UPDATE SET item_count = item_count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS pallet_counts_insert AFTER INSERT ON pallet BEGIN
+    INSERT INTO product_counts (product_id, pallet_count) VALUES (new.product_id, 1)
+    ON CONFLICT (product_id) DO UPDATE SET pallet_count = pallet_count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS pallet_counts_delete AFTER DELETE ON pallet BEGIN
+    UPDATE product_counts SET pallet_count = pallet_count - 1 WHERE product_id = old.product_id;
+END;
+CREATE TRIGGER IF NOT EXISTS pallet_counts_update AFTER UPDATE OF product_id ON pallet
+WHEN old.product_id IS NOT new.product_id BEGIN
+    UPDATE product_counts SET pallet_count = pallet_count - 1 WHERE product_id = old.product_id;
+    INSERT INTO product_counts (product_id, pallet_count) VALUES (new.product_id, 1)
+    ON CONFLICT (product_id) DO UPDATE SET pallet_count = pallet_count + 1;
+END;
+CREATE VIEW IF NOT EXISTS stock_counts_fast AS
+SELECT p.model_number, sum(c.item_count) AS count
+FROM product_counts c JOIN product p ON p.product_id = c.product_id
+GROUP BY p.model_number HAVING sum(c.item_count) > 0 ORDER BY p.model_number;
+CREATE VIEW IF NOT EXISTS pallet_counts_fast AS
+SELECT p.model_number, sum(c.pallet_count) AS pallet_count
+FROM product_counts c JOIN product p ON p.product_id = c.product_id
+GROUP BY p.model_number HAVING sum(c.pallet_count) > 0 ORDER BY p.model_number;
+"""
+
+SQLITE_CHECK_COUNTS = """
+SELECT p.product_id,
+       coalesce(c.item_count, 0) AS stored_items, coalesce(i.n, 0) AS actual_items,
+       coalesce(c.pallet_count, 0) AS stored_pallets, coalesce(pl.n, 0) AS actual_pallets
+FROM product p
+LEFT JOIN product_counts c ON c.product_id = p.product_id
+LEFT JOIN (SELECT product_id, count(*) AS n FROM item GROUP BY product_id) i ON i.product_id = p.product_id
+LEFT JOIN (SELECT product_id, count(*) AS n FROM pallet GROUP BY product_id) pl ON pl.product_id = p.product_id
+WHERE coalesce(c.item_count, 0) <> coalesce(i.n, 0) OR coalesce(c.pallet_count, 0) <> coalesce(pl.n, 0)
+"""
+
+SQLITE_REBUILD_COUNTS = (
+    ("DELETE FROM product_counts", ()),
+    ("INSERT INTO product_counts (product_id, item_count, pallet_count) "
+     "SELECT p.product_id, "
+     "(SELECT count(*) FROM item i WHERE i.product_id = p.product_id), "
+     "(SELECT count(*) FROM pallet pl WHERE pl.product_id = p.product_id) "
+     "FROM product p", ()),
+)
+
+# Local stand-in for the Postgres sequences in idAllocation.sql
+ID_SEQUENCES = {
+    "item_id_seq": ("item", "item_id"),
+    "product_id_seq": ("product", "product_id"),
+}
+
+# SQLite version of aisleModel.sql (the shelf.aisle_name column is added in _create_schema)
+SQLITE_AISLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS aisle (
+    aisle_name VARCHAR(50) PRIMARY KEY,
+    sort_order INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS aisle_rule (
+    shelf_prefix VARCHAR(5) PRIMARY KEY,
+    aisle_name VARCHAR(50) NOT NULL REFERENCES aisle(aisle_name) ON UPDATE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_shelf_aisle ON shelf(aisle_name);
+CREATE INDEX IF NOT EXISTS idx_pallet_shelf ON pallet(shelf_id);
+CREATE TRIGGER IF NOT EXISTS shelf_set_aisle_insert AFTER INSERT ON shelf BEGIN
+    UPDATE shelf SET aisle_name = (
+        SELECT aisle_name FROM aisle_rule
+        WHERE substr(new.shelf_id, 1, length(shelf_prefix)) = shelf_prefix
+        ORDER BY length(shelf_prefix) DESC LIMIT 1
+    ) WHERE shelf_id = new.shelf_id;
+END;
+CREATE TRIGGER IF NOT EXISTS shelf_set_aisle_update AFTER UPDATE OF shelf_id ON shelf BEGIN
+    UPDATE shelf SET aisle_name = (
+        SELECT aisle_name FROM aisle_rule
+        WHERE substr(new.shelf_id, 1, length(shelf_prefix)) = shelf_prefix
+        ORDER BY length(shelf_prefix) DESC LIMIT 1
+    ) WHERE shelf_id = new.shelf_id;
+END;
+CREATE VIEW IF NOT EXISTS pallet_aisle_view AS
+SELECT p.pallet_id, p.shelf_id, pr.model_number, s.aisle_name
+FROM pallet p
+JOIN shelf s ON s.shelf_id = p.shelf_id
+JOIN product pr ON pr.product_id = p.product_id;
+"""
+
+SQLITE_AISLE_FOR_SHELF = (
+    "(SELECT r.aisle_name FROM aisle_rule r "
+    "WHERE substr(shelf.shelf_id, 1, length(r.shelf_prefix)) = r.shelf_prefix "
+    "ORDER BY length(r.shelf_prefix) DESC LIMIT 1)"
+)
+SQLITE_REASSIGN_AISLES = (
+    f"UPDATE shelf SET aisle_name = {SQLITE_AISLE_FOR_SHELF} "
+    f"WHERE aisle_name IS NOT {SQLITE_AISLE_FOR_SHELF}"
+)
+
+# SQLite version of changeLog.sql (row-level triggers)
+CHANGE_LOG_KEYS = {"shelf": "shelf_id", "product": "product_id", "pallet": "pallet_id", "item": "item_id"}
+SQLITE_CHANGE_LOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS change_log (
+    change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    op TEXT NOT NULL,
+    changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_change_log_table ON change_log(table_name, change_id);
+CREATE INDEX IF NOT EXISTS idx_change_log_changed_at ON change_log(changed_at);
+""" + "".join(f"""
+CREATE TRIGGER IF NOT EXISTS {table}_change_log_insert AFTER INSERT ON {table} BEGIN
+    INSERT INTO change_log (table_name, row_key, op) VALUES ('{table}', new.{key}, 'I');
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_change_log_update AFTER UPDATE ON {table} BEGIN
+    INSERT INTO change_log (table_name, row_key, op) VALUES ('{table}', new.{key}, 'U');
+    INSERT INTO change_log (table_name, row_key, op) SELECT '{table}', old.{key}, 'D' WHERE old.{key} IS NOT new.{key};
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_change_log_delete AFTER DELETE ON {table} BEGIN
+    INSERT INTO change_log (table_name, row_key, op) VALUES ('{table}', old.{key}, 'D');
+END;""" for table, key in CHANGE_LOG_KEYS.items())
+
+def _to_sqlite_dialect(sql):
+    """Make the Postgres schema/view scripts re-runnable on SQLite."""
+    sql = re.sub(r"create\s+or\s+replace\s+view", "CREATE VIEW IF NOT EXISTS", sql, flags=re.I)
+    sql = re.sub(r"create\s+view\s+(?!if\s+not\s+exists)", "CREATE VIEW IF NOT EXISTS ", sql, flags=re.I)
+    sql = re.sub(r"create\s+table\s+(?!if\s+not\s+exists)", "CREATE TABLE IF NOT EXISTS ", sql, flags=re.I)
+    # Views/scripts are stored without a trailing semicolon
+    if not sql.rstrip().endswith(";"):
+        sql = sql.rstrip() + ";"
+    return sql
+
+class SQLiteEngine(StorageEngine):
+    """
+    Storage engine backed by a local SQLite file (or ':memory:').
+    The schema is built from databaseSchema.sql and the three view scripts,
+    plus local versions of the count, aisle and change-log scripts.
+    """
+    name = "sqlite"
+
+    def __init__(self, path="inventory.db"):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._feed = None
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            for filename in SCHEMA_FILES:
+                with open(os.path.join(BASE_DIR, filename), encoding="utf-8") as f:
+                    self._conn.executescript(_to_sqlite_dialect(f.read()))
+            for statement in SQLITE_INDEXES:
+                self._conn.execute(statement)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS id_sequence (name TEXT PRIMARY KEY, next_id INTEGER NOT NULL)"
+            )
+            for sequence in ID_SEQUENCES:
+                self._conn.execute("INSERT OR IGNORE INTO id_sequence VALUES (?, 1)", (sequence,))
+            has_counts = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_counts'"
+            ).fetchone()
+            self._conn.executescript(SQLITE_COUNT_SCHEMA)
+
+            shelf_columns = {r["name"] for r in self._conn.execute("PRAGMA table_info(shelf)")}
+            if "aisle_name" not in shelf_columns:
+                self._conn.execute("ALTER TABLE shelf ADD COLUMN aisle_name VARCHAR(50) REFERENCES aisle(aisle_name)")
+            has_aisles = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'aisle'"
+            ).fetchone()
+            self._conn.executescript(SQLITE_AISLE_SCHEMA)
+            if not has_aisles:
+                self._conn.executemany(
+                    "INSERT INTO aisle (aisle_name, sort_order) VALUES (?, ?)",
+                    [(name, i + 1) for i, name in enumerate(DEFAULT_AISLES)],
+                )
+                self._conn.executemany("INSERT INTO aisle_rule VALUES (?, ?)", DEFAULT_AISLE_RULES)
+                self._conn.execute(SQLITE_REASSIGN_AISLES)
+            self._conn.executescript(SQLITE_CHANGE_LOG_SCHEMA)
+        if not has_counts:
+            # Existing database opened for the first time since counts were added
+            self.rebuild_counts()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return EngineResponse([dict(r) for r in rows])
+
+    def _write(self, statements):
+        """Run (sql, params) pairs in one transaction and collect RETURNING rows."""
+        with self._lock, self._conn:
+            rows = []
+            for sql, params in statements:
+                rows.extend(dict(r) for r in self._conn.execute(sql, params).fetchall())
+        return EngineResponse(rows)
+
+    def _emit(self, table, event_type, resp):
+        """Publish changed rows to the change feed (local stand-in for Realtime)."""
+        if self._feed is not None:
+            for row in resp.data:
+                if event_type == "DELETE":
+                    self._feed.publish(table, event_type, old_record=row)
+                else:
+                    self._feed.publish(table, event_type, record=row)
+        return resp
+
+    def _insert(self, table, payload, ignore_conflicts=False):
+        conflict = " ON CONFLICT DO NOTHING" if ignore_conflicts else ""
+        statements = []
+        for row in payload:
+            columns = ", ".join(row)
+            marks = ", ".join("?" for _ in row)
+            statements.append((
+                f"INSERT INTO {table} ({columns}) VALUES ({marks}){conflict} RETURNING *",
+                tuple(row.values()),
+            ))
+        return self._write(statements)
+
+    # Generic
+    def select_page(self, table, columns, key, after=None, limit=1000):
+        if table not in TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        where = f"WHERE {key} > ?" if after is not None else ""
+        params = (after, limit) if after is not None else (limit,)
+        return self._query(f"SELECT {columns} FROM {table} {where} ORDER BY {key} LIMIT ?", params)
+
+    # Shelves
+    def insert_shelves(self, payload):
+        return self._insert("shelf", payload, ignore_conflicts=True)
+
+    # Items
+    def insert_items(self, payload, ignore_conflicts=False):
+        return self._emit("item", "INSERT", self._insert("item", payload, ignore_conflicts))
+
+    def delete_items_by_serials(self, serials):
+        serials = list(serials)
+        marks = ", ".join("?" for _ in serials)
+        resp = self._write([(f"DELETE FROM item WHERE serial_number IN ({marks}) RETURNING *", serials)])
+        return self._emit("item", "DELETE", resp)
+
+    def delete_items_by_pallet(self, pallet_id):
+        resp = self._write([("DELETE FROM item WHERE pallet_id = ? RETURNING *", (pallet_id,))])
+        return self._emit("item", "DELETE", resp)
+
+    def select_existing_serials(self, serials):
+        serials = list(serials)
+        marks = ", ".join("?" for _ in serials)
+        return self._query(f"SELECT serial_number FROM item WHERE serial_number IN ({marks})", serials)
+
+    def select_items_by_serials(self, serials):
+        serials = list(serials)
+        marks = ", ".join("?" for _ in serials)
+        return self._query(f"SELECT serial_number, pallet_id FROM item WHERE serial_number IN ({marks})", serials)
+
+    def select_projection(self, table, columns, filters=(), key=None, after=None, before=None, limit=None):
+        sql, params = sql_select(table, columns, filters, key, after, before, limit)
+        with self._lock:
+            rows = [tuple(r) for r in self._conn.execute(sql, params).fetchall()]
+        if before is not None:
+            rows.reverse()
+        return EngineResponse(rows)
+
+    def count_projection(self, table, filters=()):
+        sql, params = sql_select(table, (), filters, count=True)
+        with self._lock:
+            count = self._conn.execute(sql, params).fetchone()[0]
+        return EngineResponse(count=count)
+
+    def allocate_ids(self, sequence, count):
+        table, column = ID_SEQUENCES[sequence]
+        # One atomic UPDATE; never hands out ids below rows inserted with explicit keys
+        rows = self._write([(
+            f"UPDATE id_sequence SET next_id = max(next_id, (SELECT coalesce(max({column}), 0) + 1 FROM {table})) + ? "
+            "WHERE name = ? RETURNING next_id",
+            (count, sequence),
+        )]).data
+        end = rows[0]["next_id"]
+        return EngineResponse(list(range(end - count, end)))
+
+    # Pallets
+    def insert_pallet(self, data):
+        return self._emit("pallet", "INSERT", self._insert("pallet", [data]))
+
+    def insert_pallets(self, payload):
+        return self._emit("pallet", "INSERT", self._insert("pallet", payload))
+
+    def delete_pallet(self, pallet_id):
+        resp = self._write([("DELETE FROM pallet WHERE pallet_id = ? RETURNING *", (pallet_id,))])
+        return self._emit("pallet", "DELETE", resp)
+
+    def update_pallet_shelf(self, pallet_id, shelf_id):
+        resp = self._write([("UPDATE pallet SET shelf_id = ? WHERE pallet_id = ? RETURNING *", (shelf_id, pallet_id))])
+        return self._emit("pallet", "UPDATE", resp)
+
+    def remove_pallet_with_items(self, pallet_id):
+        with self._lock, self._conn:
+            if self._conn.execute("SELECT 1 FROM pallet WHERE pallet_id = ?", (pallet_id,)).fetchone() is None:
+                return EngineResponse()
+            items = [dict(r) for r in self._conn.execute("DELETE FROM item WHERE pallet_id = ? RETURNING *", (pallet_id,))]
+            pallets = [dict(r) for r in self._conn.execute("DELETE FROM pallet WHERE pallet_id = ? RETURNING *", (pallet_id,))]
+        self._emit("item", "DELETE", EngineResponse(items))
+        self._emit("pallet", "DELETE", EngineResponse(pallets))
+        return EngineResponse([{"pallet_id": pallet_id, "items_deleted": len(items)}])
+
+    def move_pallets_to_shelf(self, pallet_ids, shelf_id):
+        pallet_ids = list(pallet_ids)
+        marks = ", ".join("?" for _ in pallet_ids)
+        resp = self._write([(
+            f"UPDATE pallet SET shelf_id = ? WHERE pallet_id IN ({marks}) RETURNING *",
+            (shelf_id, *pallet_ids),
+        )])
+        return self._emit("pallet", "UPDATE", resp)
+
+    def move_items_to_pallet(self, serials, source_pallet_id, target_pallet_id):
+        with self._lock, self._conn:
+            target = self._conn.execute("SELECT product_id FROM pallet WHERE pallet_id = ?", (target_pallet_id,)).fetchone()
+            if target is None:
+                return EngineResponse()
+            select = "SELECT item_id, serial_number, pallet_id, product_id FROM item"
+            if source_pallet_id is not None:
+                requested = self._conn.execute(f"{select} WHERE pallet_id = ?", (source_pallet_id,)).fetchall()
+            else:
+                serials = list(serials)
+                marks = ", ".join("?" for _ in serials)
+                requested = self._conn.execute(f"{select} WHERE serial_number IN ({marks})", serials).fetchall()
+            ids = [r["item_id"] for r in requested
+                   if r["product_id"] == target["product_id"] and r["pallet_id"] != target_pallet_id]
+            marks = ", ".join("?" for _ in ids)
+            moved = [dict(r) for r in self._conn.execute(
+                f"UPDATE item SET pallet_id = ? WHERE item_id IN ({marks}) RETURNING *", (target_pallet_id, *ids))] if ids else []
+        self._emit("item", "UPDATE", EngineResponse(moved))
+
+        moved_ids = {r["item_id"] for r in moved}
+        rows = []
+        for r in requested:
+            status = ("moved" if r["item_id"] in moved_ids
+                      else "same_pallet" if r["pallet_id"] == target_pallet_id else "incompatible")
+            rows.append({"serial_number": r["serial_number"], "item_id": r["item_id"], "product_id": r["product_id"],
+                         "from_pallet_id": r["pallet_id"], "status": status})
+        if source_pallet_id is None:
+            found = {r["serial_number"] for r in requested}
+            rows.extend({"serial_number": s, "item_id": None, "product_id": None, "from_pallet_id": None,
+                         "status": "not_found"} for s in serials if s not in found)
+        return EngineResponse(rows)
+
+    def select_pallet_products(self, pallet_ids):
+        pallet_ids = list(pallet_ids)
+        marks = ", ".join("?" for _ in pallet_ids)
+        return self._query(f"SELECT pallet_id, product_id FROM pallet WHERE pallet_id IN ({marks})", pallet_ids)
+
+    def list_pallet_ids(self):
+        return self._query("SELECT pallet_id FROM pallet ORDER BY pallet_id")
+
+    # Products
+    def insert_product(self, data):
+        return self._emit("product", "INSERT", self._insert("product", [data]))
+
+    def insert_products(self, payload):
+        return self._emit("product", "INSERT", self._insert("product", payload))
+
+    def select_product(self, product_id):
+        return self._query("SELECT product_id, model_number FROM product WHERE product_id = ?", (product_id,))
+
+    def select_products_by_model(self, model_number):
+        return self._query("SELECT product_id FROM product WHERE model_number = ?", (model_number,))
+
+    def select_products_by_models(self, model_numbers):
+        model_numbers = list(model_numbers)
+        marks = ", ".join("?" for _ in model_numbers)
+        return self._query(f"SELECT product_id, model_number FROM product WHERE model_number IN ({marks})", model_numbers)
+
+    def list_model_numbers(self):
+        return self._query("SELECT model_number FROM product ORDER BY model_number")
+
+    # Views
+    def select_model_for_pallet(self, pallet_id):
+        return self._query("SELECT model_number FROM pallet_info_view WHERE pallet_id = ? LIMIT 1", (pallet_id,))
+
+    def select_stock_counts(self):
+        return self._query("SELECT model_number, count FROM stock_counts_fast")
+
+    def select_pallet_counts(self):
+        return self._query("SELECT model_number, pallet_count FROM pallet_counts_fast")
+
+    def check_counts(self):
+        return self._query(SQLITE_CHECK_COUNTS)
+
+    def rebuild_counts(self):
+        with self._lock, self._conn:
+            for sql, params in SQLITE_REBUILD_COUNTS:
+                cursor = self._conn.execute(sql, params)
+        return EngineResponse([{"rebuilt": cursor.rowcount}])
+
+    def select_pallet_info(self):
+        return self._query("SELECT pallet_id, shelf_id, model_number FROM pallet_info_view")
+
+    # Aisles
+    def list_aisles(self):
+        return self._query("SELECT aisle_name FROM aisle ORDER BY sort_order, aisle_name")
+
+    def select_pallets_by_aisle(self, aisle):
+        return self._query(
+            "SELECT pallet_id, shelf_id, model_number FROM pallet_aisle_view WHERE aisle_name = ? ORDER BY pallet_id",
+            (aisle,),
+        )
+
+    def list_aisle_rules(self):
+        return self._query("SELECT shelf_prefix, aisle_name FROM aisle_rule ORDER BY shelf_prefix")
+
+    def set_aisle_rules(self, rules):
+        rules = [(r["shelf_prefix"], r["aisle_name"]) for r in rules]
+        with self._lock, self._conn:
+            next_order = self._conn.execute("SELECT coalesce(max(sort_order), 0) + 1 FROM aisle").fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO aisle (aisle_name, sort_order) VALUES (?, ?)",
+                [(aisle, next_order) for aisle in dict.fromkeys(a for _, a in rules)],
+            )
+            self._conn.execute("DELETE FROM aisle_rule")
+            self._conn.executemany("INSERT INTO aisle_rule VALUES (?, ?)", rules)
+            reassigned = self._conn.execute(SQLITE_REASSIGN_AISLES).rowcount
+        return EngineResponse([{"reassigned": reassigned}])
+
+    # Search
+    def search_inventory(self, query, limit=20):
+        # No pg_trgm here: serials match as substrings (ranked in SQL), and the
+        # product fields, a small table, are scored in Python with fuzzy matching
+        query = searchIndex.normalize(query)
+        if not query:
+            return EngineResponse()
+        pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        rows = self._query(
+            "SELECT 'item' AS kind, i.serial_number AS key, 'serial_number' AS field, i.serial_number AS text, "
+            "CASE WHEN lower(i.serial_number) = :q THEN 1.0 "
+            "WHEN substr(lower(i.serial_number), 1, length(:q)) = :q THEN 0.9 ELSE 0.8 END AS score, "
+            "i.item_id, i.pallet_id, p.model_number "
+            "FROM item i JOIN product p ON p.product_id = i.product_id "
+            "WHERE i.serial_number LIKE :pattern ESCAPE '\\' "
+            "ORDER BY score DESC, length(i.serial_number), i.serial_number LIMIT :limit",
+            {"q": query, "pattern": pattern, "limit": limit},
+        ).data
+        products = self._query("SELECT model_number, product_name, product_description FROM product").data
+        for product in products:
+            best = None
+            for field in searchIndex.PRODUCT_FIELDS:
+                text = product[field]
+                score = searchIndex.score(query, text) if text else 0.0
+                if score and (best is None or (score, -len(text)) > (best["score"], -len(best["text"]))):
+                    best = {"kind": "product", "key": product["model_number"], "field": field, "text": text,
+                            "score": round(score, 4), "item_id": None, "pallet_id": None,
+                            "model_number": product["model_number"]}
+            if best is not None:
+                rows.append(best)
+        rows.sort(key=lambda r: (-r["score"], len(r["text"]), r["key"]))
+        return EngineResponse(rows[:limit])
+
+    # Change log
+    # SQLite runs one write transaction at a time, so change_ids become visible
+    # in order and the position is just the change_id (txid is always 0).
+    def select_changes(self, tables, after=None, limit=1000):
+        tables = list(tables)
+        marks = ", ".join("?" for _ in tables)
+        return self._query(
+            f"SELECT 0 AS txid, change_id, table_name, row_key, op FROM change_log "
+            f"WHERE table_name IN ({marks}) AND change_id > ? ORDER BY change_id LIMIT ?",
+            (*tables, after[1] if after else 0, limit),
+        )
+
+    def change_position(self):
+        return self._query("SELECT 0 AS txid, coalesce(max(change_id), 0) AS change_id FROM change_log")
+
+    def prune_changes(self, before):
+        with self._lock, self._conn:
+            count = self._conn.execute("DELETE FROM change_log WHERE changed_at < ?", (before,)).rowcount
+        return EngineResponse(count=count)
+
+    # Change feed
+    def start_change_feed(self, feed):
+        # Only this process's writes are seen; there is no cross-process source.
+        # The feed only counts as live (every change reaches it) when no other
+        # process can open the database, i.e. for ':memory:'.
+        self._feed = feed
+        feed.live = self.path == ":memory:"
+        return True
@@ -0,0 +1,146 @@
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+# ---------------- Start-up snapshot ----------------
+# The last data the app fetched on start-up (dropdowns, counts and pallet
+# info) saved as one small binary file, so the next launch can fill the
+# window from disk before the server answers. Every string is stored once in
+# a string table; sections are arrays of uint32 string indexes and counts, so
+# loading is a few slices of the memory-mapped file.
+#
+# Layout (little-endian):
+#   header   magic "INVS", format version, saved_at, source crc32, body crc32
+#   strings  count, end offset of each string, UTF-8 blob
+#   sections for each of SECTIONS: row count, then row count * width uint32s
+#
+# The header is the version stamp: a different format version or source
+# (another database) makes the file unusable, and the body crc32 is the
+# data version, compared with the fresh data to tell whether it had changed.
+
+MAGIC = b"INVS"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHxxdII")
+_COUNT = struct.Struct("<I")
+# A None value in a section
+NONE = 0xFFFFFFFF
+
+# name, fields of each row (None: the rows are the strings themselves); a
+# field ending in "count" holds a number, the others index the string table
+SECTIONS = (
+    ("model_numbers", None),
+    ("pallet_ids", None),
+    ("aisle_names", None),
+    ("stock_counts", ("model_number", "count")),
+    ("pallet_counts", ("model_number", "pallet_count")),
+    ("pallet_info", ("pallet_id", "shelf_id", "model_number")),
+)
+
+def _source_id(source):
+    return zlib.crc32(source.encode("utf-8"))
+
+def _uint32s(values):
+    data = array("I", values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data.tobytes()
+
+def _read_uint32s(buffer, offset, count):
+    data = array("I")
+    data.frombytes(buffer[offset:offset + count * 4])
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data, offset + count * 4
+
+def encode(data):
+    """The snapshot body for an overview dict (the keys in SECTIONS)."""
+    strings = {}
+    def index(value):
+        if value is None:
+            return NONE
+        return strings.setdefault(str(value), len(strings))
+
+    sections = []
+    for name, fields in SECTIONS:
+        rows = data.get(name) or []
+        if fields is None:
+            values = [index(v) for v in rows]
+        else:
+            values = [int(row[f] or 0) if f.endswith("count") else index(row[f])
+                      for row in rows for f in fields]
+        sections.append(_COUNT.pack(len(rows)) + _uint32s(values))
+
+    encoded = [s.encode("utf-8") for s in strings]
+    ends, end = [], 0
+    for s in encoded:
+        end += len(s)
+        ends.append(end)
+    return b"".join([_COUNT.pack(len(encoded)), _uint32s(ends), *encoded, *sections])
+
+def decode(body):
+    """The overview dict a snapshot body holds."""
+    (string_count,) = _COUNT.unpack_from(body, 0)
+    ends, offset = _read_uint32s(body, _COUNT.size, string_count)
+    blob_end = offset + (ends[-1] if string_count else 0)
+    blob = bytes(body[offset:blob_end])
+    strings, start = [], 0
+    for end in ends:
+        strings.append(blob[start:end].decode("utf-8"))
+        start = end
+    offset = blob_end
+
+    def text(i):
+        return None if i == NONE else strings[i]
+
+    data = {}
+    for name, fields in SECTIONS:
+        (rows,) = _COUNT.unpack_from(body, offset)
+        width = len(fields) if fields else 1
+        values, offset = _read_uint32s(body, offset + _COUNT.size, rows * width)
+        if fields is None:
+            data[name] = [text(i) for i in values]
+        else:
+            data[name] = [
+                {f: (v if f.endswith("count") else text(v)) for f, v in zip(fields, values[r * width:(r + 1) * width])}
+                for r in range(rows)
+            ]
+    return data
+
+def version(data):
+    """The data version stamp of an overview dict (crc32 of its encoding)."""
+    return zlib.crc32(encode(data))
+
+def save(path, data, source):
+    """Write the overview to `path` (replaced atomically); returns its data version."""
+    body = encode(data)
+    crc = zlib.crc32(body)
+    part = path + ".part"
+    with open(part, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, time.time(), _source_id(source), crc))
+        f.write(body)
+    os.replace(part, path)
+    return crc
+
+def load(path, source):
+    """
+    The snapshot at `path` as {"data", "saved_at", "version"}, or None when
+    there is none, it is damaged, or its format version or source differ.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) < _HEADER.size:
+        return None
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, format_version, saved_at, source_id, crc = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION or source_id != _source_id(source):
+            return None
+        body = memoryview(mm)[_HEADER.size:]
+        try:
+            if zlib.crc32(body) != crc:
+                return None
+            data = decode(body)
+        finally:
+            body.release()
+    return {"data": data, "saved_at": saved_at, "version": crc}
@@ -0,0 +1,318 @@
+import os
+import asyncio
+import threading
+
+# ---------------- Storage engine interface ----------------
+# backend.py talks to the database only through one of these engines, so the
+# same app code can run against Supabase or a warehouse-local SQLite replica.
+
+# Default warehouse layout, seeded into the aisle / aisle_rule tables (aisleModel.sql).
+# A shelf belongs to the aisle of its longest matching shelf-id prefix.
+DEFAULT_AISLES = ('Narrow Aisle', 'Wide Aisle', 'Cable Aisle', 'Aisle 4', 'Loading bay')
+DEFAULT_AISLE_RULES = (
+    ("1", "Narrow Aisle"), ("2", "Narrow Aisle"),
+    ("298", "Wide Aisle"), ("299", "Wide Aisle"), ("3", "Wide Aisle"), ("4", "Wide Aisle"),
+    ("5", "Cable Aisle"), ("6", "Cable Aisle"),
+    ("7", "Aisle 4"),
+    ("Lb", "Loading bay"),
+)
+
+class EngineResponse:
+    """Minimal stand-in for a Supabase APIResponse: rows live in `.data`."""
+    def __init__(self, data=None, count=None):
+        self.data = data or []
+        self.count = count
+        self.error = None
+
+class StorageEngine:
+    """
+    Interface implemented by every storage backend.
+    Each method returns an object with a `.data` list of row dicts (like a
+    Supabase response; tuples for select_projection) and raises on failure;
+    backend.py handles reporting.
+    """
+    name = "base"
+    # Exceptions that mean the database couldn't be reached, as opposed to a
+    # request it refused (the write journal retries only these)
+    offline_errors = (ConnectionError, TimeoutError)
+
+    # Generic
+    def select_page(self, table, columns, key, after=None, limit=1000):
+        """Keyset page of `table` ordered by `key`, starting after `after`."""
+        raise NotImplementedError
+
+    # Shelves
+    def insert_shelves(self, payload):
+        """Insert shelf rows (existing shelf_ids are skipped)."""
+        raise NotImplementedError
+
+    # Items
+    def insert_items(self, payload, ignore_conflicts=False):
+        """Insert item rows; with ignore_conflicts, duplicates are skipped."""
+        raise NotImplementedError
+
+    def delete_items_by_serials(self, serials):
+        """Delete items by serial number and return the deleted rows."""
+        raise NotImplementedError
+
+    def delete_items_by_pallet(self, pallet_id):
+        """Delete every item on a pallet and return the deleted rows."""
+        raise NotImplementedError
+
+    def select_existing_serials(self, serials):
+        """Return serial_number rows for the given serials that already exist."""
+        raise NotImplementedError
+
+    def select_items_by_serials(self, serials):
+        """Return serial_number and pallet_id rows for the given serials that exist."""
+        raise NotImplementedError
+
+    def select_projection(self, table, columns, filters=(), key=None, after=None, before=None, limit=None):
+        """
+        Only `columns` of `table` ("parent.column" reads a referenced row's
+        column in the same request), where each (column, value) filter matches,
+        ordered by `key` after `after` or before `before`. `.data` holds one
+        tuple per row in column order. Built by queryBuilder.Select.
+        """
+        raise NotImplementedError
+
+    def count_projection(self, table, filters=()):
+        """Number of rows select_projection would match; returned in `.count`."""
+        raise NotImplementedError
+
+    def allocate_ids(self, sequence, count):
+        """Reserve `count` ids from a sequence; `.data` is a list of ints."""
+        raise NotImplementedError
+
+    # Pallets
+    def insert_pallet(self, data):
+        raise NotImplementedError
+
+    def insert_pallets(self, payload):
+        """Insert pallet rows in one request and return them."""
+        raise NotImplementedError
+
+    def delete_pallet(self, pallet_id):
+        raise NotImplementedError
+
+    def update_pallet_shelf(self, pallet_id, shelf_id):
+        raise NotImplementedError
+
+    def remove_pallet_with_items(self, pallet_id):
+        """
+        Atomically delete a pallet and all its items. `.data` is
+        [{"pallet_id", "items_deleted"}], or empty if the pallet doesn't exist.
+        """
+        raise NotImplementedError
+
+    def move_pallets_to_shelf(self, pallet_ids, shelf_id):
+        """Atomically move pallets to a shelf; returns the moved pallet rows."""
+        raise NotImplementedError
+
+    def move_items_to_pallet(self, serials, source_pallet_id, target_pallet_id):
+        """
+        Atomically move the listed serials, or every item on source_pallet_id,
+        to the target pallet; only items of its product move. `.data` has one
+        {"serial_number", "item_id", "product_id", "from_pallet_id", "status"}
+        row per requested item (status "moved", "incompatible", "same_pallet"
+        or "not_found"), and is empty if the target pallet doesn't exist.
+        """
+        raise NotImplementedError
+
+    def select_pallet_products(self, pallet_ids):
+        """Return pallet_id/product_id rows for the given pallets."""
+        raise NotImplementedError
+
+    def list_pallet_ids(self):
+        raise NotImplementedError
+
+    # Products
+    def insert_product(self, data):
+        raise NotImplementedError
+
+    def insert_products(self, payload):
+        """Insert product rows in one request and return them."""
+        raise NotImplementedError
+
+    def select_product(self, product_id):
+        """Return the product row (product_id, model_number) for an id."""
+        raise NotImplementedError
+
+    def select_products_by_model(self, model_number):
+        """Return product_id rows for a model number."""
+        raise NotImplementedError
+
+    def select_products_by_models(self, model_numbers):
+        """Return product_id/model_number rows for the given model numbers."""
+        raise NotImplementedError
+
+    def list_model_numbers(self):
+        raise NotImplementedError
+
+    # Views
+    def select_model_for_pallet(self, pallet_id):
+        raise NotImplementedError
+
+    def select_stock_counts(self):
+        raise NotImplementedError
+
+    def select_pallet_counts(self):
+        raise NotImplementedError
+
+    def select_pallet_info(self):
+        raise NotImplementedError
+
+    def check_counts(self):
+        """Rows for products whose maintained counts differ from a full recount."""
+        raise NotImplementedError
+
+    def rebuild_counts(self):
+        """Recompute the maintained counts; `.data` is [{"rebuilt": n}]."""
+        raise NotImplementedError
+
+    # Aisles
+    def list_aisles(self):
+        """Aisle names in display order."""
+        raise NotImplementedError
+
+    def select_pallets_by_aisle(self, aisle):
+        """Pallets (pallet_id, shelf_id, model_number) on shelves of an aisle."""
+        raise NotImplementedError
+
+    def list_aisle_rules(self):
+        """Rows of shelf_prefix -> aisle_name."""
+        raise NotImplementedError
+
+    def set_aisle_rules(self, rules):
+        """
+        Replace the shelf-prefix rules with `rules` (dicts with shelf_prefix and
+        aisle_name) and re-derive every shelf's aisle; `.data` is [{"reassigned": n}].
+        """
+        raise NotImplementedError
+
+    # Search (searchIndex.sql)
+    def search_inventory(self, query, limit=20):
+        """
+        Ranked prefix, substring and fuzzy matches for `query` over serial
+        numbers, model numbers, product names and descriptions, best first:
+        `.data` rows have kind ("item"/"product"), key, field, text, score,
+        item_id, pallet_id and model_number (see searchIndex.py for the ranking).
+        """
+        raise NotImplementedError
+
+    # Change log (changeLog.sql)
+    def select_changes(self, tables, after=None, limit=1000):
+        """
+        txid, change_id, table_name, row_key and op rows for `tables` from
+        finished transactions only, in (txid, change_id) order after the
+        position `after` (a (txid, change_id) pair).
+        """
+        raise NotImplementedError
+
+    def change_position(self):
+        """
+        [{"txid": t, "change_id": n}]: a position no change that isn't visible
+        yet can land at or before, so a read continuing from it misses nothing.
+        """
+        raise NotImplementedError
+
+    def prune_changes(self, before):
+        """Delete change-log entries older than `before` (UTC "YYYY-MM-DD HH:MM:SS"); count in `.count`."""
+        raise NotImplementedError
+
+    # Change feed
+    def start_change_feed(self, feed):
+        """
+        Start publishing item/pallet/product changes into a ChangeFeed.
+        Returns False when the engine has no change source.
+        """
+        return False
+
+    # Async
+    def async_engine(self):
+        """
+        Async twin of this engine for concurrent reads. By default every
+        method runs on a worker thread; engines with an async client override this.
+        """
+        return AsyncEngineAdapter(self)
+
+class AsyncEngineAdapter:
+    """Exposes a synchronous engine's methods as coroutines (run with asyncio.to_thread)."""
+    def __init__(self, engine):
+        self.engine = engine
+        self.name = engine.name
+
+    def __getattr__(self, name):
+        method = getattr(self.engine, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+        call.__name__ = name
+        return call
+
+    async def aclose(self):
+        pass
+
+class LazyEngine:
+    """
+    Stands in for an engine until it is first used, then builds it with
+    factory() (once, on whichever thread gets there first) and forwards every
+    attribute to it. Importing the backend therefore opens no client, network
+    connection or database file. A factory that raises is retried on the next use.
+    """
+    def __init__(self, factory):
+        self._factory = factory
+        self._engine = None
+        self._lock = threading.Lock()
+
+    @property
+    def created(self):
+        return self._engine is not None
+
+    def _get(self):
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._engine = self._factory()
+        return self._engine
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def async_engine(self):
+        """The async twin, itself built on first use."""
+        return LazyEngine(lambda: self._get().async_engine())
+
+    async def aclose(self):
+        if self._engine is not None and hasattr(self._engine, "aclose"):
+            await self._engine.aclose()
+
+def create_engine(kind=None):
+    """
+    Build the storage engine named by `kind` or the INVENTORY_ENGINE env var.
+    'supabase' (default) uses SUPABASE_URL/SUPABASE_KEY,
+    'sqlite' uses the file at INVENTORY_SQLITE_PATH.
+    """
+    kind = (kind or os.getenv("INVENTORY_ENGINE", "supabase")).strip().lower()
+
+    if kind == "supabase":
+        from supabaseEngine import SupabaseEngine
+        return SupabaseEngine(
+            os.getenv("SUPABASE_URL", "YOUR_URL"),
+            os.getenv("SUPABASE_KEY", "YOUR_KEY"),
+        )
+    if kind == "sqlite":
+        from sqliteEngine import SQLiteEngine
+        return SQLiteEngine(os.getenv("INVENTORY_SQLITE_PATH", "inventory.db"))
+
+    raise ValueError(f"Unknown storage engine: {kind}")
+
+def engine_source(kind=None):
+    """The database create_engine(kind) would connect to, as "<kind>:<url or path>" (creates nothing)."""
+    kind = (kind or os.getenv("INVENTORY_ENGINE", "supabase")).strip().lower()
+    if kind == "supabase":
+        return f"supabase:{os.getenv('SUPABASE_URL', 'YOUR_URL')}"
+    if kind == "sqlite":
+        path = os.getenv("INVENTORY_SQLITE_PATH", "inventory.db")
+        return f"sqlite:{path if path == ':memory:' else os.path.abspath(path)}"
+    raise ValueError(f"Unknown storage engine: {kind}")
@@ -0,0 +1,337 @@
+import asyncio
+import httpx
+from supabase import create_client, acreate_client, AsyncClientOptions, Client
+from postgrest.types import CountMethod, ReturnMethod
+from storageEngine import StorageEngine, AsyncEngineAdapter
+from changeFeed import SupabaseRealtimeSource
+from queryBuilder import postgrest_select, postgrest_row
+
+# Connection pool for the async client. Requests are multiplexed over HTTP/2
+# keep-alive connections, so concurrent queries share one TLS handshake.
+HTTP_MAX_CONNECTIONS = 10
+HTTP_MAX_KEEPALIVE = 10
+HTTP_KEEPALIVE_EXPIRY = 60
+HTTP_TIMEOUT = 30
+
+def _projection_query(query, filters, key, after, before, limit):
+    """Apply select_projection's filters, keyset and limit to a PostgREST query."""
+    for column, value in filters:
+        query = query.in_(column, list(value)) if isinstance(value, tuple) else query.eq(column, value)
+    if key is not None:
+        if before is not None:
+            query = query.lt(key, before)
+        elif after is not None:
+            query = query.gt(key, after)
+        query = query.order(key, desc=before is not None)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+def _projection_rows(resp, table, columns, before):
+    """Flatten the embedded rows into tuples, back in ascending order for a `before` page."""
+    rows = [postgrest_row(r, table, columns) for r in (resp.data or [])]
+    if before is not None:
+        rows.reverse()
+    resp.data = rows
+    return resp
+
+class SupabaseEngine(StorageEngine):
+    """Storage engine backed by a Supabase (PostgREST) project."""
+    name = "supabase"
+    offline_errors = (httpx.TransportError, ConnectionError, TimeoutError)
+
+    def __init__(self, url, key):
+        self.url = url
+        self.key = key
+        self.client: Client = create_client(url, key)
+        self._realtime = None
+
+    def table(self, name):
+        return self.client.table(name)
+
+    # Generic
+    def select_page(self, table, columns, key, after=None, limit=1000):
+        query = self.table(table).select(columns).order(key, desc=False)
+        if after is not None:
+            query = query.gt(key, after)
+        return query.limit(limit).execute()
+
+    # Shelves
+    def insert_shelves(self, payload):
+        return self.table("shelf").upsert(payload, on_conflict="shelf_id", ignore_duplicates=True).execute()
+
+    # Items
+    def insert_items(self, payload, ignore_conflicts=False):
+        if ignore_conflicts:
+            return self.table("item") \
+                .upsert(payload, on_conflict="item_id,serial_number", ignore_duplicates=True) \
+                .execute()
+        return self.table("item").insert(payload).execute()
+
+    def delete_items_by_serials(self, serials):
+        return self.table("item").delete().in_("serial_number", list(serials)).execute()
+
+    def delete_items_by_pallet(self, pallet_id):
+        return self.table("item").delete().eq("pallet_id", pallet_id).execute()
+
+    def select_existing_serials(self, serials):
+        return self.table("item").select("serial_number").in_("serial_number", list(serials)).execute()
+
+    def select_items_by_serials(self, serials):
+        return self.table("item").select("serial_number,pallet_id").in_("serial_number", list(serials)).execute()
+
+    def select_projection(self, table, columns, filters=(), key=None, after=None, before=None, limit=None):
+        query = self.table(table).select(postgrest_select(table, columns, filters))
+        resp = _projection_query(query, filters, key, after, before, limit).execute()
+        return _projection_rows(resp, table, columns, before)
+
+    def count_projection(self, table, filters=()):
+        query = self.table(table).select(postgrest_select(table, (), filters), count="exact", head=True)
+        return _projection_query(query, filters, None, None, None, None).execute()
+
+    def allocate_ids(self, sequence, count):
+        # allocate_ids() is defined in idAllocation.sql
+        resp = self.client.rpc("allocate_ids", {"seq_name": sequence, "block_size": count}).execute()
+        resp.data = [r["allocate_ids"] if isinstance(r, dict) else r for r in (resp.data or [])]
+        return resp
+
+    # Pallets
+    def insert_pallet(self, data):
+        return self.table("pallet").insert(data).execute()
+
+    def insert_pallets(self, payload):
+        return self.table("pallet").insert(payload).execute()
+
+    def delete_pallet(self, pallet_id):
+        return self.table("pallet").delete().eq("pallet_id", pallet_id).execute()
+
+    def update_pallet_shelf(self, pallet_id, shelf_id):
+        return self.table("pallet") \
+            .update({"shelf_id": shelf_id}) \
+            .eq("pallet_id", pallet_id) \
+            .execute()
+
+    def remove_pallet_with_items(self, pallet_id):
+        # Functions defined in palletProcedures.sql
+        return self.client.rpc("remove_pallet_with_items", {"p_pallet_id": pallet_id}).execute()
+
+    def move_pallets_to_shelf(self, pallet_ids, shelf_id):
+        return self.client.rpc("move_pallets_to_shelf", {"p_pallet_ids": list(pallet_ids), "p_shelf_id": shelf_id}).execute()
+
+    def move_items_to_pallet(self, serials, source_pallet_id, target_pallet_id):
+        return self.client.rpc("move_items_to_pallet", {
+            "p_serials": list(serials) if serials is not None else None,
+            "p_source_pallet_id": source_pallet_id,
+            "p_target_pallet_id": target_pallet_id,
+        }).execute()
+
+    def select_pallet_products(self, pallet_ids):
+        return self.table("pallet").select("pallet_id,product_id").in_("pallet_id", list(pallet_ids)).execute()
+
+    def list_pallet_ids(self):
+        return self.table("pallet").select("pallet_id").order("pallet_id", desc=False).execute()
+
+    # Products
+    def insert_product(self, data):
+        return self.table("product").insert(data).execute()
+
+    def insert_products(self, payload):
+        return self.table("product").insert(payload).execute()
+
+    def select_product(self, product_id):
+        return self.table("product").select("product_id,model_number").eq("product_id", product_id).execute()
+
+    def select_products_by_model(self, model_number):
+        return self.table("product").select("product_id").eq("model_number", model_number).execute()
+
+    def select_products_by_models(self, model_numbers):
+        return self.table("product").select("product_id,model_number").in_("model_number", list(model_numbers)).execute()
+
+    def list_model_numbers(self):
+        return self.table("product").select("model_number").order("model_number", desc=False).execute()
+
+    # Views
+    def select_model_for_pallet(self, pallet_id):
+        return self.table("pallet_info_view") \
+            .select("model_number") \
+            .eq("pallet_id", pallet_id) \
+            .limit(1) \
+            .execute()
+
+    def select_stock_counts(self):
+        # Trigger-maintained totals from modelCounts.sql
+        return self.table("stock_counts_fast").select("model_number,count").execute()
+
+    def select_pallet_counts(self):
+        return self.table("pallet_counts_fast").select("model_number,pallet_count").execute()
+
+    def check_counts(self):
+        return self.client.rpc("check_product_counts", {}).execute()
+
+    def rebuild_counts(self):
+        resp = self.client.rpc("rebuild_product_counts", {}).execute()
+        resp.data = [{"rebuilt": resp.data}]
+        return resp
+
+    def select_pallet_info(self):
+        return self.table("pallet_info_view").select("pallet_id,shelf_id,model_number").execute()
+
+    # Aisles (aisleModel.sql)
+    def list_aisles(self):
+        return self.table("aisle").select("aisle_name").order("sort_order").order("aisle_name").execute()
+
+    def select_pallets_by_aisle(self, aisle):
+        return self.table("pallet_aisle_view") \
+            .select("pallet_id, shelf_id, model_number") \
+            .eq("aisle_name", aisle) \
+            .order("pallet_id", desc=False) \
+            .execute()
+
+    def list_aisle_rules(self):
+        return self.table("aisle_rule").select("shelf_prefix, aisle_name").order("shelf_prefix").execute()
+
+    def set_aisle_rules(self, rules):
+        resp = self.client.rpc("set_aisle_rules", {"p_rules": list(rules)}).execute()
+        resp.data = [{"reassigned": resp.data}]
+        return resp
+
+    # Search (searchIndex.sql)
+    def search_inventory(self, query, limit=20):
+        return self.client.rpc("search_inventory", {"p_query": query, "p_limit": limit}).execute()
+
+    # Change log (changeLog.sql)
+    def select_changes(self, tables, after=None, limit=1000):
+        txid, change_id = after or (0, 0)
+        return self.client.rpc("select_changes", {
+            "p_tables": list(tables), "p_after_txid": txid, "p_after_change_id": change_id, "p_limit": limit,
+        }).execute()
+
+    def change_position(self):
+        return self.client.rpc("change_log_position", {}).execute()
+
+    def prune_changes(self, before):
+        return self.table("change_log") \
+            .delete(count=CountMethod.exact, returning=ReturnMethod.minimal) \
+            .lt("changed_at", before) \
+            .execute()
+
+    # Change feed
+    def start_change_feed(self, feed):
+        if self._realtime is None:
+            self._realtime = SupabaseRealtimeSource(self.url, self.key, feed)
+            self._realtime.start()
+        return True
+
+    # Async
+    def async_engine(self):
+        return AsyncSupabaseEngine(self)
+
+class AsyncSupabaseEngine:
+    """
+    Async read side of SupabaseEngine on a pooled httpx.AsyncClient, so
+    independent queries can be awaited together. Methods without an async
+    version here (the writes) run the sync engine on a worker thread.
+    The client is created on first use, inside the loop that awaits it.
+    """
+    name = "supabase"
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._fallback = AsyncEngineAdapter(engine)
+        self._client = None
+        self._http = None
+        self._connect_lock = None
+
+    def __getattr__(self, name):
+        return getattr(self._fallback, name)
+
+    async def _table(self, name):
+        if self._client is None:
+            if self._connect_lock is None:
+                self._connect_lock = asyncio.Lock()
+            async with self._connect_lock:
+                if self._client is None:
+                    self._http = httpx.AsyncClient(
+                        http2=True,
+                        timeout=HTTP_TIMEOUT,
+                        follow_redirects=True,
+                        limits=httpx.Limits(
+                            max_connections=HTTP_MAX_CONNECTIONS,
+                            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                        ),
+                    )
+                    self._client = await acreate_client(
+                        self.engine.url, self.engine.key, AsyncClientOptions(httpx_client=self._http)
+                    )
+        return self._client.table(name)
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+        self._client = self._http = None
+
+    # Generic
+    async def select_page(self, table, columns, key, after=None, limit=1000):
+        query = (await self._table(table)).select(columns).order(key, desc=False)
+        if after is not None:
+            query = query.gt(key, after)
+        return await query.limit(limit).execute()
+
+    # Items
+    async def select_projection(self, table, columns, filters=(), key=None, after=None, before=None, limit=None):
+        query = (await self._table(table)).select(postgrest_select(table, columns, filters))
+        resp = await _projection_query(query, filters, key, after, before, limit).execute()
+        return _projection_rows(resp, table, columns, before)
+
+    async def count_projection(self, table, filters=()):
+        query = (await self._table(table)).select(postgrest_select(table, (), filters), count="exact", head=True)
+        return await _projection_query(query, filters, None, None, None, None).execute()
+
+    # Pallets
+    async def select_pallet_products(self, pallet_ids):
+        return await (await self._table("pallet")).select("pallet_id,product_id").in_("pallet_id", list(pallet_ids)).execute()
+
+    async def list_pallet_ids(self):
+        return await (await self._table("pallet")).select("pallet_id").order("pallet_id", desc=False).execute()
+
+    # Products
+    async def select_product(self, product_id):
+        return await (await self._table("product")).select("product_id,model_number").eq("product_id", product_id).execute()
+
+    async def select_products_by_model(self, model_number):
+        return await (await self._table("product")).select("product_id").eq("model_number", model_number).execute()
+
+    async def select_products_by_models(self, model_numbers):
+        return await (await self._table("product")).select("product_id,model_number").in_("model_number", list(model_numbers)).execute()
+
+    async def list_model_numbers(self):
+        return await (await self._table("product")).select("model_number").order("model_number", desc=False).execute()
+
+    # Views
+    async def select_model_for_pallet(self, pallet_id):
+        return await (await self._table("pallet_info_view")) \
+            .select("model_number") \
+            .eq("pallet_id", pallet_id) \
+            .limit(1) \
+            .execute()
+
+    async def select_stock_counts(self):
+        return await (await self._table("stock_counts_fast")).select("model_number,count").execute()
+
+    async def select_pallet_counts(self):
+        return await (await self._table("pallet_counts_fast")).select("model_number,pallet_count").execute()
+
+    async def select_pallet_info(self):
+        return await (await self._table("pallet_info_view")).select("pallet_id,shelf_id,model_number").execute()
+
+    # Aisles
+    async def list_aisles(self):
+        return await (await self._table("aisle")).select("aisle_name").order("sort_order").order("aisle_name").execute()
+
+    async def select_pallets_by_aisle(self, aisle):
+        return await (await self._table("pallet_aisle_view")) \
+            .select("pallet_id, shelf_id, model_number") \
+            .eq("aisle_name", aisle) \
+            .order("pallet_id", desc=False) \
+            .execute()
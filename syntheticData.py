@@ -0,0 +1,135 @@
+import csv
+import random
+from storageEngine import DEFAULT_AISLE_RULES
+
+# Rows per insert while loading generated data
+LOAD_BATCH_SIZE = 5000
+
+class WarehouseGenerator:
+    """
+    Deterministic synthetic warehouse: the same seed and sizes always give
+    the same shelves, products, pallets and serialized items, so benchmark
+    runs are comparable. Items are generated lazily, so millions of them
+    never have to sit in memory.
+    """
+    def __init__(self, seed=42, shelves=500, products=100, pallets=2000, items=100000):
+        self.seed = seed
+        self.shelf_count = min(shelves, 7 * 100 * 4 + 1)  # distinct ids the shelf pattern can make
+        self.product_count = products
+        self.pallet_count = min(pallets, 36 ** 4)   # pallet_id is VARCHAR(4)
+        self.item_count = items
+
+    def _rng(self, stream):
+        # One independent random stream per table, so changing one size doesn't reshuffle the others
+        return random.Random(f"{self.seed}:{stream}")
+
+    def sizes(self):
+        return {
+            "seed": self.seed,
+            "shelves": self.shelf_count,
+            "products": self.product_count,
+            "pallets": self.pallet_count,
+            "items": self.item_count,
+        }
+
+    # Tables
+    def shelves(self):
+        """Shelf ids spread over the aisle prefixes, e.g. '314-2' (VARCHAR(5))."""
+        rng = self._rng("shelf")
+        prefixes = [p for p, _ in DEFAULT_AISLE_RULES if p.isdigit() and len(p) == 1]
+        seen = set()
+        rows = [{"shelf_id": "Lb"}]
+        while len(rows) < self.shelf_count:
+            shelf_id = f"{rng.choice(prefixes)}{rng.randint(0, 99):02d}-{rng.randint(1, 4)}"
+            if shelf_id not in seen:
+                seen.add(shelf_id)
+                rows.append({"shelf_id": shelf_id})
+        return rows
+
+    def products(self):
+        rng = self._rng("product")
+        return [
+            {
+                "product_id": n,
+                "product_name": f"Product {n}",
+                "product_description": rng.choice(("Switch", "Access point", "Router", "Cable", "PSU")),
+                "model_number": f"MDL-{n:05d}",
+            }
+            for n in range(1, self.product_count + 1)
+        ]
+
+    def pallets(self):
+        rng = self._rng("pallet")
+        shelf_ids = [s["shelf_id"] for s in self.shelves()]
+        return [
+            {
+                "pallet_id": self.pallet_id(n),
+                "shelf_id": rng.choice(shelf_ids),
+                "product_id": rng.randint(1, self.product_count),
+                "notes": "synthetic",
+            }
+            for n in range(self.pallet_count)
+        ]
+
+    @staticmethod
+    def pallet_id(n):
+        """n-th pallet id as 4 base-36 characters."""
+        digits = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+        chars = []
+        for _ in range(4):
+            n, r = divmod(n, 36)
+            chars.append(digits[r])
+        return "".join(reversed(chars))
+
+    def iter_items(self, count=None, start_id=1, tag="S", item_ids=None):
+        """
+        Yield item dicts with ids start_id, start_id + 1, ... (or the given
+        item_ids). Items inherit their pallet's product. `tag` keeps serials
+        of separate batches distinct.
+        """
+        if item_ids is None:
+            count = self.item_count if count is None else count
+            item_ids = range(start_id, start_id + count)
+        rng = self._rng(f"item:{tag}:{start_id}")
+        pallets = [(p["pallet_id"], p["product_id"]) for p in self.pallets()]
+        for item_id in item_ids:
+            pallet_id, product_id = rng.choice(pallets)
+            yield {
+                "item_id": item_id,
+                "serial_number": f"{tag}{self.seed}-{item_id:010d}",
+                "pallet_id": pallet_id,
+                "product_id": product_id,
+            }
+
+    # Output
+    def load(self, engine, batch_size=LOAD_BATCH_SIZE, on_progress=None):
+        """Insert every generated row through a storage engine. Returns the number of items loaded."""
+        engine.insert_shelves(self.shelves())
+        for product in self.products():
+            engine.insert_product(product)
+        for pallet in self.pallets():
+            engine.insert_pallet(pallet)
+
+        loaded = 0
+        batch = []
+        for item in self.iter_items():
+            batch.append(item)
+            if len(batch) >= batch_size:
+                engine.insert_items(batch)
+                loaded += len(batch)
+                batch = []
+                if on_progress:
+                    on_progress(loaded)
+        if batch:
+            engine.insert_items(batch)
+            loaded += len(batch)
+        return loaded
+
+    def write_csv(self, path, item_ids, tag="C"):
+        """Write new items with the given ids as an import CSV (item_id, serial_number, pallet_id)."""
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["item_id", "serial_number", "pallet_id"])
+            for item in self.iter_items(tag=tag, item_ids=item_ids):
+                writer.writerow([item["item_id"], item["serial_number"], item["pallet_id"]])
+        return path
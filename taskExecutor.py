@@ -0,0 +1,117 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from metrics import metrics
+
+# Worker threads for backend calls made from the GUI
+MAX_WORKERS = 4
+
+class Task:
+    """A submitted call. `cancelled` is set once a newer request supersedes it."""
+    def __init__(self, tab, request):
+        self.tab = tab
+        self.request = request
+        self.cancelled = False
+        self.future = None
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+class TaskExecutor:
+    """
+    Runs blocking backend calls on a worker pool so the Tk main thread never
+    waits on the network. Results and errors are handed back to the main
+    thread with app.after.
+
+    Tasks belong to a tab. Submitting with a `request` name cancels the older
+    unfinished tasks of the same tab and request (e.g. a second "View Items"
+    click); a cancelled task's result is dropped. While any task of a tab is
+    running, that tab's busy indicator (anything with start()/stop(), like a
+    ttk.Progressbar) is started.
+    """
+    def __init__(self, app, max_workers=MAX_WORKERS):
+        self.app = app
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gui-task")
+        self._lock = threading.Lock()
+        self._running = {}      # tab -> list of unfinished Tasks
+        self._indicators = {}   # tab -> busy indicator
+        self._busy = set()      # tabs whose indicator is running
+
+    def set_indicator(self, tab, indicator):
+        self._indicators[tab] = indicator
+
+    def submit(self, tab, work, on_done=None, on_error=None, request=None):
+        """
+        Run work() on a worker thread, then on_done(result) on the main thread.
+        If work raises, on_error(exception) is called instead (the error is
+        printed when there is no on_error). Returns the Task.
+        """
+        task = Task(tab, request)
+        with self._lock:
+            running = self._running.setdefault(tab, [])
+            if request is not None:
+                for old in running:
+                    if old.request == request:
+                        old.cancel()
+            running.append(task)
+        self._on_main(self._set_busy, tab)
+
+        task.future = self._pool.submit(self._run, task, work)
+        task.future.add_done_callback(lambda future: self._on_main(self._finish, task, future, on_done, on_error))
+        return task
+
+    def _run(self, task, work):
+        if task.cancelled:
+            return None
+        # Recorded as e.g. "task.Stock Counts.load", with the round trips it cost
+        name = f"task.{task.tab}" + (f".{task.request}" if task.request else "")
+        with metrics.operation(name):
+            return work()
+
+    def _on_main(self, callback, *args):
+        if threading.current_thread() is threading.main_thread():
+            callback(*args)
+        else:
+            self.app.after(0, lambda: callback(*args))
+
+    def _finish(self, task, future, on_done, on_error):
+        """Deliver a task's result (runs on main thread)."""
+        with self._lock:
+            running = self._running.get(task.tab, [])
+            if task in running:
+                running.remove(task)
+        self._set_busy(task.tab)
+        if task.cancelled or future.cancelled():
+            return
+
+        error = future.exception()
+        if error is not None:
+            if on_error is not None:
+                on_error(error)
+            else:
+                print(f"Background task on {task.tab} failed: {error}")
+        elif on_done is not None:
+            on_done(future.result())
+
+    def _set_busy(self, tab):
+        indicator = self._indicators.get(tab)
+        if indicator is None:
+            return
+        with self._lock:
+            busy = bool(self._running.get(tab))
+        if busy == (tab in self._busy):
+            return
+        if busy:
+            self._busy.add(tab)
+            indicator.start(10)
+        else:
+            self._busy.discard(tab)
+            indicator.stop()
+
+    def is_busy(self, tab):
+        with self._lock:
+            return bool(self._running.get(tab))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
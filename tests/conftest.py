@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The modules live at the repository root; tests run against a local SQLite
+# engine and never touch the journal, snapshot or metrics files.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("INVENTORY_ENGINE", "sqlite")
+os.environ.setdefault("INVENTORY_SQLITE_PATH", ":memory:")
+os.environ.setdefault("INVENTORY_JOURNAL", "0")
+os.environ.setdefault("INVENTORY_SNAPSHOT", "0")
@@ -0,0 +1,71 @@
+from batchWriter import BatchWriter
+from storageEngine import EngineResponse
+
+
+class FakeEngine:
+    """Item table as a dict; an insert with a serial already present is rejected whole."""
+    def __init__(self, serials=()):
+        self.items = {serial: {"serial_number": serial} for serial in serials}
+        self.insert_calls = []
+
+    def insert_items(self, payload, ignore_conflicts=False):
+        self.insert_calls.append([item["serial_number"] for item in payload])
+        if not ignore_conflicts and any(item["serial_number"] in self.items for item in payload):
+            raise ValueError("duplicate key value violates unique constraint")
+        rows = [item for item in payload if item["serial_number"] not in self.items]
+        self.items.update((item["serial_number"], item) for item in rows)
+        return EngineResponse(rows)
+
+    def select_existing_serials(self, serials):
+        return EngineResponse([{"serial_number": s} for s in serials if s in self.items])
+
+    def delete_items_by_serials(self, serials):
+        return EngineResponse([self.items.pop(s) for s in serials if s in self.items])
+
+
+def items(*serials):
+    return [{"serial_number": serial, "pallet_id": "P1", "product_id": 1} for serial in serials]
+
+
+def test_insert_is_split_into_chunks():
+    engine = FakeEngine()
+    writer = BatchWriter(engine, insert_batch_size=2)
+    result = writer.insert_items(items("A", "B", "C", "D", "E"))
+    assert sorted(result["inserted"]) == ["A", "B", "C", "D", "E"]
+    assert sorted(len(call) for call in engine.insert_calls) == [1, 2, 2]
+    writer.close()
+
+
+def test_repeated_serials_in_the_input_are_duplicates():
+    result = BatchWriter(FakeEngine()).insert_items(items("A", "B", "A"))
+    assert result["inserted"] == ["A", "B"]
+    assert result["duplicates"] == ["A"]
+
+
+def test_rejected_chunk_is_retried_without_existing_serials():
+    engine = FakeEngine(["B"])
+    result = BatchWriter(engine).insert_items(items("A", "B", "C"))
+    assert sorted(result["inserted"]) == ["A", "C"]
+    assert result["duplicates"] == ["B"]
+    assert result["failed"] == []
+
+
+def test_delete_reports_missing_serials():
+    result = BatchWriter(FakeEngine(["A", "B"])).delete_serials(["A", "B", "C", "A"])
+    assert sorted(result["deleted"]) == ["A", "B"]
+    assert result["not_found"] == ["C"]
+
+
+def test_unreachable_rows_are_listed_apart_from_rejected_ones():
+    class FlakyEngine(FakeEngine):
+        def insert_items(self, payload, ignore_conflicts=False):
+            if any(item["serial_number"] == "C" for item in payload):
+                raise ConnectionError("connection reset")
+            return super().insert_items(payload, ignore_conflicts)
+
+    writer = BatchWriter(FlakyEngine(), insert_batch_size=2)
+    result = writer.insert_items(items("A", "B", "C", "D"))
+    assert sorted(result["inserted"]) == ["A", "B"]
+    assert sorted(serial for serial, _ in result["failed"]) == ["C", "D"]
+    assert sorted(result["unreachable"]) == ["C", "D"]
+    writer.close()
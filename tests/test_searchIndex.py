@@ -0,0 +1,96 @@
+import random
+
+import pytest
+
+import searchIndex
+from searchIndex import SearchIndex
+from sqliteEngine import SQLiteEngine
+from syntheticData import WarehouseGenerator
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = SQLiteEngine(":memory:")
+    WarehouseGenerator(seed=2, shelves=4, products=30, pallets=40, items=400).load(engine)
+    # Model numbers need not be unique: products are told apart by product_id
+    model = engine.select_page("product", "model_number", "product_id", limit=1).data[0]["model_number"]
+    engine.insert_product({"product_id": 9001, "model_number": model,
+                           "product_name": "Spare cable kit", "product_description": f"Replacement for {model}"})
+    return engine
+
+
+@pytest.fixture(scope="module")
+def index(engine):
+    index = SearchIndex()
+    index.load(engine)
+    return index
+
+
+def brute_force(engine, query, limit):
+    """Score every serial and product field with score(), as the database would."""
+    query = searchIndex.normalize(query)
+    grams = searchIndex.trigrams(query)
+    rows = []
+    for item in engine.select_page("item", "serial_number", "item_id", limit=100000).data:
+        serial = item["serial_number"]
+        score = searchIndex.score(query, serial, grams)
+        if score:
+            rows.append((-score, len(serial), serial, "item", "serial_number"))
+    for product in engine.select_page("product", "*", "product_id", limit=100000).data:
+        best = None
+        for field in searchIndex.PRODUCT_FIELDS:
+            text = product[field]
+            score = searchIndex.score(query, text, grams) if text else 0.0
+            if score and (best is None or (-score, len(text)) < best[:2]):
+                best = (-score, len(text), product["model_number"], "product", field)
+        if best is not None:
+            rows.append(best)
+    rows.sort(key=lambda r: r[:3])
+    return sorted((key, kind, field, round(-score, 4)) for score, _, key, kind, field in rows[:limit])
+
+
+def queries(engine):
+    rng = random.Random(7)
+    serials = [r["serial_number"] for r in engine.select_page("item", "serial_number", "item_id", limit=100000).data]
+    words = " ".join(f'{r["product_name"]} {r["product_description"] or ""}'
+                     for r in engine.select_page("product", "*", "product_id", limit=100000).data).split()
+    found = ["spare cable", "replacement", "cabel", "zzzz"]
+    for _ in range(40):
+        serial = rng.choice(serials)
+        start = rng.randrange(len(serial))
+        found.append(serial[start:start + rng.randint(3, 8)])
+        word = rng.choice(words).lower()
+        found.append(word[:rng.randint(3, max(3, len(word)))])
+        if len(word) > 4:
+            i = rng.randrange(len(word))
+            found.append(word[:i] + "q" + word[i + 1:])
+    return found
+
+
+def test_search_matches_brute_force_scoring(engine, index):
+    answered = 0
+    for query in queries(engine):
+        results = index.search(query, 20)
+        if results is None:
+            continue
+        answered += 1
+        got = sorted((r["key"], r["kind"], r["field"], r["score"]) for r in results)
+        assert got == brute_force(engine, query, 20), query
+    assert answered > 100
+
+
+def test_products_sharing_a_model_number_are_listed_apart(index):
+    results = index.search("spare cable kit", 5)
+    assert results[0]["field"] == "product_name"
+    assert results[0]["text"] == "Spare cable kit"
+
+
+def test_patches_are_searchable(index):
+    index.add_item({"serial_number": "PATCHED-000001", "item_id": 99001, "pallet_id": "P1", "product_id": 9001})
+    assert index.search("patched-000001", 1)[0]["key"] == "PATCHED-000001"
+    index.remove_serial("PATCHED-000001")
+    assert all(r["key"] != "PATCHED-000001" for r in index.search("patched-000001", 20))
+
+
+def test_search_before_load_asks_the_database():
+    assert SearchIndex().search("anything") is None
@@ -0,0 +1,49 @@
+import serialSet
+from serialSet import SerialSet
+
+
+def loaded(*serials):
+    serial_set = SerialSet()
+    serial_set.load_serials(serials)
+    return serial_set
+
+
+def test_split_before_load_asks_the_database():
+    assert SerialSet().split(["A"]) is None
+    assert SerialSet().contains("A") is None
+
+
+def test_split_new_present_and_repeated():
+    serial_set = loaded("A", "B")
+    assert serial_set.split(["A", "C", "A", "D", "C"]) == (["C", "D"], ["A"], ["A", "C"])
+
+
+def test_add_and_remove():
+    serial_set = loaded("A", "B")
+    serial_set.add(["C"])
+    serial_set.remove(["A"])
+    assert serial_set.contains("C")
+    assert not serial_set.contains("A")
+    assert len(serial_set) == 2
+
+    # Removing and re-adding a serial from the loaded array, and the reverse for a recent one
+    serial_set.add(["A"])
+    serial_set.remove(["C"])
+    assert serial_set.split(["A", "B", "C"]) == (["C"], ["A", "B"], [])
+    assert len(serial_set) == 2
+
+
+def test_merge_keeps_membership(monkeypatch):
+    monkeypatch.setattr(serialSet, "MERGE_THRESHOLD", 3)
+    serial_set = loaded("A", "B", "C")
+    serial_set.remove(["B"])
+    serial_set.add(["D", "E", "F"])
+    assert [serial_set.contains(s) for s in "ABCDEFG"] == [True, False, True, True, True, True, False]
+    assert len(serial_set) == 5
+
+
+def test_disabled_set_is_not_patched():
+    serial_set = SerialSet(enabled=False)
+    serial_set.load_serials(["A"])
+    serial_set.add(["B"])
+    assert not serial_set.contains("B")
@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+
+import backend
+from syntheticData import WarehouseGenerator
+from writeJournal import JournalSync, WriteJournal
+
+
+@pytest.fixture(scope="module")
+def pallet():
+    WarehouseGenerator(seed=1, shelves=3, products=4, pallets=6, items=30).load(backend.engine)
+    return backend.fetch_pallet_ids()[0]
+
+
+class FlakyEngine:
+    """Passes calls through to `engine`, but inserts holding `serial` fail while `down` is set."""
+    def __init__(self, engine, serial):
+        self.engine = engine
+        self.serial = serial
+        self.down = True
+
+    def insert_items(self, payload, ignore_conflicts=False):
+        if self.down and any(item["serial_number"] == self.serial for item in payload):
+            raise ConnectionError("timed out")
+        return self.engine.insert_items(payload, ignore_conflicts=ignore_conflicts)
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+
+def entry(key, payload, attempts=0):
+    return {"key": key, "op": "scan_items", "payload": payload, "attempts": attempts}
+
+
+def stored(serials):
+    rows = backend.engine.select_existing_serials(serials).data or []
+    return sorted(r["serial_number"] for r in rows)
+
+
+def test_partial_outage_keeps_the_run_pending(pallet, monkeypatch):
+    flaky = FlakyEngine(backend.writer.engine, "PO-3")
+    monkeypatch.setattr(backend.writer, "engine", flaky)
+    monkeypatch.setattr(backend.writer, "insert_batch_size", 2)
+    serials = ["PO-1", "PO-2", "PO-3", "PO-4"]
+    entries = [entry("k1", [[serial, pallet] for serial in serials])]
+
+    with pytest.raises(ConnectionError):
+        backend._replay_scans(entries)
+    assert stored(serials) == ["PO-1", "PO-2"]
+
+    # The retry recognises the rows that went in the first time
+    flaky.down = False
+    results = backend._replay_scans([entry("k1", entries[0]["payload"], attempts=1)])
+    assert sorted(results["k1"]["synced"]) == serials
+    assert results["k1"]["conflicts"] == []
+    assert stored(serials) == serials
+
+
+def test_serial_repeated_across_entries_is_written_once(pallet):
+    results = backend._replay_scans([
+        entry("k1", [["RE-1", pallet]]),
+        entry("k2", [["RE-1", pallet], ["RE-2", pallet]]),
+    ])
+    assert results["k1"] == {"synced": ["RE-1"], "conflicts": []}
+    assert results["k2"]["synced"] == ["RE-2"]
+    assert [serial for serial, _ in results["k2"]["conflicts"]] == ["RE-1"]
+
+    results = backend._replay_removals([
+        {"key": "k3", "op": "remove_items", "payload": ["RE-1", "RE-2"], "attempts": 0},
+        {"key": "k4", "op": "remove_items", "payload": ["RE-2"], "attempts": 0},
+    ])
+    assert sorted(results["k3"]["synced"]) == ["RE-1", "RE-2"]
+    assert results["k4"]["synced"] == []
+    assert [serial for serial, _ in results["k4"]["conflicts"]] == ["RE-2"]
+
+
+def test_offline_replay_leaves_entries_queued(tmp_path):
+    journal = WriteJournal(str(tmp_path / "journal.db"))
+    attempted = threading.Event()
+
+    def replay(entries):
+        attempted.set()
+        raise ConnectionError("database unreachable")
+
+    sync = JournalSync(journal, {"scan_items": replay}, interval=0.01)
+    sync.append("scan_items", [["Q-1", "P1"], ["Q-2", "P1"]])
+    assert sync.queued("scan_items", ["Q-1", "Q-3"]) == {"Q-1"}
+    sync.start()
+    try:
+        assert attempted.wait(5)
+    finally:
+        sync.stop()
+    assert journal.counts()["pending"] == 1
+    assert journal.conflicts() == []
+
+    # A restarted worker picks the queued serials up from the journal
+    restarted = JournalSync(journal, {"scan_items": replay}, interval=0.01)
+    restarted.start()
+    restarted.stop()
+    assert restarted.queued("scan_items", ["Q-1", "Q-2"]) == {"Q-1", "Q-2"}
+    journal.close()
+
+
+def test_set_aside_entry_releases_its_serials(tmp_path):
+    journal = WriteJournal(str(tmp_path / "journal.db"))
+    done = threading.Event()
+
+    def replay(entries):
+        raise ValueError("bad payload")
+
+    sync = JournalSync(journal, {"remove_items": replay}, interval=0.01)
+    sync.subscribe(lambda op, results: done.set() if results else None)
+    sync.append("remove_items", ["X-1"])
+    sync.start()
+    try:
+        assert done.wait(5)
+    finally:
+        sync.stop()
+    assert sync.queued("remove_items", ["X-1"]) == set()
+    assert [c["serial_number"] for c in journal.conflicts()] == ["X-1"]
+    journal.close()
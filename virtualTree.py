@@ -0,0 +1,221 @@
+from bisect import bisect_left
+
+# Rows per fetched page and how many pages the Treeview holds at once
+PAGE_SIZE = 200
+MAX_PAGES = 3
+# Fraction of the scroll range from either end that triggers a prefetch
+PREFETCH_MARGIN = 0.15
+
+class VirtualTreeview:
+    """
+    Shows a keyset-paginated result set in a ttk.Treeview while keeping only a
+    window of MAX_PAGES pages in the widget. Scrolling near either end fetches
+    the next/previous page and drops the page furthest away, so a listing of
+    100k serials costs the same to render as one of 600.
+
+    fetch_page(after_id=None, before_id=None, limit=n) must return row tuples
+    ordered by their first column (the item_id), which is also the row iid.
+    When `run` is given, scroll fetches go through run(work, on_done) (e.g. a
+    TaskExecutor) instead of blocking the main thread.
+    """
+    def __init__(self, tree, scrollbar=None, status_label=None,
+                 page_size=PAGE_SIZE, max_pages=MAX_PAGES, run=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.status_label = status_label
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self._fetch = None
+        self.total = None
+        self.offset = 0           # position of the first rendered row in the full result
+        self._has_more = False    # rows exist after the rendered window
+        self._loading = False
+        self._reveal = None       # row iid to select once it is rendered
+        self._run = run
+        tree.configure(yscrollcommand=self._on_scroll)
+        if scrollbar is not None:
+            scrollbar.configure(command=tree.yview)
+
+    # Loading
+    def load(self, fetch_page, total=None, rows=None):
+        """
+        Show a new result set, starting from its first page. Pass the first
+        page as `rows` if it was already fetched off the main thread.
+        """
+        self._fetch = fetch_page
+        self.total = total
+        self.offset = 0
+        self._loading = False
+        self._reveal = None
+        self.tree.delete(*self.tree.get_children())
+        if rows is None:
+            rows = self._fetch(after_id=None, limit=self.page_size)
+        self._append(rows)
+        self._has_more = len(rows) == self.page_size
+        self.tree.yview_moveto(0)
+        self._update_status()
+
+    def clear(self):
+        self._fetch = None
+        self.total = None
+        self.offset = 0
+        self._loading = False
+        self._reveal = None
+        self._has_more = False
+        self.tree.delete(*self.tree.get_children())
+        self._update_status()
+
+    def _append(self, rows):
+        for row in rows:
+            self.tree.insert('', 'end', iid=str(row[0]), values=row)
+
+    def _on_scroll(self, first, last):
+        if self.scrollbar is not None:
+            self.scrollbar.set(first, last)
+        if self._fetch is None or self._loading:
+            return
+        if float(last) >= 1 - PREFETCH_MARGIN and self._has_more:
+            self.tree.after_idle(self._load_next)
+        elif float(first) <= PREFETCH_MARGIN and self.offset > 0:
+            self.tree.after_idle(self._load_previous)
+
+    def _first_visible(self):
+        children = self.tree.get_children()
+        if not children:
+            return None
+        first = float(self.tree.yview()[0])
+        return children[min(int(first * len(children)), len(children) - 1)]
+
+    def _restore(self, anchor):
+        """Scroll so `anchor` is the first visible row again after the window moved."""
+        children = self.tree.get_children()
+        if anchor in children:
+            self.tree.yview_moveto(children.index(anchor) / len(children))
+
+    def _request(self, apply, **page):
+        """Fetch a page and hand it to apply(rows), through `run` when set."""
+        self._loading = True
+        fetch = self._fetch
+        if self._run is None:
+            apply(fetch(limit=self.page_size, **page))
+            return
+
+        def on_done(rows):
+            # Drop pages of a result set that has since been replaced
+            if fetch is self._fetch:
+                apply(rows)
+        self._run(lambda: fetch(limit=self.page_size, **page), on_done)
+
+    def _load_next(self):
+        if self._loading or not self._has_more:
+            return
+        children = self.tree.get_children()
+        self._request(self._apply_next, after_id=int(children[-1]))
+
+    def _apply_next(self, rows):
+        try:
+            anchor = self._first_visible()
+            self._has_more = len(rows) == self.page_size
+            self._append(rows)
+
+            children = self.tree.get_children()
+            excess = len(children) - self.max_pages * self.page_size
+            if excess > 0:
+                self.tree.delete(*children[:excess])
+                self.offset += excess
+            self._restore(anchor)
+        finally:
+            self._loading = False
+            self._update_status()
+        self._try_reveal()
+
+    def _load_previous(self):
+        if self._loading or self.offset <= 0:
+            return
+        children = self.tree.get_children()
+        self._request(self._apply_previous, before_id=int(children[0]))
+
+    def _apply_previous(self, rows):
+        try:
+            anchor = self._first_visible()
+            for row in reversed(rows):
+                self.tree.insert('', 0, iid=str(row[0]), values=row)
+            self.offset = max(self.offset - len(rows), 0)
+            if len(rows) < self.page_size:
+                self.offset = 0
+
+            children = self.tree.get_children()
+            excess = len(children) - self.max_pages * self.page_size
+            if excess > 0:
+                self.tree.delete(*children[-excess:])
+                self._has_more = True
+            self._restore(anchor)
+        finally:
+            self._loading = False
+            self._update_status()
+        self._try_reveal()
+
+    # Jumping to a row
+    def reveal(self, iid):
+        """Select and scroll to row `iid`, fetching the following pages until it is rendered."""
+        self._reveal = str(iid)
+        self._try_reveal()
+
+    def _try_reveal(self):
+        iid = self._reveal
+        if iid is None:
+            return
+        children = self.tree.get_children()
+        if self.tree.exists(iid):
+            self._reveal = None
+            self.tree.selection_set(iid)
+            self.tree.see(iid)
+        elif self._loading:
+            return # _apply_next tries again
+        elif self._has_more and children and int(iid) > int(children[-1]):
+            self._load_next()
+        else:
+            self._reveal = None # Not in this result set
+
+    # Live patches (from the change feed)
+    def upsert_row(self, row):
+        """Show a new/changed row if it falls inside the rendered window."""
+        iid = str(row[0])
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=row)
+            return
+        ids = [int(c) for c in self.tree.get_children()]
+        # Rows past the window's end are picked up when the next page is fetched
+        if ids and row[0] > ids[-1] and self._has_more:
+            if self.total is not None:
+                self.total += 1
+            self._update_status()
+            return
+        if ids and row[0] < ids[0] and self.offset > 0:
+            self.offset += 1
+        else:
+            self.tree.insert('', bisect_left(ids, row[0]), iid=iid, values=row)
+        if self.total is not None:
+            self.total += 1
+        self._update_status()
+
+    def remove_row(self, iid):
+        iid = str(iid)
+        if self.tree.exists(iid):
+            self.tree.delete(iid)
+            if self.total is not None:
+                self.total -= 1
+            self._update_status()
+
+    def _update_status(self):
+        if self.status_label is None:
+            return
+        shown = len(self.tree.get_children())
+        if self._fetch is None:
+            text = ""
+        elif not shown:
+            text = "No items"
+        else:
+            total = f" of {self.total}" if self.total is not None else ""
+            text = f"Rows {self.offset + 1}-{self.offset + shown}{total}"
+        self.status_label.configure(text=text)
@@ -0,0 +1,301 @@
+import json
+import sqlite3
+from collections import Counter
+import threading
+import time
+import uuid
+
+# Journal entries handed to one replay call (counted in rows, e.g. serials)
+SYNC_BATCH_ROWS = 500
+# Seconds between checks for unsynced entries when nothing new is appended
+SYNC_INTERVAL = 5.0
+# Backoff while the database is unreachable: doubles from the first value up to the second
+SYNC_RETRY_DELAY = 2.0
+SYNC_MAX_RETRY_DELAY = 60.0
+# Synced entries are kept this long, then pruned
+JOURNAL_KEEP_SECONDS = 7 * 24 * 3600
+
+JOURNAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,           -- idempotency key
+    op TEXT NOT NULL,
+    payload TEXT NOT NULL,              -- JSON
+    rows INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',   -- pending, synced, failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    synced_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_journal_status ON journal(status, seq);
+CREATE TABLE IF NOT EXISTS journal_conflict (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL REFERENCES journal(key),
+    op TEXT NOT NULL,
+    serial_number TEXT,
+    reason TEXT NOT NULL,
+    at REAL NOT NULL
+);
+"""
+
+def _payload_serials(payload):
+    """The serials of an entry's payload (serials, or [serial, pallet] pairs)."""
+    return [row if isinstance(row, str) else row[0] for row in payload]
+
+class WriteJournal:
+    """
+    Durable, append-only journal of writes in a local SQLite file. An entry
+    is committed to disk before append() returns, so a write acknowledged
+    from the journal survives a crash or an outage. Each entry carries an
+    idempotency key; appending the same key twice stores it once.
+    The file is opened on first use.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.RLock()
+
+    def _db(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.executescript(JOURNAL_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def append(self, op, payload, key=None):
+        """Record a write; returns its idempotency key."""
+        key = key or uuid.uuid4().hex
+        with self._lock, self._db() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO journal (key, op, payload, rows, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, op, json.dumps(payload), len(payload), time.time()),
+            )
+        return key
+
+    def pending(self, max_rows=SYNC_BATCH_ROWS):
+        """
+        The oldest unsynced entries that share one op, in order, up to about
+        `max_rows` rows (at least one entry).
+        """
+        with self._lock:
+            cursor = self._db().execute(
+                "SELECT seq, key, op, payload, rows, attempts FROM journal WHERE status = 'pending' ORDER BY seq"
+            )
+            entries = []
+            rows = 0
+            for seq, key, op, payload, count, attempts in cursor:
+                if entries and (op != entries[0]["op"] or rows + count > max_rows):
+                    break
+                entries.append({"seq": seq, "key": key, "op": op, "payload": json.loads(payload), "attempts": attempts})
+                rows += count
+            cursor.close()
+            return entries
+
+    def pending_serials(self):
+        """{op: Counter(serial)} over every unsynced entry."""
+        with self._lock:
+            rows = self._db().execute("SELECT op, payload FROM journal WHERE status = 'pending'").fetchall()
+        serials = {}
+        for op, payload in rows:
+            serials.setdefault(op, Counter()).update(_payload_serials(json.loads(payload)))
+        return serials
+
+    def mark_attempt(self, keys):
+        """Count a replay attempt before sending, so a retry knows the write may already be applied."""
+        with self._lock, self._db() as conn:
+            conn.executemany("UPDATE journal SET attempts = attempts + 1 WHERE key = ?", [(k,) for k in keys])
+
+    def mark_synced(self, results):
+        """results: {key: {"op": op, "conflicts": [(serial, reason)]}}; marks entries synced and stores conflicts."""
+        now = time.time()
+        with self._lock, self._db() as conn:
+            conn.executemany("UPDATE journal SET status = 'synced', synced_at = ? WHERE key = ?",
+                             [(now, key) for key in results])
+            conn.executemany(
+                "INSERT INTO journal_conflict (key, op, serial_number, reason, at) VALUES (?, ?, ?, ?, ?)",
+                [(key, r["op"], serial, reason, now) for key, r in results.items() for serial, reason in r["conflicts"]],
+            )
+            conn.execute("DELETE FROM journal WHERE status = 'synced' AND synced_at < ? "
+                         "AND key NOT IN (SELECT key FROM journal_conflict)", (now - JOURNAL_KEEP_SECONDS,))
+
+    def mark_failed(self, key, op, payload, reason):
+        """Set aside an entry its replay can't apply; each of its serials is listed as a conflict."""
+        now = time.time()
+        with self._lock, self._db() as conn:
+            conn.execute("UPDATE journal SET status = 'failed' WHERE key = ?", (key,))
+            conn.executemany(
+                "INSERT INTO journal_conflict (key, op, serial_number, reason, at) VALUES (?, ?, ?, ?, ?)",
+                [(key, op, serial, reason, now) for serial in _payload_serials(payload)],
+            )
+
+    def conflicts(self):
+        """Conflicts reported by replays, oldest first."""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT at, op, serial_number, reason, key FROM journal_conflict ORDER BY id"
+            ).fetchall()
+        return [{"at": at, "op": op, "serial_number": serial, "reason": reason, "key": key}
+                for at, op, serial, reason, key in rows]
+
+    def clear_conflicts(self):
+        with self._lock, self._db() as conn:
+            conn.execute("DELETE FROM journal_conflict")
+
+    def counts(self):
+        """{"pending": entries, "pending_rows": rows, "conflicts": n}"""
+        with self._lock:
+            db = self._db()
+            entries, rows = db.execute(
+                "SELECT count(*), coalesce(sum(rows), 0) FROM journal WHERE status = 'pending'").fetchone()
+            conflicts = db.execute("SELECT count(*) FROM journal_conflict").fetchone()[0]
+        return {"pending": entries, "pending_rows": rows, "conflicts": conflicts}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+def offline_error(e):
+    """True when an exception means the database couldn't be reached."""
+    return isinstance(e, (ConnectionError, TimeoutError))
+
+class JournalSync:
+    """
+    Background worker that replays the journal to the database in order.
+    `handlers` maps an op to replay(entries), which applies a run of entries
+    and returns {key: {"synced": [serials], "conflicts": [(serial, reason)]}}.
+    A replay that raises an error is_offline(e) accepts means the database is
+    unreachable: the entries stay pending and are retried with backoff. Any
+    other error is the entry's own: the run is replayed an entry at a time and
+    the entry that fails is marked failed, its serials listed as conflicts, so
+    it can't hold up the writes behind it. Listeners get (op, results) on the
+    worker thread after each replay.
+
+    The serials of unsynced entries are tracked per op, so a caller can tell
+    that a serial is already waiting (queued()). Hold `lock` across queued()
+    and append() to make the check and the write one step.
+    """
+    def __init__(self, journal, handlers, interval=SYNC_INTERVAL, is_offline=offline_error):
+        self.journal = journal
+        self.handlers = handlers
+        self.interval = interval
+        self.is_offline = is_offline
+        self.online = True
+        self.last_error = None
+        self.running = False
+        self.lock = threading.RLock()
+        self._queued = {}   # op -> Counter(serial) of unsynced entries
+        self._listeners = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def start(self):
+        if self._thread is None:
+            with self.lock:
+                self._queued = self.journal.pending_serials()
+            self.running = True
+            self._thread = threading.Thread(target=self._run, name="journal-sync", daemon=True)
+            self._thread.start()
+
+    def append(self, op, payload):
+        """Journal a write and wake the worker; returns the idempotency key."""
+        with self.lock:
+            key = self.journal.append(op, payload)
+            self._queued.setdefault(op, Counter()).update(_payload_serials(payload))
+        self._wake.set()
+        return key
+
+    def queued(self, op, serials):
+        """The subset of `serials` with an `op` entry still waiting to sync."""
+        with self.lock:
+            waiting = self._queued.get(op, Counter())
+            return {serial for serial in serials if waiting[serial] > 0}
+
+    def _release(self, op, entries):
+        """Stop tracking the serials of entries that were synced or set aside."""
+        with self.lock:
+            waiting = self._queued.get(op, Counter())
+            waiting.subtract(serial for e in entries for serial in _payload_serials(e["payload"]))
+            self._queued[op] = +waiting
+
+    def _run(self):
+        delay = SYNC_RETRY_DELAY
+        single = 0  # entries left to replay one at a time, after a run failed
+        while not self._stop.is_set():
+            entries = self.journal.pending(max_rows=0 if single else SYNC_BATCH_ROWS)
+            if not entries:
+                self._wake.wait(self.interval)
+                self._wake.clear()
+                continue
+
+            op = entries[0]["op"]
+            self.journal.mark_attempt([e["key"] for e in entries])
+            try:
+                results = self.handlers[op](entries)
+            except Exception as e:
+                if not self.is_offline(e):
+                    single = self._failed(entries, op, e, single)
+                    continue
+                if self.online:
+                    print(f"Sync paused, database unreachable: {e}")
+                self.online = False
+                self.last_error = str(e)
+                self._notify(op, {})
+                self._stop.wait(delay)
+                delay = min(delay * 2, SYNC_MAX_RETRY_DELAY)
+                continue
+
+            if not self.online:
+                print("Sync resumed")
+            self.online = True
+            self.last_error = None
+            delay = SYNC_RETRY_DELAY
+            single = max(single - 1, 0)
+            self.journal.mark_synced({key: {"op": op, "conflicts": r["conflicts"]} for key, r in results.items()})
+            self._release(op, [e for e in entries if e["key"] in results])
+            self._notify(op, results)
+
+    def _failed(self, entries, op, e, single):
+        """Handle a replay that raised for a reason other than an outage; returns the new `single`."""
+        if len(entries) > 1:
+            # Find the entry at fault by replaying the run one entry at a time
+            return len(entries)
+        entry = entries[0]
+        reason = f"Sync failed: {e}"
+        print(f"Could not replay journal entry {entry['key']} ({op}), set aside: {e}")
+        try:
+            self.journal.mark_failed(entry["key"], op, entry["payload"], reason)
+        except Exception as journal_error:
+            print(f"Could not record the failed entry: {journal_error}")
+            self._stop.wait(self.interval)
+            return single
+        self._release(op, [entry])
+        conflicts = [(serial, reason) for serial in _payload_serials(entry["payload"])]
+        self._notify(op, {entry["key"]: {"synced": [], "conflicts": conflicts}})
+        return max(single - 1, 0)
+
+    def _notify(self, op, results):
+        for callback in list(self._listeners):
+            try:
+                callback(op, results)
+            except Exception as e:
+                print(f"Journal listener failed: {e}")
+
+    def status(self):
+        """Online flag, last error and the journal's pending/conflict counts."""
+        return {"online": self.online, "last_error": self.last_error, **self.journal.counts()}
+
+    def stop(self):
+        """Stop the worker; unsynced entries stay in the journal for the next start."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(5)
+        self.running = False